@@ -0,0 +1,232 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from db import connect_raw, is_sqlite, placeholder
+from notifications import build_alert_message, build_digest_message, load_credentials, open_smtp, send_message
+
+# --- ALERT DISPATCHER ---
+# The scrape only puts deals on a queue; a background thread sends them.
+# Every flush reuses one SMTP session, (product, price) pairs that were
+# already alerted are skipped, and digest mode sends all deals as one email.
+# What was alerted is kept in the database (`alerted_deals`), not on disk:
+# the scheduled job starts on a fresh runner every day.
+
+ALERT_MODE = os.getenv("ALERT_MODE", "each")  # "each": one email per deal | "digest": one email per run
+ALERT_DEDUP_DAYS = int(os.getenv("ALERT_DEDUP_DAYS", "30"))  # Re-alert an unchanged deal after this long
+FLUSH_SECONDS = 2.0  # "each" mode: wait this long for more deals before opening a session
+
+
+class AlertStats:
+    def __init__(self):
+        self.queued = 0
+        self.duplicates = 0
+        self.sent = 0
+        self.failed = 0
+        self.sessions = 0
+
+    def as_dict(self):
+        return {
+            "queued": self.queued,
+            "duplicates": self.duplicates,
+            "sent": self.sent,
+            "failed": self.failed,
+            "smtp_sessions": self.sessions,
+        }
+
+    def report(self):
+        print(f"📧 Alerts: {self.sent} sent over {self.sessions} SMTP session(s), "
+              f"{self.duplicates} already alerted, {self.failed} failed.")
+
+
+def create_alert_table(conn):
+    """
+    The (product, price, alerted_at) log AlertStore reads. Safe to run twice;
+    loader.ensure_schema calls it with the rest of the schema.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS alerted_deals (
+            product TEXT NOT NULL,
+            price {"REAL" if is_sqlite(conn) else "NUMERIC(12, 2)"} NOT NULL,
+            alerted_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (product, price)
+        );
+    """)
+    conn.commit()
+    cursor.close()
+
+
+class AlertStore:
+    """
+    (product, price) pairs we already emailed about, in the `alerted_deals`
+    table. A pair alerted more than `dedup_days` ago counts as new again.
+    `conn` defaults to a connection opened on first use (see db.connect_raw);
+    calls from different threads share it under a lock.
+    """
+
+    def __init__(self, conn=None, dedup_days=ALERT_DEDUP_DAYS):
+        self.conn = conn
+        self.dedup_days = dedup_days
+        self._owns_conn = conn is None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(product_name, price):
+        return f"{product_name}|{float(price):.2f}"
+
+    def _cursor(self):
+        if self.conn is None:
+            self.conn = connect_raw()
+        return self.conn.cursor()
+
+    def _cutoff(self):
+        return (datetime.now() - timedelta(days=self.dedup_days)).isoformat(sep=" ")
+
+    def seen(self, product_name, price):
+        with self._lock:
+            cursor = self._cursor()
+            p = placeholder(self.conn)
+            try:
+                cursor.execute(f"""
+                    SELECT 1 FROM alerted_deals
+                    WHERE product = {p} AND price = {p} AND alerted_at >= {p}
+                """, (product_name, round(float(price), 2), self._cutoff()))
+                found = cursor.fetchone() is not None
+                self.conn.commit()  # Don't leave a read transaction open between deals
+            finally:
+                cursor.close()
+            return found
+
+    def record(self, deals):
+        """
+        Marks (product, price, link) deals as alerted now.
+        """
+        now = datetime.now().isoformat(sep=" ")
+        with self._lock:
+            cursor = self._cursor()
+            p = placeholder(self.conn)
+            try:
+                cursor.executemany(f"""
+                    INSERT INTO alerted_deals (product, price, alerted_at) VALUES ({p}, {p}, {p})
+                    ON CONFLICT (product, price) DO UPDATE SET alerted_at = EXCLUDED.alerted_at
+                """, [(name, round(float(price), 2), now) for name, price, _ in deals])
+                # Expired pairs would be ignored by seen() anyway
+                cursor.execute(f"DELETE FROM alerted_deals WHERE alerted_at < {p}", (self._cutoff(),))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def close(self):
+        if self._owns_conn and self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class AlertDispatcher:
+    """
+    Background alert queue. `enqueue()` never blocks on the network;
+    call `close()` (or use `with`) to flush what's left at the end of the run.
+    """
+
+    def __init__(self, mode=ALERT_MODE, store=None, flush_seconds=FLUSH_SECONDS):
+        if mode not in ("each", "digest"):
+            raise ValueError(f"Unknown ALERT_MODE '{mode}'. Choose from: each, digest")
+        self.mode = mode
+        self._owns_store = store is None
+        self.store = store if store is not None else AlertStore()
+        self.flush_seconds = flush_seconds
+        self.stats = AlertStats()
+        self._queue = queue.Queue()
+        self._pending = set()  # Deals queued in this run, so a repeat on the same run isn't queued twice
+        self._pending_lock = threading.Lock()  # Watchdog stages of different sources enqueue at the same time
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._worker.start()
+
+    def enqueue(self, product_name, price, link):
+        """
+        Queues one deal. Returns False if it was already alerted.
+        """
+        if self._closed:
+            raise RuntimeError("AlertDispatcher is closed")
+        key = AlertStore.key(product_name, price)
+        with self._pending_lock:
+            if key in self._pending or self.store.seen(product_name, price):
+                self.stats.duplicates += 1
+                return False
+            self._pending.add(key)
+            self.stats.queued += 1
+        self._queue.put((product_name, price, link))
+        return True
+
+    def close(self):
+        """
+        Sends everything still queued and stops the worker thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        if self._owns_store:
+            self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        buffer = []
+        stopping = False
+        while not stopping:
+            # Digest mode holds everything until close(); "each" mode flushes
+            # once the queue has been quiet for flush_seconds
+            timeout = None if self.mode == "digest" or not buffer else self.flush_seconds
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            if item is None:
+                stopping = True
+            elif item:
+                buffer.append(item)
+                continue
+            if buffer:
+                self._flush(buffer)
+                buffer = []
+
+    def _flush(self, deals):
+        sender, password, receiver = load_credentials()
+        if self.mode == "digest":
+            messages = [(deals, build_digest_message(deals, sender, receiver))]
+        else:
+            messages = [([deal], build_alert_message(*deal, sender, receiver)) for deal in deals]
+
+        start = time.perf_counter()
+        handled = 0
+        try:
+            with open_smtp(sender, password) as smtp:
+                self.stats.sessions += 1
+                for batch, msg in messages:
+                    handled += len(batch)
+                    try:
+                        send_message(smtp, msg)
+                        self.stats.sent += len(batch)
+                        self.store.record(batch)
+                    except Exception as e:
+                        self.stats.failed += len(batch)
+                        print(f"❌ Failed to send alert: {e}")
+        except Exception as e:
+            # Unsent deals aren't marked, so the next run tries them again
+            self.stats.failed += len(deals) - handled
+            print(f"❌ Failed to send email: {e}")
+            return
+        print(f"✅ {len(deals)} alert(s) sent to {receiver} in {time.perf_counter() - start:.2f}s")
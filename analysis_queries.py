@@ -1,38 +1,61 @@
 import sqlite3
 import pandas as pd
+from db import table_columns
+from snapshots import USE_SNAPSHOT, read_snapshot
+from summaries import AVAILABILITY_SQL, OVERALL_STATS_SQL, TOP_EXPENSIVE_SQL
 
-# Connect to your database
-conn = sqlite3.connect("market_analyzer.db")
+if USE_SNAPSHOT:
+    # Local analytics: read the Parquet snapshot (see snapshots.py) instead of the database.
+    # Only the three columns the questions need are decoded.
+    df = read_snapshot(columns=["title", "price", "availability"])
+    avg_price = pd.DataFrame({"average_price": [df["price"].mean()]})
+    inventory = (df["availability"].astype(object).fillna("Unknown")
+                 .value_counts().rename_axis("availability").reset_index(name="count"))
+    top_books = df.nlargest(3, "price")[["title", "price"]].rename(columns={"title": "product_name"})
+else:
+    # Connect to your database
+    conn = sqlite3.connect("market_analyzer.db")
+
+    # Read-only report: the loader keeps the summary tables up to date, so when they
+    # exist none of the questions below has to scan the raw book_prices table.
+    # A database that was never loaded through loader.py gets the old scans.
+    summarized = bool(table_columns(conn, "price_daily_stats"))
+
+    # Question 1: What is the average price of all books?
+    # LOGIC: SUM of the daily sums / SUM of the daily counts (same as AVG() over every row)
+    q1 = OVERALL_STATS_SQL if summarized else "SELECT AVG(price) as average_price FROM book_prices;"
+    avg_price = pd.read_sql(q1, conn)[["average_price"]]
+
+    # Question 2: How many books are 'In Stock' vs other statuses?
+    # LOGIC: Adds up the per-day GROUP BY counts kept by the loader
+    q2 = AVAILABILITY_SQL if summarized else """
+    SELECT availability, COUNT(*) as count 
+    FROM book_prices 
+    GROUP BY availability;
+    """
+    inventory = pd.read_sql(q2, conn)
+
+    # Question 3: What are the top 3 most expensive books?
+    # LOGIC: ORDER BY and LIMIT over the per-day top-N lists (Crucial for ranking)
+    q3 = TOP_EXPENSIVE_SQL.format(n=3) if summarized else """
+    SELECT product_name, price 
+    FROM book_prices 
+    ORDER BY price DESC 
+    LIMIT 3;
+    """
+    top_books = pd.read_sql(q3, conn)
+
+    conn.close()
 
 print("--- ANALYST REPORT ---\n")
 
-# Question 1: What is the average price of all books?
-# LOGIC: Uses Aggregate function AVG()
-q1 = "SELECT AVG(price) as average_price FROM book_prices;"
 print("1. Average Book Price:")
-print(pd.read_sql(q1, conn))
+print(avg_price)
 print("-" * 30)
 
-# Question 2: How many books are 'In Stock' vs other statuses?
-# LOGIC: Uses GROUP BY to categorize data
-q2 = """
-SELECT availability, COUNT(*) as count 
-FROM book_prices 
-GROUP BY availability;
-"""
 print("2. Inventory Count:")
-print(pd.read_sql(q2, conn))
+print(inventory)
 print("-" * 30)
 
-# Question 3: What are the top 3 most expensive books?
-# LOGIC: Uses ORDER BY and LIMIT (Crucial for ranking)
-q3 = """
-SELECT product_name, price 
-FROM book_prices 
-ORDER BY price DESC 
-LIMIT 3;
-"""
 print("3. Most Expensive Books:")
-print(pd.read_sql(q3, conn))
-
-conn.close()
\ No newline at end of file
+print(top_books)
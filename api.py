@@ -1,35 +1,152 @@
-import os
-from typing import Optional
-from fastapi import FastAPI
-from sqlalchemy import create_engine
-import pandas as pd
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import Dict, List, Optional
+import numpy as np
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from db import dispose_async_engine, dispose_engine, get_async_engine, get_engine, pool_status
+from instrumentation import metrics
+from summaries import OVERALL_STATS_SQL
+from response_cache import (CACHE_CONTROL, CURRENT_VERSION_SQL, ResponseCache, VersionTracker,
+                            etag_matches, make_key)
+from price_queries import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_prices_query, dumps,
+                           encode_cursor, ndjson_lines, rows_to_dicts)
+from title_index import MAX_PREFIX_MATCHES, TitleIndex, TitleIndexHolder
+from scenarios import MAX_SCENARIOS, cost_column, evaluate, scenario_grid
+from price_history import (HISTORY_POINTS_LIMIT, MAX_HISTORY_POINTS, history_layout, history_payload,
+                           history_query, matching_rows)
 
-# 1. Create the App
+NDJSON_BATCH_ROWS = 1000  # Rows fetched and written per streamed chunk
+MAX_LOOKUP_ITEMS = 10000  # Titles + ids per /prices/lookup call
+
+# 1. Lifespan: one pooled engine for the whole process
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        get_engine()  # Pool settings come from DB_POOL_* env vars (see db.py)
+        get_async_engine()  # Reads go through asyncpg/aiosqlite when installed
+    except Exception as e:
+        # Keep serving "/" and "/docs"; data endpoints will report the error
+        print(f"❌ Database Engine Error: {e}")
+    try:
+        # Warm the lookup index so the first /prices/lookup doesn't pay for the scan
+        index = await run_in_threadpool(title_index.get, await ingestion_version.current_async())
+        print(f"📇 Title index ready: {len(index)} products")
+    except Exception as e:
+        print(f"⚠️ Title index not built at startup (built on first lookup): {e}")
+    yield
+    await dispose_async_engine()
+    dispose_engine()
+
+# 2. Create the App
 app = FastAPI(
     title="Market Intelligence API",
     description="A live data feed for competitor book prices.",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
-# 2. Database Connection (Smart Version)
-def get_db_connection():
-    # A. First, try to get the URL from Render's Environment Variables
-    db_url = os.getenv("DB_URL")
-    
-    # B. If that fails (meaning we are on Localhost), try importing config.py
-    if not db_url:
-        try:
-            import config
-            db_url = config.DB_URL
-        except ImportError:
-            # If neither works, we have a problem
-            raise Exception("Database URL not found! Set DB_URL var or create config.py.")
-
-    # C. Fix potential "postgres://" typo (common in cloud apps)
-    if db_url and db_url.startswith("postgres://"):
-        db_url = db_url.replace("postgres://", "postgresql://", 1)
-
-    return create_engine(db_url)
+# 3. Read helpers: the async engine when available, otherwise the sync one in a worker thread,
+# so a slow database never blocks the event loop
+def _fetch_all_sync(sql, params):
+    with get_engine().connect() as conn:
+        result = conn.execute(text(sql), params)
+        return list(result.keys()), result.fetchall()
+
+async def fetch_all(sql, params=None):
+    """
+    Runs a read query and returns (column names, rows).
+    """
+    params = params or {}
+    engine = get_async_engine()
+    if engine is None:
+        return await run_in_threadpool(_fetch_all_sync, sql, params)
+    async with engine.connect() as conn:
+        result = await conn.execute(text(sql), params)
+        return list(result.keys()), result.fetchall()
+
+# Response cache, invalidated whenever the loader records a new ingestion batch
+async def fetch_ingestion_version():
+    _, rows = await fetch_all(CURRENT_VERSION_SQL)
+    return rows[0][0] if rows else None
+
+response_cache = ResponseCache()
+ingestion_version = VersionTracker(fetch_ingestion_version)
+
+# Latest price per product for /prices/lookup, rebuilt when the ingestion batch changes
+title_index = TitleIndexHolder(lambda version: TitleIndex.load(get_engine(), version))
+
+# Which history query fits the database (legacy table, normalized schema or SQLite), looked up once
+_history_layout = None
+
+def _detect_history_layout():
+    with get_engine().connect() as conn:
+        return history_layout(conn.connection.dbapi_connection)
+
+async def get_history_layout():
+    global _history_layout
+    if _history_layout is None:
+        _history_layout = await run_in_threadpool(_detect_history_layout)
+    return _history_layout
+
+async def cached_json(request, endpoint, params, build):
+    """
+    Serves `await build()` from the cache while the ingestion batch is unchanged.
+    Adds ETag / Cache-Control, and answers 304 when the client already has it.
+    """
+    version = await ingestion_version.current_async()
+    key = make_key(endpoint, params)
+    entry = response_cache.get(key, version) if version is not None else None
+
+    if entry is None:
+        payload = await build()
+        if "error" in payload or version is None:
+            return payload  # Never cache failures or responses we can't version
+        entry = response_cache.put(key, version, dumps(payload))
+
+    headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+# 4. Metrics: request latency per endpoint, and how much of it was spent in the database
+current_scope = ContextVar("current_scope", default=None)
+
+def _endpoint_label(scope):
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    metrics.observe("db_query_duration_seconds", seconds, endpoint=_endpoint_label(current_scope.get()))
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    current_scope.set(request.scope)  # Routing fills in scope["route"] for the DB timer above
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        endpoint = _endpoint_label(request.scope)
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - start,
+                        endpoint=endpoint, method=request.method)
+        metrics.inc("http_requests_total", endpoint=endpoint, method=request.method, status=status)
 
 # --- ENDPOINTS ---
 
@@ -37,30 +154,233 @@ def get_db_connection():
 def home():
     return {"message": "Welcome to the Market Intelligence API. Go to /docs to test it."}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus text format: request/DB latency histograms and counters.
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+def health():
+    async_engine = get_async_engine()
+    return {
+        "status": "ok",
+        "pool": pool_status(),
+        "async_pool": pool_status(async_engine) if async_engine is not None else None,
+        "response_cache": response_cache.stats(),
+        "title_index": len(title_index.index) if title_index.index is not None else None,
+    }
+
 @app.get("/prices")
-def get_prices(max_price: Optional[float] = None):
+async def get_prices(
+    request: Request,
+    max_price: Optional[float] = None,
+    min_price: Optional[float] = None,
+    source: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Price history, filtered in SQL and ordered by (created_at, id).
+    JSON returns one page plus `next_cursor`; pass it back as `cursor` for
+    the next page. format=ndjson streams every matching row line by line.
+    """
+    try:
+        filters = dict(min_price=min_price, max_price=max_price, source=source,
+                       title_prefix=title_prefix, since=since, until=until, cursor=cursor)
+
+        if format == "ndjson":
+            sql, params = build_prices_query(limit=limit, **filters)
+            engine = get_async_engine()
+
+            async def stream_rows():
+                # Server-side cursor: rows are sent as they arrive, never held all at once
+                async with engine.connect() as conn:
+                    result = await conn.stream(text(sql), params)
+                    keys = list(result.keys())
+                    async for rows in result.partitions(NDJSON_BATCH_ROWS):
+                        yield ndjson_lines(keys, rows)
+
+            def stream_rows_sync():
+                with get_engine().connect() as conn:
+                    result = conn.execution_options(stream_results=True, yield_per=NDJSON_BATCH_ROWS).execute(
+                        text(sql), params)
+                    keys = list(result.keys())
+                    for rows in result.partitions():
+                        yield ndjson_lines(keys, rows)
+
+            body = stream_rows() if engine is not None else stream_rows_sync()
+            return StreamingResponse(body, media_type="application/x-ndjson")
+
+        async def build():
+            page_size = limit or DEFAULT_PAGE_SIZE
+            # Fetch one extra row to know whether another page exists
+            sql, params = build_prices_query(limit=page_size + 1, **filters)
+            keys, rows = await fetch_all(sql, params)
+
+            next_cursor = None
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+            # Cursor tuples go straight to the JSON encoder, no per-value conversion in Python
+            data = rows_to_dicts(keys, rows)
+            return {"count": len(data), "limit_applied": max_price, "next_cursor": next_cursor, "data": data}
+
+        return await cached_json(request, "/prices", dict(filters, limit=limit), build)
+    except Exception as e:
+        return {"error": str(e)}
+
+class LookupRequest(BaseModel):
+    titles: List[str] = Field(default_factory=list, max_length=MAX_LOOKUP_ITEMS)
+    ids: List[int] = Field(default_factory=list, max_length=MAX_LOOKUP_ITEMS)
+    match: str = Field("exact", pattern="^(exact|prefix)$")
+    sources: Optional[List[str]] = None
+    limit: int = Field(MAX_PREFIX_MATCHES, ge=1, le=MAX_PREFIX_MATCHES)  # Matches per prefix query
+
+@app.post("/prices/lookup")
+async def lookup_prices(body: LookupRequest):
+    """
+    Current price per source for many products in one call. Titles match
+    case-insensitively (match=exact) or by title prefix (match=prefix);
+    ids are product ids (row ids on the legacy table). Answered from an
+    in-memory index, never from a table scan.
+    """
     try:
-        engine = get_db_connection()
-        df = pd.read_sql("SELECT * FROM book_prices", engine)
-        
-        if max_price is not None:
-            df = df[df['price'] <= max_price]
-        
-        data = df.to_dict(orient="records")
-        return {"count": len(data), "limit_applied": max_price, "data": data}
+        if len(body.titles) + len(body.ids) > MAX_LOOKUP_ITEMS:
+            return {"error": f"At most {MAX_LOOKUP_ITEMS} titles + ids per request"}
+        version = await ingestion_version.current_async()
+        if title_index.needs_rebuild(version):
+            index = await run_in_threadpool(title_index.get, version)
+        else:
+            index = title_index.index
+
+        results = index.lookup(body.titles, body.ids, match=body.match, sources=body.sources, limit=body.limit)
+        payload = {
+            "count": sum(len(r["matches"]) for r in results),
+            "version": index.version,
+            "results": results,
+        }
+        return Response(dumps(payload), media_type="application/json")
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/prices/{product:path}/history")
+async def get_price_history(
+    request: Request,
+    product: str,
+    source: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    bucket: str = Query("auto", pattern="^(auto|raw|day|week|month|lttb)$"),
+    max_points: int = Query(MAX_HISTORY_POINTS, ge=10, le=HISTORY_POINTS_LIMIT),
+):
+    """
+    One product's price per source between `since` and `until` (run dates,
+    inclusive). `product` is the title, matched case-insensitively.
+    Long ranges come back as weekly/monthly OHLC buckets (bucket=auto) or
+    LTTB-reduced points, never more than `max_points` per source.
+    """
+    try:
+        params = dict(product=product, source=source, since=since, until=until,
+                      bucket=bucket, max_points=max_points)
+
+        async def build():
+            layout = await get_history_layout()
+            sql, query_params = history_query(layout, product, source, since, until)
+            _, rows = await fetch_all(sql, query_params)
+            rows = matching_rows(layout, product, rows)
+            # Bucketing is pandas work: keep it off the event loop
+            return await run_in_threadpool(history_payload, product, rows, bucket, max_points)
+
+        return await cached_json(request, "/prices/history", params, build)
+    except Exception as e:
+        return {"error": str(e)}
+
+class ScenarioRequest(BaseModel):
+    target_margins: List[float] = Field(..., min_length=1)
+    costs: Optional[List[float]] = None  # Flat unit cost per scenario...
+    cost_factors: Optional[List[float]] = None  # ...or multipliers for product_costs (never both)
+    product_costs: Optional[Dict[str, float]] = None  # Title -> unit cost
+    default_cost: Optional[float] = None  # For products missing from product_costs (else they're left out)
+    sources: Optional[List[str]] = None
+    baseline: int = Field(0, ge=0)  # Scenario that flips are counted against
+
+def run_scenarios(index, body):
+    records, prices = index.price_table()
+    if body.sources:
+        sources = set(body.sources)
+        keep = [i for i, r in enumerate(records) if r["source"] in sources]
+        records, prices = [records[i] for i in keep], prices[keep]
+
+    # Each pricing mode takes its own inputs; a mixed request is an error rather than half ignored
+    if body.product_costs is not None and body.costs:
+        raise ValueError("Pass costs or product_costs, not both (default_cost covers products missing from the table)")
+    if body.product_costs is None and (body.cost_factors or body.default_cost is not None):
+        raise ValueError("cost_factors and default_cost only apply with product_costs")
+
+    product_costs = None
+    if body.product_costs is not None:
+        grid = scenario_grid(body.target_margins, cost_factors=body.cost_factors or [1.0])
+        product_costs = cost_column([r["title"] for r in records], body.product_costs)
+        if body.default_cost is not None:
+            grid["my_cost"] = body.default_cost
+        else:
+            known = ~np.isnan(product_costs)
+            prices, product_costs = prices[known], product_costs[known]
+    elif body.costs:
+        grid = scenario_grid(body.target_margins, costs=body.costs)
+    else:
+        raise ValueError("Pass costs, or product_costs (with optional cost_factors)")
+
+    if len(grid) > MAX_SCENARIOS:
+        raise ValueError(f"At most {MAX_SCENARIOS} scenarios per request, got {len(grid)}")
+    if body.baseline >= len(grid):
+        raise ValueError(f"baseline must be a scenario index below {len(grid)}")
+    result = evaluate(prices, grid, product_costs=product_costs, baseline=body.baseline)
+    return {
+        "products": len(prices),
+        "version": index.version,
+        "baseline": body.baseline,
+        "scenarios": result.summary.to_dict("records"),
+    }
+
+@app.post("/scenarios")
+async def price_scenarios(body: ScenarioRequest):
+    """
+    What-if sweep of the margin rules over the latest price of every
+    product: every cost (or cost factor) x target margin combination,
+    with CRITICAL / LOW / GREEN counts per scenario and how many products
+    flip recommendation compared with the `baseline` scenario.
+    """
+    try:
+        version = await ingestion_version.current_async()
+        index = await run_in_threadpool(title_index.get, version)
+        payload = await run_in_threadpool(run_scenarios, index, body)
+        return Response(dumps(payload), media_type="application/json")
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/stats")
-def get_stats():
+async def get_stats(request: Request):
     try:
-        engine = get_db_connection()
-        df = pd.read_sql("SELECT price FROM book_prices", engine)
-        
-        return {
-            "average_price": round(df['price'].mean(), 2),
-            "lowest_price": df['price'].min(),
-            "highest_price": df['price'].max()
-        }
+        async def build():
+            # Reads the per-day summary table the loader maintains, not the raw history
+            keys, rows = await fetch_all(OVERALL_STATS_SQL)
+            stats = dict(zip(keys, rows[0]))
+
+            average = stats["average_price"]
+            return {
+                "average_price": round(float(average), 2) if average is not None else None,
+                "lowest_price": float(stats["lowest_price"]) if stats["lowest_price"] is not None else None,
+                "highest_price": float(stats["highest_price"]) if stats["highest_price"] is not None else None
+            }
+
+        return await cached_json(request, "/stats", {}, build)
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import notifications
+from alert_dispatcher import AlertDispatcher, AlertStore, create_alert_table
+from fixture_smtp import serve_fixture_smtp
+
+# --- ALERT BENCHMARK ---
+# Sends N deals through a local SMTP stand-in (with a simulated handshake
+# delay) three ways: the old one-connection-per-deal send_email_alert, the
+# dispatcher in "each" mode and in "digest" mode. Also checks that a second
+# run with the same deals, on a new connection to the same alert log (a
+# SQLite stand-in for the production DB), sends nothing.
+
+
+def make_deals(n):
+    return [(f"Book {i}", round(10 + i * 0.37, 2), f"http://books.toscrape.com/catalogue/book_{i}/index.html")
+            for i in range(n)]
+
+
+def point_at(host, port):
+    notifications.SMTP_HOST, notifications.SMTP_PORT, notifications.SMTP_SSL = host, port, False
+    os.environ.setdefault("EMAIL_SENDER", "bot@example.com")
+    os.environ.setdefault("EMAIL_RECEIVER", "me@example.com")
+
+
+def run_legacy(deals):
+    start = time.perf_counter()
+    for deal in deals:
+        notifications.send_email_alert(*deal)
+    return time.perf_counter() - start
+
+
+def run_dispatcher(deals, mode, db_path):
+    # The dispatcher thread records sent deals on the same connection
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    create_alert_table(conn)
+    store = AlertStore(conn=conn)
+    start = time.perf_counter()
+    dispatcher = AlertDispatcher(mode=mode, store=store, flush_seconds=0.2)
+    for deal in deals:
+        dispatcher.enqueue(*deal)
+    enqueue_seconds = time.perf_counter() - start
+    dispatcher.close()
+    conn.close()
+    return enqueue_seconds, time.perf_counter() - start, dispatcher.stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the alert dispatcher against per-deal SMTP.")
+    parser.add_argument("--deals", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated SMTP handshake delay (seconds)")
+    args = parser.parse_args()
+    deals = make_deals(args.deals)
+
+    print("--- ALERT BENCHMARK ---")
+    with tempfile.TemporaryDirectory() as tmp, serve_fixture_smtp(latency=args.latency) as (host, port, recorder):
+        point_at(host, port)
+
+        seconds = run_legacy(deals)
+        print(f"legacy  : {seconds:6.2f}s blocking, {recorder.connections} connections, {len(recorder.messages)} emails")
+
+        for mode in ("each", "digest"):
+            recorder.connections, recorder.messages = 0, []
+            db_path = os.path.join(tmp, f"{mode}.db")
+            enqueued, total, stats = run_dispatcher(deals, mode, db_path)
+            print(f"{mode:<8}: {enqueued * 1000:6.2f}ms blocking ({total:.2f}s to drain), "
+                  f"{recorder.connections} connections, {len(recorder.messages)} emails")
+            if stats.sent != len(deals) or stats.failed:
+                raise AssertionError(f"{mode}: sent {stats.sent} of {len(deals)} alerts, {stats.failed} failed")
+
+            # Same deals again: all deduplicated, nothing sent
+            recorder.connections, recorder.messages = 0, []
+            _, _, stats = run_dispatcher(deals, mode, db_path)
+            if stats.duplicates != len(deals) or recorder.connections:
+                raise AssertionError(f"{mode} re-run: {stats.duplicates} of {len(deals)} deduplicated, "
+                                     f"{recorder.connections} SMTP connections opened")
+            print(f"{'':<8}  re-run: {stats.duplicates} duplicates skipped, {recorder.connections} connections")
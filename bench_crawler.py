@@ -0,0 +1,54 @@
+import argparse
+import os
+import tempfile
+import time
+
+from fixture_site import BOOKS_PER_PAGE, serve_fixture_site
+from sources import BOOKS_TO_SCRAPE, PER_DOMAIN_LIMIT, HtmlSource, Scheduler
+
+# --- CRAWLER THROUGHPUT BENCHMARK ---
+# Serves an offline copy of books.toscrape.com on localhost and crawls it
+# through sources.Scheduler (the crawler main.py runs) with different
+# worker counts, so we can measure the speed-up of concurrent fetching
+# without touching the network. The fixture is one domain, so past
+# PER_DOMAIN_LIMIT workers the per-domain cap is what bounds the speed-up.
+
+
+def run_crawl(base_url, workers, pages, follow_details, rate, state_file):
+    source = HtmlSource("Fixture", [base_url], page_url="catalogue/page-{n}.html",
+                        detail_selectors=BOOKS_TO_SCRAPE.detail_selectors, follow_details=follow_details,
+                        rate=rate, burst=max(workers, 1))
+    scheduler = Scheduler([source], max_concurrency=workers, state_file=state_file)
+    start = time.perf_counter()
+    result = scheduler.run([source])[source.name]
+    elapsed = time.perf_counter() - start
+    scheduler.close()
+
+    if result.error is not None:
+        raise AssertionError(f"Crawl failed: {result.error}")
+    data = result.rows
+    expected = pages * BOOKS_PER_PAGE
+    if len(data) != expected:
+        raise AssertionError(f"Expected {expected} products, crawled {len(data)}")
+    if not all(link.startswith(base_url) for _, _, link in data):
+        raise AssertionError("Crawled links must be absolute URLs on the fixture site")
+    return elapsed, len(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the catalogue crawler against a local fixture site.")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated server latency per request (seconds)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--details", action="store_true", help="Also follow every product detail page")
+    parser.add_argument("--rate", type=float, default=1000,
+                        help="Requests/second allowed on the fixture domain (high, so the token bucket stays out of the way)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, serve_fixture_site(pages=args.pages, latency=args.latency) as base_url:
+        print(f"🧪 Fixture site: {base_url} ({args.pages} pages, {args.latency * 1000:.0f} ms latency, "
+              f"at most {PER_DOMAIN_LIMIT} requests in flight per domain)")
+        for workers in args.workers:
+            state_file = os.path.join(tmp, f"state_{workers}.json")
+            elapsed, products = run_crawl(base_url, workers, args.pages, args.details, args.rate, state_file)
+            print(f"   workers={workers:<3} {elapsed:6.2f}s  {products / elapsed:8.1f} products/sec")
@@ -0,0 +1,98 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from loader import ensure_schema, load_rows
+
+# --- LOADER BENCHMARK ---
+# Compares the old "executemany INSERT" upload from main.py with the bulk
+# COPY/upsert loader, in rows/sec. SQLite always runs; Postgres runs when
+# BENCH_DB_URL is set. Postgres tables are created in a throw-away
+# `loader_bench` schema, so the real book_prices table is never touched.
+
+BENCH_SCHEMA = "loader_bench"
+
+
+def make_rows(n, seed=7):
+    rng = random.Random(seed)
+    return [(f"Book {i}", round(rng.uniform(5, 60), 2), f"http://books.toscrape.com/catalogue/book_{i}/index.html")
+            for i in range(n)]
+
+
+def sqlite_rows(rows, scraped_at="2024-01-01 09:00:00"):
+    """
+    The same books as store_to_db.py rows: (product_name, price, availability, scraped_at).
+    """
+    return [(title, price, "In stock", scraped_at) for title, price, _ in rows]
+
+
+def legacy_insert(conn, rows, marker):
+    cursor = conn.cursor()
+    cursor.executemany(f"INSERT INTO book_prices (title, price, link) VALUES ({marker}, {marker}, {marker})", rows)
+    conn.commit()
+    cursor.close()
+
+
+def timed(label, func, n):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<32} {elapsed:7.2f}s  {n / elapsed:10.0f} rows/sec")
+
+
+def bench_sqlite(rows):
+    print("🗄️ SQLite")
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "legacy.db"))
+        conn.execute("CREATE TABLE book_prices (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, price REAL, link TEXT)")
+        timed("executemany INSERT (old path)", lambda: legacy_insert(conn, rows, "?"), len(rows))
+        conn.close()
+
+        conn = sqlite3.connect(os.path.join(tmp, "loader.db"))
+        ensure_schema(conn)
+        loader_rows = sqlite_rows(rows)  # SQLite's default loader columns, as store_to_db.py sends them
+        timed("load_rows upsert", lambda: load_rows(conn, loader_rows, "Bench"), len(rows))
+        timed("load_rows upsert (re-run)", lambda: load_rows(conn, loader_rows, "Bench"), len(rows))
+        conn.close()
+
+
+def bench_postgres(db_url, rows):
+    import psycopg2
+
+    print("🐘 Postgres")
+    conn = psycopg2.connect(db_url)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    cursor.execute(f"SET search_path TO {BENCH_SCHEMA}")
+    conn.commit()
+    try:
+        ensure_schema(conn)
+        timed("executemany INSERT (old path)", lambda: legacy_insert(conn, rows, "%s"), len(rows))
+        cursor.execute("TRUNCATE book_prices")
+        conn.commit()
+        timed("load_rows COPY + upsert", lambda: load_rows(conn, rows, "Bench"), len(rows))
+        timed("load_rows COPY + upsert (re-run)", lambda: load_rows(conn, rows, "Bench"), len(rows))
+    finally:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bulk loader against the old insert path.")
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"🧪 Loading {args.rows:,} rows")
+    bench_sqlite(rows)
+
+    db_url = os.getenv("BENCH_DB_URL")
+    if db_url:
+        bench_postgres(db_url, rows)
+    else:
+        print("ℹ️ Set BENCH_DB_URL to a scratch Postgres database to benchmark the COPY path too.")
@@ -0,0 +1,60 @@
+import argparse
+import random
+import string
+import time
+
+from matching import match_key, match_products
+
+# --- MATCHING BENCHMARK ---
+# Builds N synthetic titles for our site and a competitor copy of them with
+# the usual noise (upper case, punctuation, the odd typo), then times
+# match_products and checks how many pairs were recovered correctly.
+
+WORDS = [
+    "".join(random.Random(i).choices(string.ascii_lowercase, k=random.Random(i + 1).randint(3, 9)))
+    for i in range(20000)
+]
+
+
+def make_titles(n, seed=11):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(2, 7))).title() + f" #{i % 97}" for i in range(n)]
+
+
+def competitor_copy(title, rng, typo_rate):
+    noisy = title.upper() if rng.random() < 0.3 else title.lower()
+    noisy = noisy.replace(" ", "  ", 1) + rng.choice(["", ".", " (Paperback)"] if rng.random() < 0.2 else [""])
+    if rng.random() < typo_rate:
+        pos = rng.randrange(len(noisy))
+        noisy = noisy[:pos] + rng.choice(string.ascii_lowercase) + noisy[pos + 1:]
+    return noisy
+
+
+def run(n, typo_rate):
+    rng = random.Random(3)
+    ours = make_titles(n)
+    theirs = [competitor_copy(t, rng, typo_rate) for t in ours]
+    truth = {match_key(t): match_key(c) for t, c in zip(ours, theirs)}
+    rng.shuffle(theirs)
+
+    start = time.perf_counter()
+    matches = match_products(ours, theirs)
+    elapsed = time.perf_counter() - start
+
+    exact = (matches["method"] == "exact").sum()
+    fuzzy = (matches["method"] == "fuzzy").sum()
+    correct = sum(truth.get(a) == b for a, b in zip(matches["product_key"], matches["competitor_key"]))
+    print(f"{n:>8} x {n:<8} {elapsed:7.2f}s   matched {len(matches)} ({exact} exact, {fuzzy} fuzzy), "
+          f"{correct / max(len(matches), 1):.1%} correct")
+    return matches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cross-source product matching.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated catalogue sizes")
+    parser.add_argument("--typo-rate", type=float, default=0.1, help="Share of competitor titles with a typo")
+    args = parser.parse_args()
+
+    print("--- MATCHING BENCHMARK ---")
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.typo_rate)
@@ -0,0 +1,97 @@
+import argparse
+import glob
+import multiprocessing
+import resource
+import time
+
+from extractors import BACKENDS, get_extractor
+
+# --- HTML PARSER BENCHMARK ---
+# Runs every extraction backend over the saved pages in fixtures/ and reports
+# products/sec and peak memory. Each backend runs in its own process so the
+# peak RSS of one parser doesn't hide the other's. Every product on every
+# page must come out the same from every backend; any difference exits 1.
+
+
+def load_pages(pattern):
+    pages = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def bench_backend(name, pages, repeats, results):
+    extractor = get_extractor(name)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    products = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for page in pages:
+            products += len(extractor.extract(page))
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results[name] = {
+        "products": products,
+        "seconds": elapsed,
+        "products_per_sec": products / elapsed,
+        "peak_mem_delta_mb": (peak_kb - baseline_kb) / 1024,
+        "extracted": [extractor.extract(page) for page in pages],
+    }
+
+
+def first_difference(reference, other):
+    """
+    (page, product, what differs) for the first mismatch, or None.
+    """
+    for page_no, (expected, actual) in enumerate(zip(reference, other)):
+        if len(expected) != len(actual):
+            return page_no, None, f"{len(expected)} vs {len(actual)} products"
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            if a != b:
+                return page_no, i, f"{a} vs {b}"
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare HTML extraction backends on saved fixture pages.")
+    parser.add_argument("--pages", default="fixtures/*.html", help="Glob of saved listing pages")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    if not pages:
+        raise SystemExit(f"No fixture pages match {args.pages}")
+    print(f"🧪 {len(pages)} fixture pages x {args.repeats} repeats")
+
+    manager = multiprocessing.Manager()
+    results = manager.dict()
+    for name in args.backends:
+        worker = multiprocessing.Process(target=bench_backend, args=(name, pages, args.repeats, results))
+        worker.start()
+        worker.join()
+        if name not in results:
+            print(f"   {name:<6} failed (is it installed?)")
+            continue
+        r = results[name]
+        print(f"   {name:<6} {r['products_per_sec']:10.0f} products/sec   "
+              f"peak mem +{r['peak_mem_delta_mb']:.1f} MB   ({r['products']} products in {r['seconds']:.2f}s)")
+
+    # Every backend must extract exactly the same fields, for every product
+    names = [name for name in args.backends if name in results]
+    if not names:
+        raise SystemExit("❌ No backend ran")
+    disagree = False
+    for name in names[1:]:
+        difference = first_difference(results[names[0]]["extracted"], results[name]["extracted"])
+        if difference is not None:
+            page_no, product, detail = difference
+            where = f"page {page_no}" + (f", product {product}" if product is not None else "")
+            print(f"❌ {names[0]} and {name} disagree on {where}: {detail}")
+            disagree = True
+    if disagree:
+        raise SystemExit(1)
+    print(f"✅ {len(names)} backend(s) agree on all {sum(len(p) for p in results[names[0]]['extracted'])} products")
@@ -0,0 +1,56 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from pricing import apply_recommendations
+from scenarios import evaluate, scenario_grid
+
+# --- SCENARIO ENGINE BENCHMARK ---
+# Times a cost x margin sweep over N synthetic prices: scenarios.evaluate
+# (all scenarios in one broadcast pass) against calling the dashboard's
+# apply_recommendations once per scenario. The per-scenario loop also
+# checks that both give the same recommendation for every product.
+
+
+def make_prices(n, seed=5):
+    rng = np.random.default_rng(seed)
+    prices = np.round(rng.uniform(5, 60, n), 2)
+    prices[::997] = np.nan  # A few unknown prices, like real scrapes
+    return prices
+
+
+def per_scenario(prices, grid, result=None):
+    df = pd.DataFrame({"price": prices})
+    for i, (cost, target) in enumerate(zip(grid["my_cost"], grid["target_margin"])):
+        labels = apply_recommendations(df, cost, target)["recommendation"].to_numpy()
+        if result is not None and not (labels == result.labels(i)).all():
+            raise AssertionError(f"Scenario {i} ({cost}, {target}) disagrees with apply_recommendations")
+
+
+def timed(func):
+    start = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the what-if pricing scenario engine.")
+    parser.add_argument("--products", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--costs", type=int, default=20, help="Unit costs in the grid")
+    parser.add_argument("--margins", type=int, default=15, help="Target margins in the grid")
+    parser.add_argument("--check", type=int, default=30, help="Scenarios re-run one by one for the comparison")
+    args = parser.parse_args()
+
+    grid = scenario_grid(np.linspace(0, 50, args.margins), costs=np.linspace(5, 25, args.costs))
+    print(f"--- SCENARIO BENCHMARK ({len(grid)} scenarios) ---")
+    for n in args.products:
+        prices = make_prices(n)
+        result, seconds = timed(lambda: evaluate(prices, grid))
+        sample = grid.iloc[:: max(len(grid) // args.check, 1)].reset_index(drop=True)
+        sample_result = evaluate(prices, sample)
+        _, loop_seconds = timed(lambda: per_scenario(prices, sample, sample_result))
+        loop_total = loop_seconds / len(sample) * len(grid)
+        print(f"{n:>8} products   evaluate {seconds:6.3f}s ({n * len(grid) / seconds / 1e6:6.1f}M cells/sec)   "
+              f"one by one ~{loop_total:6.2f}s (from {len(sample)} scenarios)   x{loop_total / seconds:.0f}")
@@ -0,0 +1,91 @@
+import argparse
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+
+from fixture_site import BOOKS_PER_PAGE, serve_fixture_site
+from sources import HtmlSource, Scheduler
+
+# --- MULTI-SOURCE SCHEDULER BENCHMARK ---
+# Serves several offline fixture sites (each on its own port, so each is
+# its own rate-limited domain) and scrapes them one after another versus
+# all at once through the Scheduler. Half of the sites use the default
+# .product_pod extractor with a page-count template, the other half
+# explicit XPath selectors with "next" links, so both plugin styles are
+# checked for completeness as well as timed.
+
+NEXT_LINK_SELECTORS = {
+    "item": "//article[contains(@class, 'product_pod')]",
+    "title": "string(.//h3/a/@title)",
+    "price": "string(.//p[contains(@class, 'price_color')])",
+    "href": "string(.//h3/a/@href)",
+    "availability": "normalize-space(.//p[contains(@class, 'availability')])",
+}
+
+
+def make_sources(base_urls, rate, burst):
+    sources = []
+    for i, base_url in enumerate(base_urls):
+        if i % 2 == 0:
+            sources.append(HtmlSource(f"Site{i}", [base_url], page_url="catalogue/page-{n}.html",
+                                      rate=rate, burst=burst))
+        else:
+            sources.append(HtmlSource(f"Site{i}", [base_url + "catalogue/page-1.html"], selectors=NEXT_LINK_SELECTORS,
+                                      next_link="string(//li[@class='next']/a/@href)", page_count=None,
+                                      rate=rate, burst=burst))
+    return sources
+
+
+def check(results, pages):
+    expected = pages * BOOKS_PER_PAGE
+    for name, result in results.items():
+        if result.error is not None:
+            raise AssertionError(f"{name} failed: {result.error}")
+        rows = result.rows
+        if len(rows) != expected:
+            raise AssertionError(f"{name}: expected {expected} rows, got {len(rows)}")
+        if len({link for _, _, link in rows}) != expected:
+            raise AssertionError(f"{name}: duplicate or missing product links")
+    return sum(len(r.rows) for r in results.values())
+
+
+def timed(func):
+    start = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the multi-source scrape scheduler against local fixture sites.")
+    parser.add_argument("--sites", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated server latency per request (seconds)")
+    parser.add_argument("--rate", type=float, default=10, help="Requests/second allowed per site")
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, ExitStack() as stack:
+        base_urls = [stack.enter_context(serve_fixture_site(pages=args.pages, latency=args.latency))
+                     for _ in range(max(args.sites))]
+        print(f"🧪 {max(args.sites)} fixture sites, {args.pages} pages each, "
+              f"{args.latency * 1000:.0f} ms latency, {args.rate:g} req/s per site")
+
+        for n in args.sites:
+            sources = make_sources(base_urls[:n], args.rate, burst=2)
+            state_file = os.path.join(tmp, f"state_{n}.json")
+
+            scheduler = Scheduler(sources, max_concurrency=args.concurrency, state_file=state_file)
+            sequential = {}
+            _, seq_seconds = timed(lambda: [sequential.update(scheduler.run([s])) for s in sources])
+            scheduler.close()
+            products = check(sequential, args.pages)
+
+            scheduler = Scheduler(sources, max_concurrency=args.concurrency, state_file=state_file)
+            concurrent, con_seconds = timed(lambda: scheduler.run(sources))
+            scheduler.close()
+            check(concurrent, args.pages)
+
+            print(f"   sites={n:<3} one-by-one {seq_seconds:6.2f}s ({products / seq_seconds:8.1f} products/sec)   "
+                  f"scheduled {con_seconds:6.2f}s ({products / con_seconds:8.1f} products/sec)   "
+                  f"x{seq_seconds / con_seconds:.1f}")
@@ -0,0 +1,205 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+from urllib.parse import quote
+
+import pandas as pd
+
+from etl_pipeline import run_etl_process, run_etl_streaming
+from generate_fake_data import fill_history, write_messy_feed
+from pricing import apply_recommendations
+
+# --- END-TO-END BENCHMARK SUITE ---
+# Times the ETL, the DB load, /prices, /stats and the dashboard's
+# recommendation logic on synthetic data at several scales, and writes the
+# results as JSON (one file per run) so two commits can be compared.
+# SQLite always runs, including the API and the dashboard reader on a
+# SQLite stand-in (api.sqlite.*); the load/API/dashboard-reader stages also
+# run on Postgres when BENCH_DB_URL is set, inside a throw-away `bench_suite` schema.
+
+BENCH_SCHEMA = "bench_suite"
+RESULTS_FILE = "bench_results.json"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    def time(self, scale, stage, func, rows=None):
+        """
+        Runs `func` (its prints are swallowed), records and returns its result.
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            value = func()
+            seconds = time.perf_counter() - start
+        entry = {"scale": scale, "stage": stage, "seconds": round(seconds, 4)}
+        if rows:
+            entry["rows"] = rows
+            entry["rows_per_sec"] = round(rows / seconds, 1) if seconds else None
+        self.results.append(entry)
+        rate = f"{entry['rows_per_sec']:>12,.0f} rows/sec" if rows else ""
+        print(f"   {stage:<38} {seconds:8.3f}s {rate}")
+        return value
+
+    def time_load(self, scale, stage, func):
+        """
+        Like time(), for loaders that return how many rows they wrote.
+        """
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = func()
+        seconds = time.perf_counter() - start
+        self.results.append({"scale": scale, "stage": stage, "seconds": round(seconds, 4),
+                             "rows": rows, "rows_per_sec": round(rows / seconds, 1)})
+        print(f"   {stage:<38} {seconds:8.3f}s {rows / seconds:>12,.0f} rows/sec")
+        return rows
+
+
+def bench_etl(rec, scale, tmp, duplicate_rate):
+    feed = os.path.join(tmp, f"feed_{scale}.csv")
+    with contextlib.redirect_stdout(io.StringIO()):
+        raw_rows = len(write_messy_feed(feed, scale, days=1, duplicate_rate=duplicate_rate))
+    rec.time(scale, "etl.run_etl_process", lambda: run_etl_process(feed), raw_rows)
+    rec.time(scale, "etl.run_etl_streaming", lambda: run_etl_streaming(feed), raw_rows)
+
+
+def bench_sqlite(rec, scale, tmp, days):
+    conn = sqlite3.connect(os.path.join(tmp, f"history_{scale}.db"))
+    rec.time_load(scale, "load.sqlite", lambda: fill_history(conn, scale, days))
+
+    df = pd.read_sql("SELECT product_name AS title, price, source, run_date FROM book_prices", conn)
+    conn.close()
+    return df
+
+
+def _schema_url(db_url, schema):
+    separator = "&" if "?" in db_url else "?"
+    return f"{db_url}{separator}options={quote(f'-csearch_path={schema}')}"
+
+
+def bench_api(rec, scale, db_url, rows, prefix="api"):
+    """
+    /prices, /stats and the dashboard reader against `db_url`, through the
+    same pooled (and async) engines the API process uses.
+    """
+    import asyncio
+
+    from fastapi.testclient import TestClient
+
+    import api
+    from db import dispose_async_engine, dispose_engine, get_async_engine, get_engine
+    from incremental import IncrementalPriceReader
+
+    dispose_engine()
+    asyncio.run(dispose_async_engine())
+    engine = get_engine(db_url)
+    get_async_engine(db_url)  # The API reads through this one when asyncpg / aiosqlite is installed
+    api.title_index.index = None  # Built from the previous database; batch ids can coincide across them
+    dashboard = prefix.replace("api", "dashboard", 1)
+    with TestClient(api.app) as client:
+        for stage, path in (
+            ("prices_first_page", "/prices?limit=1000"),
+            ("prices_filtered", "/prices?source=BookWorld&max_price=20&limit=1000"),
+            ("stats", "/stats"),
+        ):
+            api.response_cache.clear()
+            rec.time(scale, f"{prefix}.{stage}.cold", lambda: client.get(path).raise_for_status())
+            rec.time(scale, f"{prefix}.{stage}.cached", lambda: client.get(path).raise_for_status())
+        rec.time(scale, f"{prefix}.prices_ndjson_full", lambda: client.get("/prices?format=ndjson").raise_for_status(),
+                 rows)
+
+    reader = IncrementalPriceReader(ttl=0)
+    rec.time(scale, f"{dashboard}.reader_full_load", lambda: reader.get(engine), rows)
+    rec.time(scale, f"{dashboard}.reader_refresh", lambda: reader.get(engine))
+    dispose_engine()
+
+
+def bench_api_sqlite(rec, scale, tmp, days):
+    """
+    The API on a SQLite stand-in with the Postgres columns (as in
+    load_test_api.py), so every run times the API, with or without Postgres.
+    """
+    from load_test_api import build_sqlite_standin
+
+    path = os.path.join(tmp, f"api_{scale}.db")
+    rows = build_sqlite_standin(path, scale, days)
+    bench_api(rec, scale, f"sqlite:///{path}", rows, prefix="api.sqlite")
+
+
+def bench_postgres(rec, scale, db_url, days):
+    import psycopg2
+
+    admin = psycopg2.connect(db_url)
+    cursor = admin.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    admin.commit()
+    try:
+        conn = psycopg2.connect(_schema_url(db_url, BENCH_SCHEMA))
+        rows = rec.time_load(scale, "load.postgres", lambda: fill_history(conn, scale, days))
+        conn.close()
+        # Stage names without a backend (api.*, dashboard.*) are the Postgres ones, as in earlier result files
+        bench_api(rec, scale, _schema_url(db_url, BENCH_SCHEMA), rows)
+    finally:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        admin.commit()
+        admin.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks at several data scales.")
+    parser.add_argument("--scales", default="1000,10000,100000", help="Comma-separated product counts")
+    parser.add_argument("--days", type=int, default=3, help="Days of history loaded per product")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--out", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    db_url = os.getenv("BENCH_DB_URL")
+    rec = Recorder()
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in (int(s) for s in args.scales.split(",")):
+            print(f"🧪 {scale:,} products x {args.days} days")
+            bench_etl(rec, scale, tmp, args.duplicate_rate)
+            history = bench_sqlite(rec, scale, tmp, args.days)
+            rec.time(scale, "dashboard.recommendations", lambda: apply_recommendations(history, 12.0, 20), len(history))
+            bench_api_sqlite(rec, scale, tmp, args.days)
+            if db_url:
+                bench_postgres(rec, scale, db_url, args.days)
+
+    if not db_url:
+        print("ℹ️ Postgres stages skipped (load.postgres, api.*, dashboard.reader_*): "
+              "set BENCH_DB_URL to a scratch Postgres database to run them. The api.sqlite.* stages ran.")
+
+    report = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "days": args.days,
+        "duplicate_rate": args.duplicate_rate,
+        "results": rec.results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
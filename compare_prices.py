@@ -1,24 +1,31 @@
 import sqlite3
-import pandas as pd
+from matching import compare_prices, load_observations, update_matches
+from snapshots import USE_SNAPSHOT, read_snapshot
 
 conn = sqlite3.connect("market_analyzer.db")
 
 # THE MONEY QUERY: Comparing Site A vs Site B
-# We join the table to ITSELF (Self Join) matching on product_name
-query = """
-SELECT 
-    T1.product_name,
-    T1.price as Price_BooksToScrape,
-    T2.price as Price_BookWorld,
-    (T1.price - T2.price) as price_difference
-FROM book_prices T1
-JOIN book_prices T2 ON T1.product_name = T2.product_name
-WHERE T1.source = 'BooksToScrape' 
-  AND T2.source = 'BookWorld'
-  AND T1.scraped_at = T2.scraped_at
-ORDER BY price_difference DESC;
-"""
+# Titles are matched on a normalized key (exact first, then fuzzy within
+# blocking buckets) instead of an exact product_name join; the mapping is
+# saved in product_matches so the next run only matches new titles.
+if USE_SNAPSHOT:
+    # Observations come from the local Parquet snapshot; only the match table lives in the DB
+    def snapshot_observations(source):
+        df = read_snapshot(columns=["title", "price", "created_at"], sources=[source])
+        return df.assign(title=df["title"].astype(str)).rename(columns={"created_at": "observed_at"})
+
+    site_a = snapshot_observations("BooksToScrape")
+    site_b = snapshot_observations("BookWorld")
+else:
+    site_a = load_observations(conn, "BooksToScrape")
+    site_b = load_observations(conn, "BookWorld")
+matches = update_matches(conn, site_a["title"], site_b["title"], "BooksToScrape", "BookWorld")
+
+# Each of our prices is compared with the nearest competitor price seen
+# within MATCH_WINDOW (default 1 day), not just the exact same timestamp
+df = compare_prices(site_a, site_b, matches)
+df = df.rename(columns={"title": "product_name", "price_a": "Price_BooksToScrape", "price_b": "Price_BookWorld"})
+df = df.sort_values("price_difference", ascending=False)
 
-df = pd.read_sql(query, conn)
 print(df.head(10)) # Show top 10 price differences
-conn.close()
\ No newline at end of file
+conn.close()
@@ -0,0 +1,44 @@
+import re
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- HTTP SESSION ---
+# The pooled, retrying session and request settings every scrape shares.
+# The crawling itself (pagination, per-domain limits, worker pool) is
+# sources.Scheduler.
+
+# --- CONFIGURATION ---
+MAX_RETRIES = 3            # Retries for connection errors and 429/5xx responses
+BACKOFF_FACTOR = 0.5       # Sleeps 0.5s, 1s, 2s... between retries
+REQUEST_TIMEOUT = 15       # Seconds
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# "Page 1 of 50" in the pager at the bottom of every catalogue page
+PAGER_PATTERN = re.compile(r"Page\s+\d+\s+of\s+(\d+)")
+
+
+def build_session(pool_size, retries=MAX_RETRIES, backoff=BACKOFF_FACTOR):
+    """
+    Creates a requests Session with a keep-alive connection pool of
+    `pool_size` (one per worker), plus automatic retry with exponential backoff.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
@@ -1,43 +1,60 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
+import plotly.graph_objects as go
+from db import get_db_url, get_engine
+from etl_pipeline import normalize_title
+from incremental import IncrementalPriceReader
+from pricing import RECOMMENDATION_COLORS, apply_recommendations
+from price_history import BUCKETS, downsample
+from scenarios import cost_column, evaluate, scenario_grid
+from snapshots import USE_SNAPSHOT, read_snapshot
 
 # --- PAGE SETUP ---
 st.set_page_config(page_title="Market Intelligence Pro", layout="wide")
 st.title("💰 Market Intelligence: Pricing Strategy Engine")
 
 # --- DATABASE CONNECTION ---
-def get_db_connection():
+def get_db_url_or_secret():
     """
-    1. Tries to load from local config.py (Laptop)
-    2. If that fails, loads from Streamlit Secrets (Cloud)
-    3. Fixes 'postgres://' typo automatically
+    Same lookup as the API and pipeline (env var, then config.py),
+    with Streamlit Secrets as the last resort on Streamlit Cloud.
     """
-    db_url = ""
-    try:
-        import config
-        db_url = config.DB_URL
-    except ImportError:
-        db_url = st.secrets["DB_URL"]
-
-    if db_url.startswith("postgres://"):
-        db_url = db_url.replace("postgres://", "postgresql://", 1)
-    return db_url
-
-# --- LOAD DATA ---
-try:
-    db_url = get_db_connection()
-    engine = create_engine(db_url)
-    
-    # Read the live table
-    df = pd.read_sql("SELECT * FROM book_prices", engine)
+    return get_db_url(fallback=lambda: st.secrets["DB_URL"])
+
+# --- LOAD DATA (CACHED) ---
+DATA_TTL_SECONDS = 300  # How often we look for rows newer than the last one we saw
 
-    # Timezone Adjustment (UTC -> IST)
+def to_ist(df):
+    """Timezone Adjustment (UTC -> IST), applied once per fetched batch."""
     time_col = 'created_at' if 'created_at' in df.columns else 'scraped_at'
     if time_col in df.columns:
         df[time_col] = pd.to_datetime(df[time_col])
         df[time_col] = df[time_col] + pd.Timedelta(hours=5, minutes=30)
+    return df
+
+@st.cache_resource
+def get_price_reader():
+    # One reader per server process: survives reruns and is shared by every session
+    return IncrementalPriceReader(ttl=DATA_TTL_SECONDS, prepare=to_ist)
+
+@st.cache_data(ttl=DATA_TTL_SECONDS)
+def load_snapshot():
+    # Local Parquet snapshot (USE_SNAPSHOT=1): no database needed, only these columns are read
+    df = read_snapshot(columns=['title', 'price', 'link', 'source', 'run_date', 'created_at'])
+    df['title'] = df['title'].astype(str)
+    return to_ist(df)
+
+try:
+    if USE_SNAPSHOT:
+        df = load_snapshot()
+    else:
+        # get_engine() is process-wide, so reruns of this script reuse the same pool
+        engine = get_engine(get_db_url_or_secret())
+
+        # Read the live table: full load once, then only rows past the (created_at, id) watermark
+        df = get_price_reader().get(engine)
 
     # --- 🧠 BUSINESS LOGIC SECTION (NEW) ---
     
@@ -50,23 +67,9 @@ try:
     # User inputs their Target Margin (Default 20%)
     target_margin = st.sidebar.slider("Minimum Profit Margin Target (%)", 0, 50, 20)
 
-    # 2. CALCULATION: Apply Business Rules
-    # Formula: Margin % = ((Price - Cost) / Price) * 100
-    df['margin_pct'] = ((df['price'] - my_cost) / df['price']) * 100
-    
-    # Round to 1 decimal place
-    df['margin_pct'] = df['margin_pct'].round(1)
-
-    # 3. RECOMMENDATION ENGINE
-    def get_recommendation(row):
-        if row['margin_pct'] < 0:
-            return "🛑 CRITICAL LOSS (Do Not Match)"
-        elif row['margin_pct'] < target_margin:
-            return "⚠️ LOW MARGIN (Proceed with Caution)"
-        else:
-            return "✅ GREEN LIGHT (Safe to Price Match)"
-
-    df['recommendation'] = df.apply(get_recommendation, axis=1)
+    # 2. CALCULATION + 3. RECOMMENDATION ENGINE
+    # Vectorized over the whole table (see pricing.py), so moving a slider is just array math
+    df = apply_recommendations(df, my_cost, target_margin)
 
     # --- DASHBOARD VISUALS ---
 
@@ -91,11 +94,7 @@ try:
         # Pie chart showing how many products are Safe vs Unsafe
         fig = px.pie(df, names='recommendation', title="Profitability Breakdown", hole=0.4,
                      color='recommendation',
-                     color_discrete_map={
-                         "✅ GREEN LIGHT (Safe to Price Match)": "green",
-                         "⚠️ LOW MARGIN (Proceed with Caution)": "orange",
-                         "🛑 CRITICAL LOSS (Do Not Match)": "red"
-                     })
+                     color_discrete_map=RECOMMENDATION_COLORS)
         st.plotly_chart(fig, use_container_width=True)
 
     with c2:
@@ -118,6 +117,74 @@ try:
             height=400
         )
 
+    # --- PRICE HISTORY ---
+    st.divider()
+    st.subheader("📈 Price History")
+    h1, h2 = st.columns([2, 1])
+    product = h1.selectbox("Product", sorted(df['title'].dropna().unique()))
+    bucket = h2.radio("Resolution", ["auto", "raw", "week", "month", "lttb"], horizontal=True)
+
+    # The whole history is already in memory: pick this product's rows (normalized title, like the API)
+    key = normalize_title(product)
+    history = df.loc[df['title'].map(normalize_title) == key, ['source', 'run_date', 'price']]
+    resolution, series = downsample(history.itertuples(index=False, name=None), bucket)
+
+    chart = go.Figure()
+    for source, points in series.items():
+        t = [p['t'] for p in points]
+        if resolution in BUCKETS:
+            chart.add_trace(go.Candlestick(x=t, open=[p['open'] for p in points], high=[p['high'] for p in points],
+                                           low=[p['low'] for p in points], close=[p['close'] for p in points],
+                                           name=source))
+        else:
+            chart.add_trace(go.Scatter(x=t, y=[p['price'] for p in points], mode='lines+markers', name=source))
+    chart.update_layout(xaxis_rangeslider_visible=False, yaxis_title="Price (£)",
+                        title=f"{product} ({resolution}, {len(history)} observations)")
+    st.plotly_chart(chart, use_container_width=True)
+
+    # --- WHAT-IF SCENARIOS ---
+    st.divider()
+    st.subheader("🧪 What-If Scenarios")
+    with st.expander("Sweep unit cost and target margin", expanded=False):
+        s1, s2, s3 = st.columns(3)
+        cost_file = s1.file_uploader("Per-product cost table (CSV: title, cost)", type="csv")
+        margin_range = s2.slider("Target margins (%)", 0, 80, (0, 50))
+        margin_step = s3.number_input("Margin step (%)", value=5.0, min_value=0.5, step=0.5)
+
+        # Latest price of each product, the same rows /scenarios uses
+        time_col = 'created_at' if 'created_at' in df.columns else 'scraped_at'
+        latest = df.sort_values(time_col).drop_duplicates(['source', 'title'], keep='last')
+        margins = np.arange(margin_range[0], margin_range[1] + margin_step / 2, margin_step)
+
+        if cost_file is not None:
+            table = pd.read_csv(cost_file)
+            product_costs = cost_column(latest['title'], dict(zip(table['title'], table['cost'])))
+            factor_range = s1.slider("Cost factor", 0.5, 1.5, (0.8, 1.2), step=0.05)
+            axis = 'cost_factor'
+            values = np.arange(factor_range[0], factor_range[1] + 0.025, 0.05).round(2)
+            # Baseline = the table's own costs at the sidebar margin; unlisted products use the sidebar cost
+            baseline = pd.DataFrame({'cost_factor': [1.0], 'target_margin': [target_margin]})
+            grid = pd.concat([baseline, scenario_grid(margins, cost_factors=values)], ignore_index=True)
+            grid['my_cost'] = my_cost
+        else:
+            product_costs = None
+            cost_range = s1.slider("Unit cost (£)", 0.0, 60.0, (max(my_cost - 5, 0.0), my_cost + 5), step=0.5)
+            axis = 'my_cost'
+            values = np.arange(cost_range[0], cost_range[1] + 0.25, 0.5)
+            # Baseline = the sidebar settings, so "flipped" means "changes versus today's report"
+            baseline = pd.DataFrame({'my_cost': [my_cost], 'target_margin': [target_margin]})
+            grid = pd.concat([baseline, scenario_grid(margins, costs=values)], ignore_index=True)
+
+        result = evaluate(latest['price'], grid, product_costs=product_costs, baseline=0)
+        summary = result.summary.iloc[1:]
+        st.caption(f"{len(latest)} products x {len(summary)} scenarios, compared with the current sidebar settings")
+
+        metric = st.radio("Show", ['green', 'low', 'critical', 'flipped'], horizontal=True)
+        heatmap = summary.pivot(index='target_margin', columns=axis, values=metric)
+        st.plotly_chart(px.imshow(heatmap, aspect='auto', color_continuous_scale='RdYlGn' if metric == 'green' else 'Reds',
+                                  labels={'color': metric}), use_container_width=True)
+        st.dataframe(summary, use_container_width=True, height=300)
+
     # --- DOWNLOAD REPORT ---
     st.sidebar.markdown("---")
     csv = df.to_csv(index=False).encode('utf-8')
@@ -0,0 +1,250 @@
+import os
+import shlex
+import sqlite3
+import threading
+
+import psycopg2
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+# --- CONNECTION POOL SETTINGS ---
+# One engine per process, shared by every request. Tune with env vars.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))          # Connections kept open
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))   # Extra connections allowed under burst
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))   # Seconds to wait for a free connection
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # Re-open connections older than this (seconds)
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"  # Test connections before handing them out
+
+# Async read path for the API (asyncpg / aiosqlite). Set DB_ASYNC=0 to force the sync engine.
+USE_ASYNC_DB = os.getenv("DB_ASYNC", "1") == "1"
+# asyncpg caches prepared statements per connection; set 0 behind a transaction-mode
+# pooler (e.g. Supabase on port 6543), which can't keep them
+ASYNC_STATEMENT_CACHE = int(os.getenv("DB_ASYNC_STATEMENT_CACHE", "100"))
+
+_engine = None
+_engine_lock = threading.Lock()
+_async_engine = None
+
+
+def get_db_url(fallback=None):
+    """
+    Finds the database URL, in this order:
+    1. DB_URL environment variable (GitHub Actions, Render)
+    2. config.py (Laptop)
+    3. `fallback()` if given, e.g. Streamlit secrets (Streamlit Cloud)
+    Also fixes the 'postgres://' typo common in cloud dashboards.
+    """
+    db_url = os.getenv("DB_URL")
+
+    if not db_url:
+        try:
+            import config
+            db_url = config.DB_URL
+        except (ImportError, AttributeError):
+            db_url = None
+
+    if not db_url and fallback is not None:
+        db_url = fallback()
+
+    if not db_url:
+        raise Exception("Database URL not found! Set DB_URL var or create config.py.")
+
+    if db_url.startswith("postgres://"):
+        db_url = db_url.replace("postgres://", "postgresql://", 1)
+    return db_url
+
+
+def get_engine(db_url=None):
+    """
+    Returns the process-wide SQLAlchemy engine, creating it on first use.
+    """
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            db_url = db_url or get_db_url()
+            # Pin the driver we ship (psycopg2-binary); newer SQLAlchemy defaults to psycopg 3
+            if db_url.startswith("postgresql://"):
+                db_url = db_url.replace("postgresql://", "postgresql+psycopg2://", 1)
+            if db_url.startswith("sqlite"):
+                # SQLite picks its own pool class; size/overflow don't apply
+                _engine = create_engine(db_url, pool_pre_ping=POOL_PRE_PING)
+            else:
+                _engine = create_engine(
+                    db_url,
+                    pool_size=POOL_SIZE,
+                    max_overflow=MAX_OVERFLOW,
+                    pool_timeout=POOL_TIMEOUT,
+                    pool_recycle=POOL_RECYCLE,
+                    pool_pre_ping=POOL_PRE_PING,
+                )
+    return _engine
+
+
+def dispose_engine():
+    """
+    Closes every pooled connection (call on shutdown).
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def _server_settings(options):
+    """
+    libpq `options` ("-c search_path=app -cstatement_timeout=5000
+    --work_mem=64MB") -> {"search_path": "app", ...}. Each -c takes the
+    next token unless the setting is glued on; empty keys are skipped.
+    """
+    settings = {}
+    tokens = iter(shlex.split(options))
+    for token in tokens:
+        if token == "-c":
+            token = next(tokens, "")
+        elif token.startswith("-c"):
+            token = token[2:]
+        elif token.startswith("--"):
+            token = token[2:]
+        else:
+            continue
+        key, _, value = token.partition("=")
+        if key.strip():
+            settings[key.strip()] = value
+    return settings
+
+
+def _async_url_and_args(db_url):
+    """
+    Maps a sync URL onto its async driver. libpq-only query options are
+    translated for asyncpg: sslmode -> ssl, options=-c... -> server_settings.
+    """
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite"), {}
+    if backend != "postgresql":
+        raise ValueError(f"No async driver configured for '{backend}'")
+
+    query = dict(url.query)
+    connect_args = {"statement_cache_size": ASYNC_STATEMENT_CACHE}
+    query["prepared_statement_cache_size"] = str(ASYNC_STATEMENT_CACHE)
+    if "sslmode" in query:
+        connect_args["ssl"] = query.pop("sslmode")
+    if "options" in query:
+        settings = _server_settings(query.pop("options"))
+        if settings:
+            connect_args["server_settings"] = settings
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+def _numeric_as_float(engine):
+    # DECIMAL prices come back as float, like the JSON we send (no Decimal objects per row)
+    @event.listens_for(engine.sync_engine, "connect")
+    def register_codec(dbapi_connection, connection_record):
+        dbapi_connection.run_async(
+            lambda conn: conn.set_type_codec("numeric", encoder=str, decoder=float, schema="pg_catalog",
+                                             format="text")
+        )
+
+
+def get_async_engine(db_url=None):
+    """
+    Returns the process-wide AsyncEngine, or None when DB_ASYNC=0 or the
+    async driver (asyncpg / aiosqlite) isn't installed; callers then fall
+    back to the sync engine in a worker thread.
+    """
+    global _async_engine
+    if _async_engine is not None or not USE_ASYNC_DB:
+        return _async_engine
+
+    with _engine_lock:
+        if _async_engine is None:
+            try:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                url, connect_args = _async_url_and_args(db_url or get_db_url())
+                if url.get_backend_name() == "sqlite":
+                    engine = create_async_engine(url, connect_args=connect_args)
+                else:
+                    engine = create_async_engine(
+                        url,
+                        connect_args=connect_args,
+                        pool_size=POOL_SIZE,
+                        max_overflow=MAX_OVERFLOW,
+                        pool_timeout=POOL_TIMEOUT,
+                        pool_recycle=POOL_RECYCLE,
+                        pool_pre_ping=POOL_PRE_PING,
+                    )
+                    _numeric_as_float(engine)
+            except ImportError as e:
+                print(f"⚠️ Async database driver unavailable ({e}); using the sync engine.")
+                return None
+            _async_engine = engine
+    return _async_engine
+
+
+async def dispose_async_engine():
+    global _async_engine
+    engine, _async_engine = _async_engine, None
+    if engine is not None:
+        await engine.dispose()
+
+
+def pool_status(engine=None):
+    """
+    Snapshot of a connection pool (the sync engine by default) for health checks and metrics.
+    """
+    engine = engine or _engine
+    if engine is None:
+        return {"initialized": False}
+
+    pool = getattr(engine, "sync_engine", engine).pool
+    status = {"initialized": True, "pool_class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+
+def connect_raw(db_url=None):
+    """
+    Opens a plain psycopg2 connection for batch jobs that need cursors / COPY.
+    """
+    db_url = db_url or get_db_url()
+    return psycopg2.connect(db_url.replace("postgresql+psycopg2://", "postgresql://", 1))
+
+
+# --- DB-API HELPERS (shared by the loader and the summary tables) ---
+def is_sqlite(conn):
+    return isinstance(conn, sqlite3.Connection)
+
+
+def placeholder(conn):
+    """
+    DB-API parameter marker: sqlite3 uses '?', psycopg2 uses '%s'.
+    """
+    return "?" if is_sqlite(conn) else "%s"
+
+
+def table_columns(conn, table):
+    """
+    Returns the set of column names of `table` (empty if it doesn't exist).
+    """
+    cursor = conn.cursor()
+    if is_sqlite(conn):
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = {row[1] for row in cursor.fetchall()}
+    else:
+        # Only the schema unqualified names resolve to: the benches keep their own book_prices elsewhere
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() "
+            "AND table_name = %s",
+            (table,),
+        )
+        columns = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return columns
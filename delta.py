@@ -0,0 +1,131 @@
+import datetime
+import os
+
+from db import is_sqlite, placeholder, table_columns
+from etl_pipeline import normalize_title
+
+# --- DELTA (CHANGE-ONLY) INGESTION ---
+# Most prices don't move from one day to the next. In delta mode a product
+# is only written when its price or availability changed since its last
+# stored observation, plus a heartbeat row every HEARTBEAT_DAYS so we can
+# still tell "unchanged" apart from "no longer listed".
+
+HEARTBEAT_DAYS = int(os.getenv("DELTA_HEARTBEAT_DAYS", "7"))
+PRICE_TOLERANCE = 0.005  # Prices are stored with 2 decimals
+
+
+def _as_date(value):
+    if value is None or isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+class DeltaStats:
+    def __init__(self):
+        self.seen = 0
+        self.written = 0
+        self.skipped = 0
+        self.changed = 0
+        self.new = 0
+        self.heartbeats = 0
+
+    def as_dict(self):
+        return {
+            "seen": self.seen,
+            "written": self.written,
+            "skipped": self.skipped,
+            "changed": self.changed,
+            "new": self.new,
+            "heartbeats": self.heartbeats,
+        }
+
+    def report(self, source):
+        print(
+            f"   Δ {source}: {self.written}/{self.seen} rows written "
+            f"({self.changed} changed, {self.new} new, {self.heartbeats} heartbeats), "
+            f"{self.skipped} unchanged skipped."
+        )
+
+
+class DeltaFilter:
+    """
+    Last known (price, availability, run_date) of every product of one source,
+    loaded with a single query. `filter()` drops the rows that would only
+    repeat what is already stored.
+    """
+
+    def __init__(self, conn, source, columns, heartbeat_days=HEARTBEAT_DAYS):
+        self.source = source
+        self.columns = tuple(columns)
+        self.heartbeat_days = heartbeat_days
+        self.stats = DeltaStats()
+        self._price_idx = self.columns.index("price")
+        self._availability_idx = self.columns.index("availability") if "availability" in self.columns else None
+        self.last_seen = self._load_last_seen(conn)
+
+    def _load_last_seen(self, conn):
+        title_col = "product_name" if is_sqlite(conn) else "title"
+        has_availability = "availability" in table_columns(conn, "book_prices")
+        availability = "availability" if has_availability else "NULL"
+        p = placeholder(conn)
+
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT title, price, availability, run_date FROM (
+                SELECT {title_col} AS title, price, {availability} AS availability, run_date,
+                       ROW_NUMBER() OVER (PARTITION BY {title_col} ORDER BY run_date DESC, id DESC) AS rn
+                FROM book_prices
+                WHERE source = {p} AND run_date IS NOT NULL
+            ) latest
+            WHERE rn = 1
+        """, (self.source,))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        # Titles differing only in case/spacing are the same product
+        last_seen = {}
+        for title, price, availability, run_date in rows:
+            key = normalize_title(title)
+            run_date = _as_date(run_date)
+            known = last_seen.get(key)
+            if known is None or run_date > known[2]:
+                last_seen[key] = (None if price is None else float(price), availability, run_date)
+        return last_seen
+
+    def _is_unchanged(self, known, price, availability):
+        old_price, old_availability, _ = known
+        if (old_price is None) != (price is None):
+            return False
+        if price is not None and abs(float(price) - old_price) >= PRICE_TOLERANCE:
+            return False
+        return self._availability_idx is None or availability == old_availability
+
+    def filter(self, rows, run_date):
+        """
+        Returns the rows worth writing for `run_date` and updates the map,
+        so the same filter can be reused on the next run.
+        """
+        run_date = _as_date(run_date)
+        keep = []
+        for row in rows:
+            self.stats.seen += 1
+            key = normalize_title(row[0])
+            price = row[self._price_idx]
+            availability = row[self._availability_idx] if self._availability_idx is not None else None
+            known = self.last_seen.get(key)
+
+            if known is None:
+                self.stats.new += 1
+            elif not self._is_unchanged(known, price, availability):
+                self.stats.changed += 1
+            elif known[2] < run_date and (run_date - known[2]).days >= self.heartbeat_days:
+                self.stats.heartbeats += 1
+            else:
+                self.stats.skipped += 1
+                continue
+
+            keep.append(row)
+            self.last_seen[key] = (None if price is None else float(price), availability, run_date)
+
+        self.stats.written += len(keep)
+        return keep
@@ -1,5 +1,18 @@
 import pandas as pd
+import os
 import re
+from instrumentation import inc
+
+# One or more digits, optionally followed by a dot and more digits
+PRICE_PATTERN = r"(\d+\.?\d*)"
+
+# Rows per chunk for the streaming ETL (keeps memory flat on huge feeds)
+DEFAULT_CHUNKSIZE = 100_000
+
+# Text columns are read as text in both ETL modes: a chunk whose titles are
+# all missing (or whose prices all look numeric) would otherwise get a
+# different dtype than the same rows in a whole-file read
+FEED_DTYPES = {"book_name": str, "raw_price": str, "url": str}
 
 def clean_currency(price_str):
     """
@@ -13,19 +26,106 @@ def clean_currency(price_str):
     
     # Regex Magic: Find a pattern that looks like a number (digits + optional dot)
     # This looks for: one or more digits (\d+), optionally followed by a dot and more digits (\.?\d*)
-    match = re.search(r"(\d+\.?\d*)", price_str)
+    match = re.search(PRICE_PATTERN, price_str)
     
     if match:
         return float(match.group(1))
     return 0.0
 
+def normalize_title(title):
+    """
+    Matching key for a title: trimmed, inner whitespace collapsed, lower case.
+    Mirrors NORMALIZED_TITLE_SQL in migrate_schema.py.
+    """
+    if pd.isna(title):
+        return ""
+    return re.sub(r"\s+", " ", str(title)).strip().lower()
+
+def clean_currency_series(prices):
+    """
+    Vectorized clean_currency for a whole column: same regex, same result
+    (missing values and strings without digits become 0.0), but the matching
+    runs inside pandas instead of one Python call per row.
+    """
+    extracted = prices.astype(str).str.extract(PRICE_PATTERN, expand=False)
+    cleaned = extracted.astype(float).fillna(0.0)
+    cleaned[prices.isna()] = 0.0
+    return cleaned
+
+def transform_chunk(df):
+    """
+    Applies the title/price cleaning from run_etl_process to one batch of rows.
+    """
+    df['clean_title'] = df['book_name'].str.strip().str.title()
+    df['price'] = clean_currency_series(df['raw_price'])
+    return df
+
+def stream_etl_process(csv_file, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Streaming version of run_etl_process for feeds too big for memory.
+
+    Reads the CSV `chunksize` rows at a time and yields cleaned batches.
+    A running {clean_title: lowest price} map carries the "keep the cheapest"
+    dedup across chunks: a row is only yielded when it is the first or a
+    strictly cheaper price for its title. Memory is bounded by the number of
+    distinct titles, not by the size of the file.
+    """
+    best_prices = {}
+
+    for chunk in pd.read_csv(csv_file, chunksize=chunksize, dtype=FEED_DTYPES):
+        inc("etl_chunks_total")
+        inc("etl_rows_in_total", len(chunk))
+        chunk = transform_chunk(chunk)
+
+        # Dedup inside the chunk first (cheapest row per title)
+        chunk = chunk.sort_values('price', ascending=True, kind='stable')
+        chunk = chunk.drop_duplicates(subset=['clean_title'], keep='first')
+
+        # Then against everything we have already seen
+        known = chunk['clean_title'].map(best_prices)
+        improved = chunk[known.isna() | (chunk['price'] < known)]
+        if improved.empty:
+            continue
+
+        best_prices.update(zip(improved['clean_title'], improved['price']))
+        yield improved
+
+def run_etl_streaming(csv_file, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Drains stream_etl_process into one DataFrame with the same rows as
+    run_etl_process: one row per clean_title, at its lowest price.
+    """
+    print("--- STARTING STREAMING ETL PIPELINE ---")
+    print(f"📥 Streaming raw data from {csv_file} in chunks of {chunksize:,} rows...")
+    inc("etl_bytes_read_total", os.path.getsize(csv_file))
+
+    # Later batches only ever contain cheaper prices, so each title's last row wins.
+    # Folded as they arrive: memory stays at one row per title, like the stream itself
+    columns = None
+    latest = {}
+    for batch in stream_etl_process(csv_file, chunksize=chunksize):
+        columns = list(batch.columns)
+        for title, row in zip(batch['clean_title'], batch.itertuples(index=False, name=None)):
+            latest[None if pd.isna(title) else title] = row
+    if columns is None:
+        return pd.DataFrame(columns=['book_name', 'raw_price', 'url', 'clean_title', 'price'])
+
+    df = pd.DataFrame(list(latest.values()), columns=columns)
+    df = df.sort_values('price', ascending=True, kind='stable')
+    inc("etl_rows_out_total", len(df))
+
+    print(f"✨ Streaming Transformation Complete! {len(df)} unique titles.")
+    return df
+
 def run_etl_process(csv_file):
     print("--- STARTING ETL PIPELINE ---")
     
     # 1. EXTRACT (Read the raw file)
     print(f"📥 Loading raw data from {csv_file}...")
-    df = pd.read_csv(csv_file)
+    df = pd.read_csv(csv_file, dtype=FEED_DTYPES)
     print(f"   Raw Rows: {len(df)}")
+    inc("etl_bytes_read_total", os.path.getsize(csv_file))
+    inc("etl_rows_in_total", len(df))
     
     # 2. TRANSFORM (Clean the mess)
     print("🧹 Cleaning data...")
@@ -37,9 +137,11 @@ def run_etl_process(csv_file):
     df['price'] = df['raw_price'].apply(clean_currency)
     
     # C. Remove Duplicates (Keep the lowest price if we have duplicates)
-    # Sort by price ascending, then drop duplicates based on title, keeping the first (cheapest)
-    df = df.sort_values('price', ascending=True)
+    # Sort by price ascending, then drop duplicates based on title, keeping the first (cheapest).
+    # Stable sort: on a price tie the earliest row in the file wins, as in the streaming ETL
+    df = df.sort_values('price', ascending=True, kind='stable')
     df = df.drop_duplicates(subset=['clean_title'], keep='first')
+    inc("etl_rows_out_total", len(df))
     
     # 3. Validation
     print("✨ Transformation Complete!")
@@ -0,0 +1,120 @@
+import os
+
+from bs4 import BeautifulSoup
+
+# --- PRODUCT EXTRACTION BACKENDS ---
+# Every backend turns a listing page into one dict per .product_pod:
+#   {"title": ..., "price_text": "£51.77", "availability": "In stock", "href": "..."}
+# so the scrapers don't care which HTML parser did the work.
+
+DEFAULT_BACKEND = "auto"  # lxml when installed, otherwise BeautifulSoup
+
+
+def parse_price(price_text):
+    """
+    Turns '£51.77' (or the mis-decoded 'Â£51.77') into 51.77.
+    """
+    return float(price_text.replace("£", "").replace("Â", "").strip())
+
+
+class ProductExtractor:
+    """
+    Interface for .product_pod extraction backends.
+    """
+    name = "base"
+
+    def extract(self, html):
+        """
+        Takes the page as str or bytes and returns a list of product dicts.
+        """
+        raise NotImplementedError
+
+
+class SoupExtractor(ProductExtractor):
+    """
+    The original BeautifulSoup + html.parser + CSS select implementation.
+    """
+    name = "bs4"
+
+    def extract(self, html):
+        soup = BeautifulSoup(html, "html.parser")
+        products = []
+        for book in soup.select(".product_pod"):
+            anchor = book.select_one("h3 a")
+            availability = book.select_one(".availability")
+            products.append({
+                "title": anchor["title"],
+                "price_text": book.select_one(".price_color").text,
+                "availability": availability.text.strip() if availability else None,
+                "href": anchor["href"],
+            })
+        return products
+
+
+class LxmlExtractor(ProductExtractor):
+    """
+    lxml's C parser with XPath expressions compiled once at start-up.
+    Several times faster than BeautifulSoup on catalogue pages.
+    """
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree, html as lxml_html
+
+        self._html = lxml_html
+        self._pods = etree.XPath("//article[contains(concat(' ', normalize-space(@class), ' '), ' product_pod ')]")
+        self._title = etree.XPath("string(.//h3/a/@title)")
+        self._href = etree.XPath("string(.//h3/a/@href)")
+        self._price = etree.XPath("string(.//p[contains(concat(' ', normalize-space(@class), ' '), ' price_color ')])")
+        self._availability = etree.XPath("normalize-space(.//p[contains(concat(' ', normalize-space(@class), ' '), ' availability ')])")
+
+    def extract(self, html):
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        root = self._html.document_fromstring(html)
+        products = []
+        for pod in self._pods(root):
+            availability = self._availability(pod)
+            products.append({
+                "title": self._title(pod),
+                "price_text": self._price(pod),
+                "availability": availability or None,
+                "href": self._href(pod),
+            })
+        return products
+
+
+BACKENDS = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+
+def configured_backend():
+    """
+    Reads the backend name: HTML_PARSER env var first, then config.py.
+    """
+    name = os.getenv("HTML_PARSER")
+    if not name:
+        try:
+            import config
+            name = getattr(config, "HTML_PARSER", None)
+        except ImportError:
+            name = None
+    return (name or DEFAULT_BACKEND).lower()
+
+
+def get_extractor(name=None):
+    """
+    Builds the requested backend ("bs4", "lxml" or "auto").
+    "auto" picks lxml when it is installed and falls back to BeautifulSoup.
+    """
+    name = (name or configured_backend()).lower()
+    if name == "auto":
+        try:
+            return LxmlExtractor()
+        except ImportError:
+            return SoupExtractor()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend '{name}'. Choose from: auto, {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
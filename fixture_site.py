@@ -0,0 +1,134 @@
+"""
+A tiny offline copy of books.toscrape.com.
+Renders catalogue and product pages with the same markup as the real site,
+so the scrapers can be exercised and timed without network access.
+"""
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOOKS_PER_PAGE = 20
+WORDS = ["Red", "Hearts", "Attic", "Velvet", "Sonnets", "Maria", "Olio", "Free",
+         "Light", "Requiem", "Starving", "Shadow", "River", "Garden", "Winter", "Secret"]
+
+
+def make_books(pages, seed=42):
+    """
+    Returns a deterministic list of (slug, title, price) for the whole catalogue.
+    """
+    rng = random.Random(seed)
+    books = []
+    for i in range(pages * BOOKS_PER_PAGE):
+        title = " ".join(rng.choice(WORDS) for _ in range(3)) + f" Vol. {i + 1}"
+        price = round(rng.uniform(10, 60), 2)
+        slug = title.lower().replace(" ", "-").replace(".", "") + f"_{i + 1}"
+        books.append((slug, title, price))
+    return books
+
+
+def render_listing(books, page, pages, href_prefix=""):
+    start = (page - 1) * BOOKS_PER_PAGE
+    pods = []
+    for slug, title, price in books[start:start + BOOKS_PER_PAGE]:
+        href = f"{href_prefix}{slug}/index.html"
+        pods.append(f"""
+<li class="col-xs-6 col-sm-4 col-md-3 col-lg-3">
+<article class="product_pod">
+  <div class="image_container"><a href="{href}"><img src="../media/{slug}.jpg" alt="{title}" class="thumbnail"></a></div>
+  <p class="star-rating Three"><i class="icon-star"></i></p>
+  <h3><a href="{href}" title="{title}">{title[:20]}...</a></h3>
+  <div class="product_price">
+    <p class="price_color">£{price:.2f}</p>
+    <p class="instock availability">
+      <i class="icon-ok"></i>
+      In stock
+    </p>
+    <form><button type="submit" class="btn btn-primary btn-block">Add to basket</button></form>
+  </div>
+</article>
+</li>""")
+
+    next_link = f'<li class="next"><a href="page-{page + 1}.html">next</a></li>' if page < pages else ""
+    return f"""<!DOCTYPE html>
+<html lang="en-us"><head><meta charset="utf-8"><title>All products | Books to Scrape - Sandbox</title></head>
+<body><div class="page_inner"><section>
+<ol class="row">{"".join(pods)}</ol>
+<div><ul class="pager"><li class="current">Page {page} of {pages}</li>{next_link}</ul></div>
+</section></div></body></html>"""
+
+
+def render_detail(title, price):
+    return f"""<!DOCTYPE html>
+<html lang="en-us"><head><meta charset="utf-8"><title>{title} | Books to Scrape - Sandbox</title></head>
+<body><div class="page_inner"><article class="product_page"><div class="row">
+<div class="col-sm-6 product_main">
+  <h1>{title}</h1>
+  <p class="price_color">£{price:.2f}</p>
+  <p class="instock availability"><i class="icon-ok"></i> In stock (22 available)</p>
+</div></div></article></div></body></html>"""
+
+
+def build_site(pages):
+    """
+    Returns a {path: html} map for the front page, every catalogue page and
+    every product page.
+    """
+    books = make_books(pages)
+    site = {"/": render_listing(books, 1, pages, href_prefix="catalogue/")}
+    for page in range(1, pages + 1):
+        site[f"/catalogue/page-{page}.html"] = render_listing(books, page, pages)
+    for slug, title, price in books:
+        site[f"/catalogue/{slug}/index.html"] = render_detail(title, price)
+    return site
+
+
+@contextmanager
+def serve_fixture_site(pages=50, latency=0.0):
+    """
+    Serves the fixture site on a random localhost port and yields its base URL.
+    `latency` (seconds) is added to every response to mimic a remote server.
+    """
+    site = {path: html.encode("utf-8") for path, html in build_site(pages).items()}
+    etags = {path: '"%s"' % hashlib.md5(body).hexdigest() for path, body in site.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like a real web server
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            path = self.path.split("?")[0]
+            body = site.get(path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == etags[path]:
+                self.send_response(304)
+                self.send_header("ETag", etags[path])
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etags[path])
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output clean
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,76 @@
+"""
+A minimal local SMTP server standing in for Gmail.
+Accepts plain (non-TLS, no AUTH) sessions, records every message and
+counts connections, so alert sending can be exercised without real mail.
+"""
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from email import message_from_bytes, policy
+
+
+class SmtpRecorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+
+    @property
+    def subjects(self):
+        return [msg["Subject"] for msg in self.messages]
+
+
+@contextmanager
+def serve_fixture_smtp(latency=0.0):
+    """
+    Serves SMTP on a random localhost port and yields (host, port, recorder).
+    `latency` (seconds) is added to the greeting to mimic a remote handshake.
+    """
+    recorder = SmtpRecorder()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def reply(self, line):
+            self.wfile.write(line.encode("ascii") + b"\r\n")
+
+        def handle(self):
+            with recorder.lock:
+                recorder.connections += 1
+            if latency:
+                time.sleep(latency)
+            self.reply("220 localhost fixture SMTP")
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode("ascii", errors="replace").strip().upper()
+                if command.startswith(("EHLO", "HELO")):
+                    self.reply("250 localhost")
+                elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                    self.reply("250 OK")
+                elif command == "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data = self.rfile.readline()
+                        if data in (b".\r\n", b".\n", b""):
+                            break
+                        lines.append(data[1:] if data.startswith(b"..") else data)
+                    with recorder.lock:
+                        recorder.messages.append(message_from_bytes(b"".join(lines), policy=policy.default))
+                    self.reply("250 OK queued")
+                elif command == "QUIT":
+                    self.reply("221 Bye")
+                    return
+                else:
+                    self.reply("502 Command not implemented")
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[0], server.server_address[1], recorder
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,6 +1,19 @@
+import argparse
+import datetime
 import pandas as pd
+import numpy as np
 import random
 
+# --- SCALED SYNTHETIC DATA ---
+# The seven hand-written rows below are fine for a demo but say nothing about
+# real volumes. generate_feed / fill_history build N products x D days of the
+# same kind of mess (casing, padding, currency formats, duplicate offers),
+# reproducibly from a seed.
+
+WORDS = ["Red", "Hearts", "Attic", "Velvet", "Sonnets", "Maria", "Olio", "Free", "Light", "Requiem",
+         "Starving", "Shadow", "River", "Garden", "Winter", "Secret", "Boat", "Night", "Crown", "Stone"]
+PRICE_FORMATS = ["$ {:.2f}", "USD {:.2f}", "£{:.2f}", "{:.2f} GBP", "{:.2f}", "€{:.2f}"]
+
 def create_messy_competitor_data():
     """
     Generates a CSV file representing a 'messy' data feed from a competitor.
@@ -29,5 +42,111 @@ def create_messy_competitor_data():
     print("Preview of the mess:")
     print(df.head(10))
 
+def make_titles(n_products, seed=42):
+    """
+    N distinct, realistic-looking titles.
+    """
+    rng = random.Random(seed)
+    return [f"The {' '.join(rng.sample(WORDS, rng.randint(1, 3)))} #{i}" for i in range(n_products)]
+
+def make_prices(n_products, days, seed=42):
+    """
+    (days x n_products) array of prices: a base price per product plus a
+    small daily random walk, with an occasional 10-30% markdown.
+    """
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(8, 60, n_products)
+    walk = np.cumsum(rng.normal(0, 0.3, (days, n_products)), axis=0)
+    markdown = np.where(rng.random((days, n_products)) < 0.02, rng.uniform(0.7, 0.9, (days, n_products)), 1.0)
+    return np.round(np.clip(base + walk, 1, None) * markdown, 2)
+
+def generate_feed(n_products, days=1, duplicate_rate=0.1, seed=42, start_date=None):
+    """
+    Messy competitor feed: one row per product per day, plus `duplicate_rate`
+    extra rows (same book, different casing/url, a slightly different price).
+    Columns match competitor_prices_messy.csv, plus feed_date.
+    """
+    rng = np.random.default_rng(seed)
+    titles = np.array(make_titles(n_products, seed))
+    prices = make_prices(n_products, days, seed)
+    start_date = start_date or datetime.date.today() - datetime.timedelta(days=days - 1)
+
+    frames = []
+    for day in range(days):
+        idx = np.arange(n_products)
+        dup_idx = rng.choice(n_products, int(n_products * duplicate_rate), replace=True)
+        all_idx = np.concatenate([idx, dup_idx])
+        day_prices = prices[day, all_idx] * np.concatenate([np.ones(len(idx)), rng.uniform(0.9, 1.1, len(dup_idx))])
+
+        # Casing / padding noise: title case, UPPER, lower, stray spaces
+        names = pd.Series(titles[all_idx])
+        style = rng.integers(0, 4, len(all_idx))
+        names = names.where(style != 1, names.str.upper())
+        names = names.where(style != 2, names.str.lower())
+        names = names.where(style != 3, "  " + names + " ")
+
+        formats = rng.integers(0, len(PRICE_FORMATS), len(all_idx))
+        raw_prices = [PRICE_FORMATS[f].format(p) for f, p in zip(formats, day_prices)]
+        urls = [f"http://bookworld.com/item{i}" + ("-promo" if n >= n_products else "")
+                for n, i in enumerate(all_idx)]
+
+        frames.append(pd.DataFrame({
+            "book_name": names,
+            "raw_price": raw_prices,
+            "url": urls,
+            "feed_date": (start_date + datetime.timedelta(days=day)).isoformat(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def write_messy_feed(filename, n_products, days=1, duplicate_rate=0.1, seed=42):
+    df = generate_feed(n_products, days, duplicate_rate, seed)
+    df.to_csv(filename, index=False)
+    print(f"✅ Generated {len(df):,} messy rows ({n_products:,} products x {days} days) in {filename}")
+    return df
+
+def fill_history(conn, n_products, days, sources=("BooksToScrape", "BookWorld"), seed=42, batch_size=5000):
+    """
+    Loads N products x D days per source into book_prices through the real
+    loader (so the summaries and ingestion batches are filled too).
+    Returns the number of rows written.
+    """
+    from loader import ensure_schema, load_rows
+    from db import is_sqlite
+
+    ensure_schema(conn)
+    titles = make_titles(n_products, seed)
+    links = [f"http://books.toscrape.com/catalogue/book_{i}/index.html" for i in range(n_products)]
+    start_date = datetime.date.today() - datetime.timedelta(days=days - 1)
+
+    written = 0
+    for offset, source in enumerate(sources):
+        prices = make_prices(n_products, days, seed + offset)
+        for day in range(days):
+            run_date = start_date + datetime.timedelta(days=day)
+            if is_sqlite(conn):
+                scraped_at = f"{run_date.isoformat()} 06:00:00"
+                rows = [(t, float(p), "In stock", scraped_at) for t, p in zip(titles, prices[day])]
+            else:
+                rows = list(zip(titles, prices[day].tolist(), links))
+            written += load_rows(conn, rows, source=source, run_date=run_date, batch_size=batch_size)
+    return written
+
 if __name__ == "__main__":
-    create_messy_competitor_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate messy competitor feeds and price history.")
+    parser.add_argument("--products", type=int, help="Products per feed (omit for the small demo file)")
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="competitor_prices_messy.csv")
+    parser.add_argument("--sqlite", help="Also fill this SQLite file with the same history")
+    args = parser.parse_args()
+
+    if args.products is None:
+        create_messy_competitor_data()
+    else:
+        write_messy_feed(args.out, args.products, args.days, args.duplicate_rate, args.seed)
+        if args.sqlite:
+            import sqlite3
+            conn = sqlite3.connect(args.sqlite)
+            print(f"✅ Loaded {fill_history(conn, args.products, args.days):,} rows into {args.sqlite}")
+            conn.close()
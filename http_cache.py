@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+
+import requests
+
+from instrumentation import inc
+
+# --- CONFIGURATION ---
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+REQUEST_TIMEOUT = 15  # Seconds
+
+
+class CacheStats:
+    """
+    Counts what the cache saved us during one run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0      # Server answered 304
+        self.unchanged = 0         # Server sent 200 but the body hash matched
+        self.bytes_saved = 0       # Body bytes we did not download thanks to 304s
+        self.parse_seconds_avoided = 0.0
+
+    @property
+    def hits(self):
+        return self.not_modified + self.unchanged
+
+    def record(self, not_modified=False, unchanged=False, size=0, parse_seconds=0.0):
+        with self._lock:
+            self.requests += 1
+            if not_modified:
+                self.not_modified += 1
+                self.bytes_saved += size
+            if unchanged:
+                self.unchanged += 1
+            if not_modified or unchanged:
+                self.parse_seconds_avoided += parse_seconds
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "unchanged_body": self.unchanged,
+            "bytes_saved": self.bytes_saved,
+            "parse_seconds_avoided": round(self.parse_seconds_avoided, 4),
+        }
+
+    def report(self):
+        print("📦 HTTP Cache Report:")
+        print(f"   Requests: {self.requests} | Hits: {self.hits} "
+              f"(304: {self.not_modified}, unchanged body: {self.unchanged})")
+        print(f"   Bytes saved: {self.bytes_saved:,} | Parse time avoided: {self.parse_seconds_avoided:.3f}s")
+
+
+class CachedPage:
+    """
+    The result of a cached fetch. `changed` is False when the server said 304
+    or returned exactly the same bytes as last time - callers should then
+    skip parsing and loading the page.
+    """
+
+    def __init__(self, url, content, status_code, changed, encoding=None):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.changed = changed
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache keyed by URL.
+
+    Each entry keeps the ETag / Last-Modified validators, a SHA-256 of the body
+    and how long the last parse took. New entries are staged in memory and
+    only written by commit(), so a page whose rows never reached the database
+    is downloaded and parsed again on the next run.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._pending = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, url):
+        key = self._key(url)
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.body")
+
+    def load(self, url):
+        """
+        Returns the stored entry for `url` (pending entries win), or None.
+        """
+        with self._lock:
+            if url in self._pending:
+                return self._pending[url][0]
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load_body(self, url):
+        with self._lock:
+            if url in self._pending:
+                return self._pending[url][1]
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def fetch(self, url, session=None, headers=None, timeout=REQUEST_TIMEOUT, encoding=None):
+        """
+        GETs `url` with If-None-Match / If-Modified-Since taken from the cache.
+        """
+        entry = self.load(url)
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = (session or requests).get(url, headers=request_headers, timeout=timeout)
+
+        if response.status_code == 304:
+            body = self._load_body(url) if entry else None
+            if body is not None:
+                self.stats.record(not_modified=True, size=entry.get("size", 0),
+                                  parse_seconds=entry.get("parse_seconds", 0.0))
+                return CachedPage(url, body, 304, changed=False, encoding=encoding or entry.get("encoding"))
+            # Nothing stored to serve the 304 from (entry or body lost): ask again without validators,
+            # otherwise the empty 304 body would be parsed as a page with no products
+            request_headers.pop("If-None-Match", None)
+            request_headers.pop("If-Modified-Since", None)
+            entry = None
+            response = (session or requests).get(url, headers=request_headers, timeout=timeout)
+            if response.status_code == 304:
+                raise requests.HTTPError(f"{url} answered 304 to an unconditional request", response=response)
+
+        content = response.content
+        inc("http_bytes_downloaded_total", len(content))
+        content_hash = hashlib.sha256(content).hexdigest()
+        unchanged = bool(entry) and response.status_code == 200 and entry.get("content_hash") == content_hash
+        self.stats.record(unchanged=unchanged, parse_seconds=entry.get("parse_seconds", 0.0) if unchanged else 0.0)
+
+        if response.status_code == 200 and not unchanged:
+            new_entry = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_hash": content_hash,
+                "size": len(content),
+                "encoding": response.encoding,
+                "parse_seconds": 0.0,
+            }
+            with self._lock:
+                self._pending[url] = (new_entry, content)
+
+        return CachedPage(url, content, response.status_code, changed=not unchanged,
+                          encoding=encoding or response.encoding)
+
+    def record_parse(self, url, seconds):
+        """
+        Remembers how long parsing `url` took, so a later hit can report the
+        parse time it avoided.
+        """
+        with self._lock:
+            if url in self._pending:
+                self._pending[url][0]["parse_seconds"] = seconds
+
+    def commit(self):
+        """
+        Writes every staged entry to disk. Call it once the scraped rows are safely stored.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for url, (entry, content) in pending.items():
+            meta_path, body_path = self._paths(url)
+            with open(body_path, "wb") as f:
+                f.write(content)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+        return len(pending)
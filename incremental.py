@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from price_queries import build_prices_query, encode_cursor
+
+# --- INCREMENTAL TABLE READER ---
+# Keeps book_prices in memory and only asks the database for rows past a
+# (created_at, id) watermark. The first load reads everything; every later
+# refresh reads just what the daily job added since.
+
+
+class IncrementalPriceReader:
+    """
+    Thread-safe in-memory copy of book_prices, refreshed at most every `ttl` seconds.
+    `prepare` (optional) is applied once to every newly fetched batch.
+    """
+
+    def __init__(self, ttl=300, prepare=None):
+        self.ttl = ttl
+        self.prepare = prepare
+        self.df = None
+        self.watermark = None  # (created_at, id) of the newest row we hold
+        self.refreshed_at = 0.0
+        self.last_fetched = 0
+        self._lock = threading.Lock()
+
+    def get(self, engine):
+        """
+        Returns the cached DataFrame, fetching new rows first if the TTL expired.
+        Treat the result as read-only: it is shared by every caller.
+        """
+        with self._lock:
+            if self.df is None or time.monotonic() - self.refreshed_at >= self.ttl:
+                self._refresh(engine)
+            return self.df
+
+    def _refresh(self, engine):
+        cursor = encode_cursor(*self.watermark) if self.watermark else None
+        sql, params = build_prices_query(cursor=cursor)
+        with engine.connect() as conn:
+            new_rows = pd.read_sql(text(sql), conn, params=params)
+
+        self.last_fetched = len(new_rows)
+        self.refreshed_at = time.monotonic()
+        if new_rows.empty and self.df is not None:
+            return
+
+        last = new_rows.iloc[-1] if not new_rows.empty else None
+        if last is not None:
+            self.watermark = (pd.Timestamp(last["created_at"]).to_pydatetime(), int(last["id"]))
+        if self.prepare is not None:
+            new_rows = self.prepare(new_rows)
+
+        if self.df is None:
+            self.df = new_rows.reset_index(drop=True)
+        else:
+            # Re-loaded days come back with a fresh created_at: keep the newest copy of each id
+            combined = pd.concat([self.df, new_rows], ignore_index=True)
+            self.df = combined.drop_duplicates(subset="id", keep="last").reset_index(drop=True)
@@ -0,0 +1,169 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- PIPELINE INSTRUMENTATION ---
+# One in-process registry of counters, histograms and stage timings.
+# The daily job wraps each step in `stage(...)` and ends with a JSON run
+# summary; the API renders the same registry for Prometheus at /metrics.
+
+RUN_SUMMARY_FILE = os.getenv("RUN_SUMMARY_FILE", "run_summary.json")
+PROFILE_STAGES = {s.strip() for s in os.getenv("PROFILE_STAGE", "").split(",") if s.strip()}  # e.g. "etl,load"
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".profiles")
+
+# Seconds; covers a cached API hit (~1 ms) up to a slow full export
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """
+    Thread-safe metrics registry. Counter and histogram names follow
+    Prometheus conventions (`*_total`, `*_seconds`, `*_bytes`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.stages = []
+            self.started_at = datetime.now()
+            self._start = time.perf_counter()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def stage(self, name, profile=None):
+        """
+        Times a pipeline step and counts its errors (the exception is re-raised).
+        Set PROFILE_STAGE=<name> (or profile=True) to capture a cProfile of it.
+        """
+        profiler = None
+        if profile or (profile is None and name in PROFILE_STAGES):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except Exception as e:
+            status = "error"
+            self.inc("pipeline_errors_total", stage=name, error=type(e).__name__)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._save_profile(name, profiler)
+            self.observe("pipeline_stage_seconds", seconds, stage=name)
+            with self._lock:
+                self.stages.append({"stage": name, "seconds": round(seconds, 4), "status": status})
+
+    def _save_profile(self, name, profiler):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+        print(f"🔬 Profile of stage '{name}' saved to {path}")
+        print(out.getvalue())
+
+    def summary(self):
+        """
+        Structured view of the run so far (stages, counters, histogram totals).
+        """
+        with self._lock:
+            counters = {f"{name}{_format_labels(key)}": value for (name, key), value in self.counters.items()}
+            histograms = {
+                f"{name}{_format_labels(key)}": {"count": h.count, "sum": round(h.sum, 4)}
+                for (name, key), h in self.histograms.items()
+            }
+            return {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "duration_seconds": round(time.perf_counter() - self._start, 4),
+                "stages": list(self.stages),
+                "counters": counters,
+                "histograms": histograms,
+            }
+
+    def write_summary(self, path=RUN_SUMMARY_FILE):
+        summary = self.summary()
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+        return summary
+
+    def render_prometheus(self):
+        """
+        The registry in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, key), value in sorted(self.counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                lines.append(f"{name}{_format_labels(key)} {value}")
+            for (name, key), h in sorted(self.histograms.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen.add(name)
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', str(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry
+metrics = Metrics()
+stage = metrics.stage
+inc = metrics.inc
+observe = metrics.observe
@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from generate_fake_data import make_prices, make_titles
+from price_history import ensure_history_index
+from summaries import create_summary_tables
+
+# --- API LOAD TEST ---
+# Starts `uvicorn api:app` (from this checkout, or --app-dir for another one,
+# e.g. a `git worktree` of the previous commit) and hammers it with
+# concurrent requests for a fixed time, reporting requests/sec and p50/p99
+# latency per endpoint. The response cache is switched off by default, so
+# every request really reaches the database.
+# Point DB_URL (or --db-url) at a local Postgres, or use --sqlite for a
+# throw-away SQLite stand-in with the same columns as the cloud table.
+
+DEFAULT_PATHS = (
+    "/prices?limit=1000",
+    "/prices?source=BookWorld&max_price=20&limit=500",
+    "/prices?title_prefix=the%20red&limit=100",
+    "/stats",
+)
+
+
+def build_sqlite_standin(path, n_products, days, sources=("BooksToScrape", "BookWorld")):
+    """
+    A SQLite file laid out like the Postgres book_prices (title / link /
+    created_at), with its summary and ingestion tables filled.
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE book_prices (
+            id INTEGER PRIMARY KEY, title TEXT, price REAL, link TEXT,
+            source TEXT, run_date TEXT, created_at TIMESTAMP
+        );
+        CREATE INDEX book_prices_created_id ON book_prices (created_at, id);
+        CREATE TABLE ingestion_batches (batch_id INTEGER PRIMARY KEY, source TEXT, run_date TEXT, row_count INTEGER);
+    """)
+    titles = make_titles(n_products)
+    prices = make_prices(n_products, days)
+    start = datetime.date.today() - datetime.timedelta(days=days - 1)
+    for d in range(days):
+        run_date = (start + datetime.timedelta(days=d)).isoformat()
+        for s, source in enumerate(sources):
+            created_at = f"{run_date} 06:00:{s:02d}"
+            conn.executemany(
+                "INSERT INTO book_prices (title, price, link, source, run_date, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(t, float(p), f"https://example.com/{source}/{i}", source, run_date, created_at)
+                 for i, (t, p) in enumerate(zip(titles, prices[d]))],
+            )
+            conn.execute("INSERT INTO ingestion_batches (source, run_date, row_count) VALUES (?, ?, ?)",
+                         (source, run_date, n_products))
+    create_summary_tables(conn)
+    ensure_history_index(conn)
+    conn.execute("""
+        INSERT INTO price_daily_stats (source, day, row_count, price_sum, price_min, price_max)
+        SELECT source, run_date, COUNT(*), SUM(price), MIN(price), MAX(price) FROM book_prices GROUP BY source, run_date
+    """)
+    conn.commit()
+    conn.close()
+    return n_products * days * len(sources)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app_dir, env, port):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("The API did not start within 30s")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(base_url, paths, concurrency, duration):
+    """
+    `concurrency` clients send requests back to back (cycling through
+    `paths`) for `duration` seconds. Returns {path: [latency seconds]} and error count.
+    """
+    latencies = {path: [] for path in paths}
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Warm-up: opens the pools on both sides before timing
+        await asyncio.gather(*(client.get(path) for path in paths))
+        deadline = time.perf_counter() + duration
+
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    ok = response.status_code == 200 and b'"error"' not in response.content[:200]
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies[path].append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return latencies, errors
+
+
+def report(latencies, errors, duration):
+    results = {}
+    print(f"   {'endpoint':<50} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    everything = []
+    for path, values in list(latencies.items()) + [("ALL", None)]:
+        values = sorted(everything if values is None else values)
+        if path != "ALL":
+            everything.extend(values)
+        rps = len(values) / duration
+        p50, p99 = percentile(values, 50), percentile(values, 99)
+        results[path] = {"requests": len(values), "rps": round(rps, 1),
+                         "p50_ms": round(p50 * 1000, 2) if p50 else None,
+                         "p99_ms": round(p99 * 1000, 2) if p99 else None}
+        print(f"   {path:<50} {rps:8.1f} {results[path]['p50_ms'] or 0:8.1f} {results[path]['p99_ms'] or 0:8.1f}")
+    print(f"   errors: {errors}")
+    results["errors"] = errors
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API: requests/sec and p50/p99 latency.")
+    parser.add_argument("--url", help="Test an already running API instead of starting one")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Checkout to serve api.py from (e.g. a worktree of an older commit)")
+    parser.add_argument("--db-url", default=os.getenv("DB_URL"))
+    parser.add_argument("--sqlite", action="store_true", help="Serve a generated SQLite stand-in instead")
+    parser.add_argument("--products", type=int, default=20000, help="Stand-in size (products per source and day)")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument("--paths", nargs="+", default=list(DEFAULT_PATHS))
+    parser.add_argument("--cache", action="store_true", help="Keep the API response cache on")
+    parser.add_argument("--env", nargs="*", default=[], help="Extra KEY=VALUE settings for the server, e.g. DB_ASYNC=0")
+    parser.add_argument("--out", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process = None
+        base_url = args.url
+        if base_url is None:
+            env = dict(os.environ)
+            if args.sqlite:
+                path = os.path.join(tmp, "standin.db")
+                rows = build_sqlite_standin(path, args.products, args.days)
+                env["DB_URL"] = f"sqlite:///{path}"
+                print(f"🧪 SQLite stand-in with {rows:,} rows")
+            elif args.db_url:
+                env["DB_URL"] = args.db_url
+            else:
+                parser.error("Set DB_URL / --db-url, or pass --sqlite")
+            if not args.cache:
+                env["RESPONSE_CACHE_ENTRIES"] = "0"
+            env.update(item.split("=", 1) for item in args.env)
+            port = free_port()
+            process = start_server(args.app_dir, env, port)
+            base_url = f"http://127.0.0.1:{port}"
+
+        try:
+            print(f"🔥 {args.concurrency} clients for {args.duration:g}s against {base_url} ({args.app_dir})")
+            latencies, errors = asyncio.run(run_load(base_url, args.paths, args.concurrency, args.duration))
+            results = report(latencies, errors, args.duration)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "app_dir": args.app_dir, "env": args.env, "concurrency": args.concurrency,
+                       "duration": args.duration, "results": results}, f, indent=2)
+        print(f"📄 Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import csv
+import datetime
+import io
+
+from alert_dispatcher import create_alert_table
+from db import is_sqlite, placeholder, table_columns
+from etl_pipeline import normalize_title
+from migrate_schema import NORMALIZED_TITLE_SQL, ensure_month_partitions, is_normalized
+from price_history import ensure_history_index
+from summaries import create_summary_tables, rebuild_summaries, refresh_day
+
+# --- CONFIGURATION ---
+DEFAULT_BATCH_SIZE = 5000  # Rows per COPY / transaction
+
+# Column layout of `book_prices` in each database. The first column is the
+# title, which together with (source, run_date) forms the natural key.
+POSTGRES_COLUMNS = ("title", "price", "link")
+SQLITE_COLUMNS = ("product_name", "price", "availability", "scraped_at")
+
+STAGING_TABLE = "book_prices_staging"
+
+
+def default_columns(conn):
+    return SQLITE_COLUMNS if is_sqlite(conn) else POSTGRES_COLUMNS
+
+
+def ensure_schema(conn):
+    """
+    Creates `book_prices` if needed and adds the `source` / `run_date` columns
+    plus the unique (source, title, run_date) index that makes loads idempotent.
+
+    Rows written before this migration keep run_date = NULL; NULLs never clash
+    in a unique index, so old history with same-day duplicates stays valid.
+    The summary tables are created here too and backfilled from the existing
+    history the first time, along with `ingestion_batches`, whose latest
+    batch_id tells API caches that new data has landed. The per-product
+    history index (price_history.py) and the `alerted_deals` log
+    (alert_dispatcher.py) are added as well.
+    """
+    cursor = conn.cursor()
+    if is_sqlite(conn):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS book_prices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_name TEXT,
+                price REAL,
+                availability TEXT,
+                source TEXT,
+                scraped_at TIMESTAMP,
+                run_date TEXT
+            );
+        """)
+        existing = table_columns(conn, "book_prices")
+        if "source" not in existing:
+            cursor.execute("ALTER TABLE book_prices ADD COLUMN source TEXT")
+        if "run_date" not in existing:
+            cursor.execute("ALTER TABLE book_prices ADD COLUMN run_date TEXT")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS book_prices_natural_key
+            ON book_prices (source, product_name, run_date)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingestion_batches (
+                batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT,
+                run_date TEXT,
+                row_count INTEGER,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+    elif is_normalized(conn):
+        # book_prices is a view over products + price_observations (see migrate_schema.py)
+        pass
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS book_prices (
+                id SERIAL PRIMARY KEY,
+                title TEXT,
+                price DECIMAL,
+                link TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        cursor.execute("ALTER TABLE book_prices ADD COLUMN IF NOT EXISTS source TEXT")
+        cursor.execute("ALTER TABLE book_prices ADD COLUMN IF NOT EXISTS run_date DATE")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS book_prices_natural_key
+            ON book_prices (source, title, run_date)
+        """)
+        # Keyset pagination in /prices walks this index
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS book_prices_created_id
+            ON book_prices (created_at, id)
+        """)
+    if not is_sqlite(conn):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingestion_batches (
+                batch_id SERIAL PRIMARY KEY,
+                source TEXT,
+                run_date DATE,
+                row_count INTEGER,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+    conn.commit()
+    cursor.close()
+    ensure_history_index(conn)  # (product, day) lookups for /prices/{product}/history
+    create_alert_table(conn)  # Deals already emailed, so the next run doesn't repeat them
+
+    if create_summary_tables(conn):
+        rebuild_summaries(conn)
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _price_order(price):
+    # Missing prices lose to any real one, like ORDER BY price (NULLs last)
+    return float("inf") if price is None or price != price else price
+
+
+def _cheaper_than_loaded(batch, loaded, key, price_pos):
+    """
+    The rows of `batch` that undercut what this load already wrote for
+    their key (`loaded`: key -> price, updated here), so the cheapest row
+    of the whole load wins whatever the batch size.
+    """
+    kept = []
+    for row in batch:
+        k, price = key(row[0]), _price_order(row[price_pos])
+        if k not in loaded or price < loaded[k]:
+            kept.append(row)
+    for row in kept:
+        k, price = key(row[0]), _price_order(row[price_pos])
+        loaded[k] = min(price, loaded.get(k, price))
+    return kept
+
+
+def _copy_merge_batch(conn, cursor, batch, columns, source, run_date):
+    """
+    Postgres: COPY the batch into a temp staging table, then merge it into
+    book_prices with one INSERT ... ON CONFLICT statement.
+    """
+    load_cols = list(columns) + ["source", "run_date"]
+    col_list = ", ".join(load_cols)
+    title_col = columns[0]
+
+    # ON COMMIT DELETE ROWS empties the staging table after every batch
+    cursor.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE}
+        ON COMMIT DELETE ROWS
+        AS SELECT {col_list} FROM book_prices WITH NO DATA
+    """)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(list(row) + [source, run_date])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {STAGING_TABLE} ({col_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    # DISTINCT ON keeps one row per key inside the batch (the cheapest),
+    # otherwise ON CONFLICT would refuse to touch the same row twice.
+    # Rows already stored (an earlier run the same day) are always replaced
+    updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in columns[1:])
+    cursor.execute(f"""
+        INSERT INTO book_prices ({col_list})
+        SELECT DISTINCT ON (source, {title_col}, run_date) {col_list}
+        FROM {STAGING_TABLE}
+        ORDER BY source, {title_col}, run_date, price
+        ON CONFLICT (source, {title_col}, run_date)
+        DO UPDATE SET {updates}, created_at = CURRENT_TIMESTAMP
+    """)
+
+
+def _copy_merge_normalized_batch(conn, cursor, batch, columns, source, run_date):
+    """
+    Postgres with the normalized schema: COPY into staging, upsert the
+    products it mentions, then upsert one observation per product and day.
+    """
+    load_cols = list(columns) + ["source", "run_date"]
+    col_list = ", ".join(load_cols)
+    title_col = columns[0]
+    norm = NORMALIZED_TITLE_SQL.format(col=f"s.{title_col}")
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE}
+        ON COMMIT DELETE ROWS
+        AS SELECT {col_list} FROM book_prices WITH NO DATA
+    """)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(list(row) + [source, run_date])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {STAGING_TABLE} ({col_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    link_value = "s.link" if "link" in columns else "NULL"
+    cursor.execute(f"""
+        INSERT INTO products (source, normalized_title, title, link)
+        SELECT DISTINCT ON (s.source, {norm}) s.source, {norm}, s.{title_col}, {link_value}
+        FROM {STAGING_TABLE} s
+        ORDER BY s.source, {norm}, s.price
+        ON CONFLICT (source, normalized_title) DO NOTHING
+    """)
+
+    # One observation per product and day, replacing an earlier run's; the
+    # product's title/link follow the observation that was written
+    availability_value = "s.availability" if "availability" in columns else "NULL"
+    cursor.execute(f"""
+        WITH best AS (
+            SELECT DISTINCT ON (p.product_id) p.product_id, s.price, {availability_value} AS availability,
+                   s.run_date, s.{title_col} AS title, {link_value} AS link
+            FROM {STAGING_TABLE} s
+            JOIN products p ON p.source = s.source AND p.normalized_title = {norm}
+            ORDER BY p.product_id, s.price
+        ), won AS (
+            INSERT INTO price_observations (product_id, price, availability, run_date)
+            SELECT product_id, price, availability, run_date FROM best
+            ON CONFLICT (product_id, run_date)
+            DO UPDATE SET price = EXCLUDED.price, availability = EXCLUDED.availability,
+                          observed_at = CURRENT_TIMESTAMP
+            RETURNING product_id
+        )
+        UPDATE products p SET title = best.title, link = COALESCE(best.link, p.link)
+        FROM best JOIN won ON won.product_id = best.product_id
+        WHERE p.product_id = best.product_id
+    """)
+
+
+def _executemany_batch(conn, cursor, batch, columns, source, run_date):
+    """
+    SQLite: one executemany upsert inside a single transaction.
+    """
+    load_cols = list(columns) + ["source", "run_date"]
+    title_col = columns[0]
+
+    # Same rule as the Postgres path: one row per title, the cheapest one
+    price_pos = columns.index("price")
+    cheapest = {}
+    for row in batch:
+        if row[0] not in cheapest or _price_order(row[price_pos]) < _price_order(cheapest[row[0]][price_pos]):
+            cheapest[row[0]] = row
+    batch = list(cheapest.values())
+
+    marks = ", ".join("?" for _ in load_cols)
+    updates = ", ".join(f"{col} = excluded.{col}" for col in columns[1:])
+    cursor.executemany(
+        f"""
+        INSERT INTO book_prices ({", ".join(load_cols)}) VALUES ({marks})
+        ON CONFLICT (source, {title_col}, run_date) DO UPDATE SET {updates}
+        """,
+        [tuple(row) + (source, run_date) for row in batch],
+    )
+
+
+def load_rows(conn, rows, source, run_date=None, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Bulk-loads `rows` into book_prices for one source and run date.
+
+    Each row is a tuple matching `columns` (by default (title, price, link)
+    on Postgres and (product_name, price, availability, scraped_at) on
+    SQLite). One row is kept per (source, title, run_date): the cheapest
+    of this load, whatever the batch size, and it replaces the row an
+    earlier run stored for the same day, so a re-run can correct a bad
+    price and never duplicates rows (migrate_schema.migrate keeps the
+    latest row per day the same way). Every batch is committed on its
+    own, so a failure only loses the batch in flight. The day's summary
+    rows are refreshed and a new ingestion batch is recorded at the end.
+    Returns the number of rows sent.
+    """
+    columns = tuple(columns or default_columns(conn))
+    if run_date is None:
+        run_date = datetime.date.today()
+    if not isinstance(run_date, str):
+        run_date = run_date.isoformat()
+    if is_sqlite(conn):
+        write_batch = _executemany_batch
+    elif is_normalized(conn):
+        ensure_month_partitions(conn, run_date)
+        write_batch = _copy_merge_normalized_batch
+    else:
+        write_batch = _copy_merge_batch
+
+    # Normalized products are keyed by normalized title, the other tables by the title itself
+    key = normalize_title if write_batch is _copy_merge_normalized_batch else (lambda title: title)
+    price_pos = columns.index("price")
+    written = {}
+
+    cursor = conn.cursor()
+    loaded = 0
+    try:
+        for batch in _batches(rows, batch_size):
+            loaded += len(batch)
+            batch = _cheaper_than_loaded(batch, written, key, price_pos)
+            if batch:
+                write_batch(conn, cursor, batch, columns, source, run_date)
+                conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    # Keep /stats and the analyst report in sync with what we just wrote,
+    # then bump the batch id so API caches drop their old responses
+    if loaded:
+        refresh_day(conn, source, run_date)
+        record_batch(conn, source, run_date, loaded)
+    return loaded
+
+
+def record_batch(conn, source, run_date, row_count):
+    """
+    Registers a finished load in ingestion_batches and returns its batch_id.
+    """
+    p = placeholder(conn)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"INSERT INTO ingestion_batches (source, run_date, row_count) VALUES ({p}, {p}, {p})",
+        (source, run_date, row_count),
+    )
+    conn.commit()
+    cursor.execute("SELECT MAX(batch_id) FROM ingestion_batches")
+    batch_id = cursor.fetchone()[0]
+    cursor.close()
+    return batch_id
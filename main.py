@@ -1,106 +1,214 @@
-import requests
-from bs4 import BeautifulSoup
-import psycopg2
 import os
-import pandas as pd  # Import Pandas for the merging
+import time
 from datetime import datetime
-from notifications import send_email_alert
-from etl_pipeline import run_etl_process  # <--- IMPORT YOUR NEW MODULE
+from alert_dispatcher import AlertDispatcher
+from price_drops import find_deals
+from http_cache import HttpCache
+from loader import default_columns, ensure_schema, load_rows
+from delta import DeltaFilter
+from db import connect_raw
+from instrumentation import inc, metrics, stage
+from snapshots import export_day
+from pipeline import Pipeline, PipelineError, Stage
+from sources import Scheduler, registered_sources
+from contextlib import closing
 
 # --- CONFIGURATION ---
-URL = "http://books.toscrape.com/"
+# Competitors (start URLs, pagination, selectors, CSV feeds) are declared in sources.py;
+# CRAWL_ALL_PAGES / CRAWL_DETAILS / SCRAPE_CONCURRENCY / SCRAPE_DOMAIN_RATE are read there.
+LOAD_BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", "5000"))
+
+# A source that fails to scrape is retried this many times (only the failed ones are re-crawled)
+SCRAPE_RETRIES = int(os.getenv("SCRAPE_RETRIES", "2"))
+SCRAPE_RETRY_BACKOFF = 5  # Seconds, doubled on every attempt
+
+# Conditional-request cache: unchanged pages are neither parsed nor re-uploaded
+USE_HTTP_CACHE = os.getenv("HTTP_CACHE", "1") == "1"
+
+# "full" writes every scraped row; "delta" only writes changed prices plus periodic heartbeats
+INGEST_MODE = os.getenv("INGEST_MODE", "full")
+
+# Write today's rows to the local Parquet snapshot too (analytics read it instead of the DB)
+EXPORT_SNAPSHOT = os.getenv("EXPORT_SNAPSHOT", "0") == "1"
 
 # --- DATABASE CONNECTION ---
 def get_db_connection():
     try:
-        db_url = os.getenv("DB_URL")
-        # Fallback for local testing if secrets aren't set
-        if not db_url:
-            import config
-            db_url = config.DB_URL
-        conn = psycopg2.connect(db_url)
+        # DB_URL env var first, config.py as the local fallback (see db.py)
+        conn = connect_raw()
         return conn
     except Exception as e:
         print(f"❌ Database Connection Error: {e}")
         return None
 
-# --- SCRAPER FUNCTION (SITE A) ---
-def scrape_books():
-    print("🌍 Scraping Books to Scrape (Site A)...")
+# --- SCRAPING (ALL SOURCES AT ONCE) ---
+def scrape_sources(scheduler, sources):
+    """
+    Crawls every source concurrently (see sources.Scheduler). Sources that
+    fail are crawled again, on their own, up to SCRAPE_RETRIES times.
+    Returns {name: SourceResult}.
+    """
+    print(f"🌍 Scraping {len(sources)} source(s) with up to {scheduler.max_concurrency} requests in flight...")
+    results = {}
+    todo = list(sources)
+    for attempt in range(SCRAPE_RETRIES + 1):
+        if attempt:
+            wait_seconds = SCRAPE_RETRY_BACKOFF * (2 ** (attempt - 1))
+            print(f"🔁 Retrying {', '.join(s.name for s in todo)} in {wait_seconds}s")
+            time.sleep(wait_seconds)
+        results.update(scheduler.run(todo))
+        todo = [s for s in todo if results[s.name].error is not None]
+        if not todo:
+            break
+
+    for result in results.values():
+        if result.error is not None:
+            print(f"❌ {result.name}: scraping failed ({result.error})")
+        else:
+            cached = f", {result.unchanged_pages} unchanged" if result.unchanged_pages else ""
+            print(f"✅ {result.name}: {len(result.rows)} rows from {result.pages} page(s){cached} "
+                  f"in {result.seconds:.1f}s")
+    return results
+
+# --- WATCHDOG (ALERTS) ---
+def watch_prices(conn, rows, source, run_date, alerts):
+    """
+    Alerts on real price drops: today's prices are compared with each
+    product's recent history (see price_drops.py), not a fixed threshold.
+    """
     try:
-        response = requests.get(URL)
-        soup = BeautifulSoup(response.text, "html.parser")
-        books = soup.select(".product_pod")
-        
-        data = []
-        for book in books:
-            title = book.select_one("h3 a")["title"]
-            price_text = book.select_one(".price_color").text
-            price = float(price_text.replace("£", "").replace("Â", ""))
-            link = URL + book.select_one("h3 a")["href"]
-
-            # WATCHDOG LOGIC (Alerts)
-            if price < 33.0:
-                print(f"🔥 Found a deal: {title} (£{price})")
-                send_email_alert(title, price, link)
-            
-            data.append((title, price, link))
-            
-        print(f"✅ Scraped {len(data)} books from Site A.")
-        return data
+        deals = find_deals(conn, rows, source, run_date)
     except Exception as e:
-        print(f"❌ Scraping Error: {e}")
-        return []
+        print(f"⚠️ Price-drop check failed (no alerts this run): {e}")
+        return 0
+    for deal in deals.itertuples(index=False):
+        print(f"🔥 Found a deal: {deal.title} (£{deal.price}) - {deal.reason}")
+        alerts.enqueue(deal.title, deal.price, deal.link)
+    return len(deals)
+
+# --- PIPELINE STAGES ---
+def build_pipeline(http_cache, alerts, run_date, scheduler):
+    """
+    The daily job as a DAG (see pipeline.py). One `crawl` stage scrapes
+    every due source concurrently; after that each source gets its own
+    scrape/load (and, for watched sources, watchdog) stages, so one broken
+    competitor never blocks the others. Per-source outputs are
+    checkpointed: a re-run after a failure only crawls the sources whose
+    rows were not kept yet.
+    """
+    sources = scheduler.plan()
+    pipeline = None
+
+    def crawl():
+        # Not checkpointed: it re-runs on resume, but only for sources without a scrape checkpoint
+        todo = [s for s in sources if not pipeline.has_checkpoint(f"scrape_{s.name}")]
+        return scrape_sources(scheduler, todo) if todo else {}
+
+    def scrape(source):
+        def scrape_source(crawl):
+            result = crawl[source.name]
+            if result.error is not None:
+                raise RuntimeError(f"{source.name} could not be scraped: {result.error}")
+            rows = result.rows
+            inc("rows_scraped_total", len(rows), source=source.name)
+            return rows
+        return scrape_source
+
+    def schema():
+        # Create Table / add the natural-key columns if they don't exist
+        with closing(connect_raw()) as conn:
+            ensure_schema(conn)
+
+    def watchdog(source):
+        def watch_source(schema, **inputs):
+            # Check for price drops against the history stored so far (emails go out in the background)
+            with closing(connect_raw()) as conn:
+                deals = watch_prices(conn, inputs[f"scrape_{source.name}"], source.name, run_date, alerts)
+            inc("deals_found_total", deals)
+            return deals
+        return watch_source
+
+    def load(source):
+        def load_source(schema, **inputs):
+            rows = inputs[f"scrape_{source.name}"]
+            # Bulk COPY + upsert: re-running the same day replaces that day's row per product instead of duplicating it
+            with closing(connect_raw()) as conn:
+                if INGEST_MODE == "delta":
+                    delta = DeltaFilter(conn, source.name, default_columns(conn))
+                    rows = delta.filter(rows, run_date)
+                    delta.stats.report(source.name)
+                    inc("rows_skipped_total", delta.stats.skipped, source=source.name)
+                loaded = load_rows(conn, rows, source=source.name, run_date=run_date, batch_size=LOAD_BATCH_SIZE)
+            inc("rows_loaded_total", loaded, source=source.name)
+            print(f"🚀 Uploaded {loaded} {source.name} rows to the Cloud Database!")
+            return loaded
+        return load_source
+
+    def refresh(**loads):
+        # Only remember pages as "seen" (and sources as fresh) once their rows are safely stored
+        if http_cache is not None:
+            http_cache.commit()
+        scheduler.mark_refreshed([s.name for s in sources])
+
+    def snapshot(**loads):
+        with closing(connect_raw()) as conn:
+            exported = export_day(conn, run_date, sources=[s.name for s in sources])
+        inc("rows_exported_total", exported)
+        print(f"📦 Snapshot: {exported} rows written to Parquet.")
+        return exported
+
+    stages = [
+        Stage("crawl", crawl, checkpoint=False),
+        Stage("schema", schema, retries=2, backoff=5),
+    ]
+    loads = []
+    for source in sources:
+        scraped = f"scrape_{source.name}"
+        stages.append(Stage(scraped, scrape(source), deps=["crawl"]))
+        if source.watch:
+            stages.append(Stage(f"watchdog_{source.name}", watchdog(source), deps=[scraped, "schema"]))
+        loads.append(f"load_{source.name}")
+        stages.append(Stage(loads[-1], load(source), deps=[scraped, "schema"], retries=3, backoff=5))
+    stages.append(Stage("refresh", refresh, deps=loads, checkpoint=False))
+    if EXPORT_SNAPSHOT:
+        stages.append(Stage("snapshot", snapshot, deps=loads, retries=1))
+    pipeline = Pipeline(stages)
+    return pipeline
 
 # --- MAIN EXECUTION ---
 if __name__ == "__main__":
-    # 1. Get Real Data (Site A)
-    site_a_data = scrape_books()
-    
-    # 2. Get Competitor Data (Site B) - NEW STEP!
-    print("\n🔄 Running ETL Pipeline for Competitor Data (Site B)...")
+    # Every stage is timed (see instrumentation.py); the run ends with a JSON summary in run_summary.json
+    http_cache = HttpCache() if USE_HTTP_CACHE else None
+    alerts = AlertDispatcher()
+    scheduler = Scheduler(registered_sources(), cache=http_cache)
+    pipeline = build_pipeline(http_cache, alerts, datetime.now().date(), scheduler)
+
+    failed = False
     try:
-        # Run the cleaning script we wrote
-        df_competitor = run_etl_process("competitor_prices_messy.csv")
-        
-        # Convert DataFrame to a list of tuples so it matches Site A format
-        # We ensure the columns match: (Title, Price, Link)
-        site_b_data = list(df_competitor[['clean_title', 'price', 'url']].itertuples(index=False, name=None))
-        
-        print(f"✅ ETL Complete. Merging {len(site_b_data)} competitor rows.")
-        
-    except Exception as e:
-        print(f"⚠️ ETL Failed (Skipping Competitor Data): {e}")
-        site_b_data = []
-
-    # 3. MERGE THE DATASETS
-    all_data = site_a_data + site_b_data
-    print(f"\n📊 Total Market Data Points: {len(all_data)}")
-
-    # 4. UPLOAD TO DATABASE
-    conn = get_db_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            # Create Table if it doesn't exist
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS book_prices (
-                    id SERIAL PRIMARY KEY,
-                    title TEXT,
-                    price DECIMAL,
-                    link TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            # Insert Data
-            insert_query = "INSERT INTO book_prices (title, price, link) VALUES (%s, %s, %s)"
-            cursor.executemany(insert_query, all_data)
-            
-            conn.commit()
-            print(f"🚀 SUCCESS: Uploaded {len(all_data)} rows to the Cloud Database!")
-            
-            cursor.close()
-            conn.close()
-        except Exception as e:
-            print(f"❌ Database Upload Failed: {e}")
\ No newline at end of file
+        outputs = pipeline.run()
+        total = sum(len(rows) for name, rows in outputs.items() if name.startswith("scrape_"))
+        uploaded = sum(loaded for name, loaded in outputs.items() if name.startswith("load_"))
+        print(f"\n📊 Total Market Data Points: {total}")
+        print(f"🚀 SUCCESS: Uploaded {uploaded} rows to the Cloud Database!")
+    except PipelineError as e:
+        failed = True
+        print(f"❌ Pipeline incomplete: {e}")
+    finally:
+        scheduler.close()
+
+    # Wait for the alert emails still being sent in the background
+    with stage("alerts"):
+        alerts.close()
+    alerts.stats.report()
+
+    if http_cache is not None:
+        http_cache.stats.report()
+        inc("http_bytes_saved_total", http_cache.stats.bytes_saved)
+
+    # RUN SUMMARY (machine-readable, for spotting which stage got slower)
+    summary = metrics.write_summary()
+    print("⏱️ Stage timings: " + ", ".join(f"{s['stage']} {s['seconds']:.2f}s" for s in summary["stages"]))
+
+    # Non-zero exit marks the scheduled run as failed; re-running it the same day resumes from the checkpoints
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,238 @@
+import os
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from db import is_sqlite, placeholder, table_columns
+from etl_pipeline import normalize_title
+
+# --- CROSS-SOURCE PRODUCT MATCHING ---
+# Competitors spell titles differently ("STARVING HEARTS (TRIANGULAR TRADE
+# TRILOGY, #1)" vs "Starving Hearts (Triangular Trade Trilogy, #1)"), so
+# an exact join on product_name finds almost nothing. Matching runs in stages:
+#   1. exact match on a normalized key                   O(n) dict lookup
+#   2. blocking: candidates share one of the title's rarest tokens
+#   3. fuzzy scoring of the few candidates left (token Jaccard, then difflib)
+# Pairs are stored in product_matches, so later runs only match new titles.
+
+MATCH_THRESHOLD = float(os.getenv("MATCH_THRESHOLD", "0.88"))  # Minimum fuzzy score accepted
+MATCH_WINDOW = pd.Timedelta(os.getenv("MATCH_WINDOW", "1D"))    # Max gap between compared observations
+MAX_BLOCK_SIZE = 200      # Tokens shared by more titles than this are too common to block on
+BLOCKING_TOKENS = 3       # Rarest tokens of a title used to look up candidates
+TOP_CANDIDATES = 5        # Candidates per title that get the (slower) difflib score
+
+STOP_WORDS = {"the", "a", "an", "and", "of", "in", "on", "to", "for", "with", "vol", "volume", "edition"}
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def match_key(title):
+    """
+    Normalized title used as the product's identity across sources:
+    lower case, punctuation dropped, whitespace collapsed.
+    """
+    return _NON_ALNUM.sub(" ", normalize_title(title)).strip()
+
+
+def tokens(key):
+    return {token for token in key.split() if token not in STOP_WORDS and len(token) > 1}
+
+
+class BlockingIndex:
+    """
+    Inverted index token -> competitor keys. Only titles sharing a rare
+    token are ever compared, which keeps matching close to linear.
+    """
+
+    def __init__(self, keys, max_block_size=MAX_BLOCK_SIZE):
+        self.keys = list(keys)
+        self.tokens = [tokens(key) for key in self.keys]
+        self.blocks = defaultdict(list)
+        for idx, key_tokens in enumerate(self.tokens):
+            for token in key_tokens:
+                self.blocks[token].append(idx)
+        self.max_block_size = max_block_size
+
+    def candidates(self, key_tokens):
+        usable = [t for t in key_tokens if 0 < len(self.blocks.get(t, ())) <= self.max_block_size]
+        usable.sort(key=lambda t: len(self.blocks[t]))
+        found = set()
+        for token in usable[:BLOCKING_TOKENS]:
+            found.update(self.blocks[token])
+        return found
+
+
+def match_products(titles_a, titles_b, known=None, threshold=MATCH_THRESHOLD):
+    """
+    Matches our titles (`titles_a`) to competitor titles (`titles_b`).
+
+    Returns a DataFrame with product_key, competitor_key, score and method
+    ("exact" or "fuzzy"), one row per matched product. Products already in
+    `known` (a DataFrame from load_matches) are skipped, and each competitor
+    product is matched at most once.
+    """
+    keys_a = {match_key(t) for t in titles_a if isinstance(t, str)} - {""}
+    keys_b = {match_key(t) for t in titles_b if isinstance(t, str)} - {""}
+    if known is not None and not known.empty:
+        keys_a -= set(known["product_key"])
+        keys_b -= set(known["competitor_key"])
+
+    # 1. Exact key matches
+    exact = keys_a & keys_b
+    pairs = [(key, key, 1.0, "exact") for key in exact]
+
+    # 2 + 3. Blocked fuzzy matching on what's left
+    index = BlockingIndex(keys_b - exact)
+    fuzzy = []
+    for key_a in keys_a - exact:
+        key_tokens = tokens(key_a)
+        candidates = index.candidates(key_tokens)
+        if not candidates:
+            continue
+        # Cheap token-overlap pre-score, then difflib on the best few only
+        ranked = sorted(
+            candidates,
+            key=lambda idx: len(key_tokens & index.tokens[idx]) / len(key_tokens | index.tokens[idx]),
+            reverse=True,
+        )[:TOP_CANDIDATES]
+        best_score, best_key = 0.0, None
+        for idx in ranked:
+            key_b = index.keys[idx]
+            matcher = SequenceMatcher(None, key_a, key_b)
+            if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best_score, best_key = score, key_b
+        if best_key is not None and best_score >= threshold:
+            fuzzy.append((key_a, best_key, round(best_score, 4), "fuzzy"))
+
+    # Best score wins when two of our products want the same competitor product
+    fuzzy.sort(key=lambda pair: pair[2], reverse=True)
+    taken = set()
+    for pair in fuzzy:
+        if pair[1] not in taken:
+            taken.add(pair[1])
+            pairs.append(pair)
+
+    return pd.DataFrame(pairs, columns=["product_key", "competitor_key", "score", "method"])
+
+
+# --- PERSISTED MAPPING ---
+
+def ensure_match_table(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_matches (
+            product_source TEXT NOT NULL,
+            product_key TEXT NOT NULL,
+            competitor_source TEXT NOT NULL,
+            competitor_key TEXT NOT NULL,
+            score REAL,
+            method TEXT,
+            matched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (product_source, product_key, competitor_source)
+        );
+    """)
+    conn.commit()
+    cursor.close()
+
+
+def load_matches(conn, source_a, source_b):
+    p = placeholder(conn)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""SELECT product_key, competitor_key, score, method FROM product_matches
+            WHERE product_source = {p} AND competitor_source = {p}""",
+        (source_a, source_b),
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    return pd.DataFrame(rows, columns=["product_key", "competitor_key", "score", "method"])
+
+
+def save_matches(conn, matches, source_a, source_b):
+    if matches.empty:
+        return 0
+    p = placeholder(conn)
+    cursor = conn.cursor()
+    cursor.executemany(
+        f"""
+        INSERT INTO product_matches (product_source, product_key, competitor_source, competitor_key, score, method)
+        VALUES ({p}, {p}, {p}, {p}, {p}, {p})
+        ON CONFLICT (product_source, product_key, competitor_source)
+        DO UPDATE SET competitor_key = excluded.competitor_key, score = excluded.score,
+                      method = excluded.method, matched_at = CURRENT_TIMESTAMP
+        """,
+        [
+            (source_a, row.product_key, source_b, row.competitor_key, float(row.score), row.method)
+            for row in matches.itertuples(index=False)
+        ],
+    )
+    conn.commit()
+    cursor.close()
+    return len(matches)
+
+
+def update_matches(conn, titles_a, titles_b, source_a, source_b, threshold=MATCH_THRESHOLD):
+    """
+    Matches only titles not mapped yet, stores the new pairs and returns the
+    full mapping (old + new).
+    """
+    ensure_match_table(conn)
+    known = load_matches(conn, source_a, source_b)
+    new = match_products(titles_a, titles_b, known=known, threshold=threshold)
+    save_matches(conn, new, source_a, source_b)
+    print(f"🔗 Matching: {len(known)} known pairs reused, {len(new)} new ({(new['method'] == 'fuzzy').sum()} fuzzy).")
+    return pd.concat([known, new], ignore_index=True)
+
+
+# --- PRICE COMPARISON ---
+
+def load_observations(conn, source):
+    """
+    Every (title, price, observed_at) row of one source.
+    """
+    if is_sqlite(conn):
+        title_col, time_col = "product_name", "scraped_at"
+    else:
+        title_col, time_col = "title", "created_at"
+    if "run_date" in table_columns(conn, "book_prices"):
+        time_col = f"COALESCE({time_col}, run_date)"
+    p = placeholder(conn)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT {title_col}, price, {time_col} FROM book_prices WHERE source = {p} AND price IS NOT NULL",
+        (source,),
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    df = pd.DataFrame(rows, columns=["title", "price", "observed_at"])
+    df["price"] = df["price"].astype(float)
+    df["observed_at"] = pd.to_datetime(df["observed_at"], format="mixed")
+    return df
+
+
+def compare_prices(obs_a, obs_b, matches, window=MATCH_WINDOW):
+    """
+    Pairs every observation of ours with the nearest competitor observation
+    of the matched product taken within `window`.
+    """
+    key_map = dict(zip(matches["product_key"], matches["competitor_key"]))
+    left = obs_a.assign(competitor_key=obs_a["title"].map(match_key).map(key_map)).dropna(subset=["competitor_key"])
+    right = obs_b.assign(competitor_key=obs_b["title"].map(match_key))
+    right = right[right["competitor_key"].isin(set(key_map.values()))]
+
+    merged = pd.merge_asof(
+        left.sort_values("observed_at"),
+        right.sort_values("observed_at").rename(columns={"title": "competitor_title"}),
+        on="observed_at",
+        by="competitor_key",
+        direction="nearest",
+        tolerance=window,
+        suffixes=("_a", "_b"),
+    ).dropna(subset=["price_b"])
+    merged["price_difference"] = merged["price_a"] - merged["price_b"]
+    return merged[["title", "competitor_title", "price_a", "price_b", "price_difference", "observed_at"]]
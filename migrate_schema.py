@@ -0,0 +1,206 @@
+import datetime
+
+from db import connect_raw, is_sqlite
+
+# --- NORMALIZED PRICE-HISTORY SCHEMA (Postgres) ---
+# products            one row per (source, normalized title): the long text lives here once
+# price_observations  narrow fact table (product_id, price, availability, run_date, observed_at),
+#                     range-partitioned by month on run_date
+# book_prices         a VIEW joining the two, so the API, dashboard and scripts keep working
+
+# Same rule as etl_pipeline.normalize_title
+NORMALIZED_TITLE_SQL = "LOWER(BTRIM(REGEXP_REPLACE({col}, '\\s+', ' ', 'g')))"
+
+BOOK_PRICES_VIEW_SQL = """
+    CREATE VIEW book_prices AS
+    SELECT o.observation_id AS id,
+           p.title,
+           o.price,
+           p.link,
+           o.observed_at AS created_at,
+           p.source,
+           o.run_date,
+           o.availability,
+           o.product_id
+    FROM price_observations o
+    JOIN products p ON p.product_id = o.product_id
+"""
+
+
+def is_normalized(conn):
+    """
+    True once book_prices has been replaced by the compatibility view.
+    """
+    if is_sqlite(conn):
+        return False
+    cursor = conn.cursor()
+    # Only the book_prices unqualified queries resolve to, not a bench schema's copy
+    cursor.execute("""
+        SELECT table_type FROM information_schema.tables
+        WHERE table_schema = current_schema() AND table_name = 'book_prices'
+    """)
+    row = cursor.fetchone()
+    cursor.close()
+    return row is not None and row[0] == "VIEW"
+
+
+def _month_start(day):
+    return datetime.date(day.year, day.month, 1)
+
+
+def _next_month(day):
+    return datetime.date(day.year + (day.month == 12), day.month % 12 + 1, 1)
+
+
+def ensure_month_partitions(conn, first_day, last_day=None):
+    """
+    Creates the monthly partitions covering first_day..last_day (inclusive).
+    Called by the loader before every load, so a month's partition exists
+    before its first row arrives. The per-source loads run in parallel, and
+    two concurrent CREATE TABLE IF NOT EXISTS ... PARTITION OF can still
+    collide, so creation is serialized with a transaction-scoped advisory lock.
+    """
+    if isinstance(first_day, str):
+        first_day = datetime.date.fromisoformat(first_day)
+    last_day = last_day or first_day
+    if isinstance(last_day, str):
+        last_day = datetime.date.fromisoformat(last_day)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('price_observations partitions'))")  # Released on commit
+    month = _month_start(first_day)
+    while month <= last_day:
+        upper = _next_month(month)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS price_observations_{month:%Y_%m}
+            PARTITION OF price_observations
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')
+        """)
+        month = upper
+    conn.commit()
+    cursor.close()
+
+
+def create_normalized_schema(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            product_id BIGSERIAL PRIMARY KEY,
+            source TEXT NOT NULL,
+            normalized_title TEXT NOT NULL,
+            title TEXT NOT NULL,
+            link TEXT,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (source, normalized_title)
+        );
+    """)
+    # Cross-source lookups by title (price history); the unique key leads with source
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS products_normalized_title
+        ON products (normalized_title)
+    """)
+    # Unique keys on a partitioned table must include the partition key (run_date)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS price_observations (
+            observation_id BIGSERIAL,
+            product_id BIGINT NOT NULL REFERENCES products (product_id),
+            price DECIMAL,
+            availability TEXT,
+            run_date DATE NOT NULL,
+            observed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (observation_id, run_date),
+            UNIQUE (product_id, run_date)
+        ) PARTITION BY RANGE (run_date);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS price_observations_product_time
+        ON price_observations (product_id, observed_at)
+    """)
+    # Keyset pagination in /prices and the dashboard watermark walk this one
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS price_observations_time_id
+        ON price_observations (observed_at, observation_id)
+    """)
+    conn.commit()
+    cursor.close()
+
+
+def migrate(conn):
+    """
+    Moves the flat book_prices table into products + price_observations and
+    puts the compatibility view in its place. Safe to run twice.
+
+    Legacy rows without run_date use the date of created_at; rows without a
+    source become 'Unknown'. Same-day duplicates of a product (from re-runs
+    before the loader was idempotent) collapse into the day's latest row.
+    Observation ids reuse the old book_prices ids, so cursors and the
+    dashboard watermark stay valid. The old table is kept as book_prices_legacy.
+    """
+    if is_normalized(conn):
+        print("✅ book_prices is already a view on the normalized schema.")
+        return False
+
+    create_normalized_schema(conn)
+    cursor = conn.cursor()
+
+    day_expr = "COALESCE(run_date, CAST(created_at AS DATE))"
+    norm = NORMALIZED_TITLE_SQL.format(col="title")
+
+    cursor.execute(f"SELECT MIN({day_expr}), MAX({day_expr}) FROM book_prices")
+    first_day, last_day = cursor.fetchone()
+    today = datetime.date.today()
+    ensure_month_partitions(conn, first_day or today, max(last_day or today, _next_month(today)))
+
+    print("📦 Building products dimension...")
+    cursor.execute(f"""
+        INSERT INTO products (source, normalized_title, title, link, first_seen)
+        SELECT DISTINCT ON (src, norm) src, norm, title, link, first_seen
+        FROM (
+            SELECT COALESCE(source, 'Unknown') AS src, {norm} AS norm, title, link,
+                   MIN(created_at) OVER (PARTITION BY COALESCE(source, 'Unknown'), {norm}) AS first_seen,
+                   created_at
+            FROM book_prices
+            WHERE title IS NOT NULL
+        ) t
+        ORDER BY src, norm, created_at DESC
+        ON CONFLICT (source, normalized_title) DO NOTHING
+    """)
+
+    print("📈 Copying price observations...")
+    cursor.execute(f"""
+        INSERT INTO price_observations (observation_id, product_id, price, run_date, observed_at)
+        SELECT DISTINCT ON (p.product_id, {day_expr})
+               b.id, p.product_id, b.price, {day_expr}, COALESCE(b.created_at, CURRENT_TIMESTAMP)
+        FROM book_prices b
+        JOIN products p
+          ON p.source = COALESCE(b.source, 'Unknown') AND p.normalized_title = {NORMALIZED_TITLE_SQL.format(col="b.title")}
+        WHERE {day_expr} IS NOT NULL
+        ORDER BY p.product_id, {day_expr}, b.created_at DESC, b.id DESC
+        ON CONFLICT DO NOTHING
+    """)
+    copied = cursor.rowcount
+    cursor.execute("""
+        SELECT setval(pg_get_serial_sequence('price_observations', 'observation_id'),
+                      GREATEST((SELECT MAX(observation_id) FROM price_observations), 1))
+    """)
+
+    print("🔁 Swapping book_prices for the compatibility view...")
+    cursor.execute("ALTER TABLE book_prices RENAME TO book_prices_legacy")
+    cursor.execute(BOOK_PRICES_VIEW_SQL)
+    conn.commit()
+    cursor.close()
+
+    print(f"✨ Migration complete: {copied} observations. Old table kept as 'book_prices_legacy'.")
+    return True
+
+
+if __name__ == "__main__":
+    from summaries import rebuild_summaries
+
+    conn = connect_raw()
+    try:
+        if migrate(conn):
+            # Same-day duplicates were collapsed, so recount the summaries
+            rebuild_summaries(conn)
+    finally:
+        conn.close()
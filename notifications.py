@@ -1,51 +1,117 @@
 import smtplib
 from email.message import EmailMessage
 import os
+from instrumentation import inc
+
+# --- SMTP SETTINGS ---
+# Gmail over SSL by default; point SMTP_HOST/SMTP_PORT at a local server
+# (with SMTP_SSL=0) to test alerts without sending real mail.
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))  # Port 465 is the standard secure port for SMTP SSL
+SMTP_SSL = os.getenv("SMTP_SSL", "1") == "1"
+SMTP_TIMEOUT = 30
+
+
+def load_credentials():
+    """
+    Returns (sender, password, receiver).
+    Smart-Load: check local config.py first, then environment variables.
+    """
+    try:
+        import config
+        return config.EMAIL_SENDER, config.EMAIL_PASSWORD, config.EMAIL_RECEIVER
+    except ImportError:
+        # If config.py is missing (like on GitHub Actions), use Environment Variables
+        return os.getenv("EMAIL_SENDER"), os.getenv("EMAIL_PASSWORD"), os.getenv("EMAIL_RECEIVER")
+
+
+def open_smtp(sender, password):
+    """
+    Opens (and logs in to) one SMTP session. Use it as a context manager
+    and send as many messages through it as needed.
+    """
+    try:
+        if SMTP_SSL:
+            smtp = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        else:
+            smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if password:
+            smtp.login(sender, password)
+    except Exception:
+        inc("smtp_errors_total")
+        raise
+    inc("smtp_sessions_total")
+    return smtp
+
+
+def send_message(smtp, msg):
+    """
+    Sends one message over an open session and counts it.
+    """
+    try:
+        smtp.send_message(msg)
+    except Exception:
+        inc("email_errors_total")
+        raise
+    inc("emails_sent_total")
+    inc("email_bytes_sent_total", len(msg.as_bytes()))
+
+
+def build_alert_message(product_name, current_price, link, sender, receiver):
+    msg = EmailMessage()
+    msg['Subject'] = f"🚨 PRICE DROP ALERT: {product_name}"
+    msg['From'] = sender
+    msg['To'] = receiver
+
+    body = f"""
+    Good news! We found a price drop.
+
+    📦 Product: {product_name}
+    💰 New Price: £{current_price}
+
+    👉 Buy Now: {link}
+
+    (This is an automated message from your Market Scraper Bot)
+    """
+    msg.set_content(body)
+    return msg
+
+
+def build_digest_message(deals, sender, receiver):
+    """
+    One email listing every (product_name, price, link) deal.
+    """
+    msg = EmailMessage()
+    msg['Subject'] = f"🚨 PRICE DROP DIGEST: {len(deals)} deals found"
+    msg['From'] = sender
+    msg['To'] = receiver
+
+    lines = [f"📦 {name} - 💰 £{price}\n   👉 {link}" for name, price, link in deals]
+    body = "Good news! We found these price drops:\n\n" + "\n\n".join(lines)
+    body += "\n\n(This is an automated message from your Market Scraper Bot)\n"
+    msg.set_content(body)
+    return msg
+
 
 def send_email_alert(product_name, current_price, link):
     """
     Sends an email alert when a price drop is detected.
+    Opens its own SMTP session: for many deals use alert_dispatcher instead.
     """
     try:
-        # 1. Load Credentials (Smart-Load: Check Local first, then Cloud)
-        try:
-            import config
-            sender = config.EMAIL_SENDER
-            password = config.EMAIL_PASSWORD
-            receiver = config.EMAIL_RECEIVER
-        except ImportError:
-            # If config.py is missing (like on GitHub Actions), use Environment Variables
-            sender = os.getenv("EMAIL_SENDER")
-            password = os.getenv("EMAIL_PASSWORD")
-            receiver = os.getenv("EMAIL_RECEIVER")
+        # 1. Load Credentials
+        sender, password, receiver = load_credentials()
 
         # 2. Create the Email content
-        msg = EmailMessage()
-        msg['Subject'] = f"🚨 PRICE DROP ALERT: {product_name}"
-        msg['From'] = sender
-        msg['To'] = receiver
-        
-        body = f"""
-        Good news! We found a price drop.
-        
-        📦 Product: {product_name}
-        💰 New Price: £{current_price}
-        
-        👉 Buy Now: {link}
-        
-        (This is an automated message from your Market Scraper Bot)
-        """
-        msg.set_content(body)
-
-        # 3. Connect to Gmail and Send
-        # Port 465 is the standard secure port for SMTP SSL
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-            smtp.login(sender, password)
-            smtp.send_message(msg)
-            
+        msg = build_alert_message(product_name, current_price, link, sender, receiver)
+
+        # 3. Connect to the SMTP server and Send
+        with open_smtp(sender, password) as smtp:
+            send_message(smtp, msg)
+
         print(f"✅ Alert sent to {receiver}!")
         return True
 
     except Exception as e:
         print(f"❌ Failed to send email: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,165 @@
+import os
+import pickle
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+
+from instrumentation import inc, stage as timed_stage
+
+# --- PIPELINE RUNNER ---
+# The daily job as a small DAG: each stage names the stages it needs,
+# independent stages run at the same time, and every finished stage's
+# output is pickled to .checkpoints/<run_id>/. If a run fails, running it
+# again with the same run_id (by default: today) skips what already finished.
+
+CHECKPOINT_DIR = os.getenv("PIPELINE_CHECKPOINT_DIR", ".checkpoints")
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+CHECKPOINT_KEEP_DAYS = int(os.getenv("PIPELINE_CHECKPOINT_KEEP_DAYS", "7"))
+
+
+class PipelineError(Exception):
+    def __init__(self, failed):
+        self.failed = failed  # {stage name: exception}
+        super().__init__("Stages failed: " + ", ".join(f"{name} ({e})" for name, e in failed.items()))
+
+
+class Stage:
+    """
+    One step of the pipeline. `func` receives the outputs of `deps` as
+    keyword arguments and returns this stage's output (must be picklable
+    when `checkpoint` is True). A failing call is retried `retries` times,
+    waiting backoff, 2*backoff, 4*backoff... seconds in between.
+    """
+
+    def __init__(self, name, func, deps=(), retries=0, backoff=1.0, checkpoint=True):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.retries = retries
+        self.backoff = backoff
+        self.checkpoint = checkpoint
+
+
+class Pipeline:
+    def __init__(self, stages, run_id=None, checkpoint_dir=CHECKPOINT_DIR, workers=PIPELINE_WORKERS):
+        self.stages = {s.name: s for s in stages}
+        for s in stages:
+            missing = [d for d in s.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{s.name}' depends on unknown stage(s): {', '.join(missing)}")
+        self.run_id = run_id or os.getenv("PIPELINE_RUN_ID") or date.today().isoformat()
+        self.run_dir = os.path.join(checkpoint_dir, self.run_id)
+        self.checkpoint_dir = checkpoint_dir
+        self.workers = workers
+        self.outputs = {}
+        self.status = {}
+
+    # --- CHECKPOINTS ---
+    def _checkpoint_path(self, name):
+        return os.path.join(self.run_dir, f"{name}.pkl")
+
+    def has_checkpoint(self, name):
+        """
+        True when `name` finished in an earlier attempt of this run and will be restored.
+        """
+        return self.stages[name].checkpoint and os.path.exists(self._checkpoint_path(name))
+
+    def _load_checkpoint(self, name):
+        path = self._checkpoint_path(name)
+        if not os.path.exists(path):
+            return False, None
+        with open(path, "rb") as f:
+            return True, pickle.load(f)
+
+    def _save_checkpoint(self, name, output):
+        os.makedirs(self.run_dir, exist_ok=True)
+        path = self._checkpoint_path(name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _prune_old_runs(self):
+        if not os.path.isdir(self.checkpoint_dir):
+            return
+        cutoff = datetime.now() - timedelta(days=CHECKPOINT_KEEP_DAYS)
+        for entry in os.scandir(self.checkpoint_dir):
+            if entry.is_dir() and datetime.fromtimestamp(entry.stat().st_mtime) < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    # --- EXECUTION ---
+    def _run_stage(self, s, inputs):
+        attempt = 0
+        while True:
+            try:
+                with timed_stage(s.name):
+                    return s.func(**inputs)
+            except Exception as e:
+                if attempt >= s.retries:
+                    raise
+                wait_seconds = s.backoff * (2 ** attempt)
+                attempt += 1
+                inc("pipeline_retries_total", stage=s.name)
+                print(f"🔁 Stage '{s.name}' failed ({e}); retry {attempt}/{s.retries} in {wait_seconds:.1f}s")
+                time.sleep(wait_seconds)
+
+    def run(self):
+        """
+        Runs every stage whose dependencies succeeded. Stages downstream of a
+        failure are skipped. Returns the outputs; raises PipelineError (after
+        the independent stages have finished) if anything failed.
+        """
+        self._prune_old_runs()
+        failed = {}
+        pending = dict(self.stages)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stage") as pool:
+            running = {}
+            while pending or running:
+                progressed = False
+                for name, s in list(pending.items()):
+                    if any(d in failed or self.status.get(d) == "skipped" for d in s.deps):
+                        self.status[name] = "skipped"
+                        del pending[name]
+                        progressed = True
+                        print(f"⏭️ Stage '{name}' skipped (a dependency failed)")
+                    elif all(self.status.get(d) in ("done", "resumed") for d in s.deps):
+                        del pending[name]
+                        progressed = True
+                        found, output = self._load_checkpoint(name) if s.checkpoint else (False, None)
+                        if found:
+                            self.outputs[name] = output
+                            self.status[name] = "resumed"
+                            print(f"♻️ Stage '{name}' restored from checkpoint ({self.run_id})")
+                            continue
+                        inputs = {d: self.outputs[d] for d in s.deps}
+                        running[pool.submit(self._run_stage, s, inputs)] = name
+
+                if not running:
+                    if not progressed:
+                        raise ValueError(f"Dependency cycle between stages: {', '.join(pending)}")
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    s = self.stages[name]
+                    try:
+                        output = future.result()
+                    except Exception as e:
+                        failed[name] = e
+                        self.status[name] = "failed"
+                        print(f"❌ Stage '{name}' failed: {e}")
+                        continue
+                    self.outputs[name] = output
+                    self.status[name] = "done"
+                    if s.checkpoint:
+                        self._save_checkpoint(name, output)
+
+        if failed:
+            print(f"💾 Finished stages are checkpointed in {self.run_dir}; re-run to resume.")
+            raise PipelineError(failed)
+
+        # Clean run: nothing to resume, so a same-day re-run starts fresh
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+        return self.outputs
@@ -0,0 +1,132 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from db import is_sqlite, placeholder
+from etl_pipeline import normalize_title
+
+# --- PRICE-DROP DETECTION ---
+# The old watchdog alerted on every book under £33, every day. This stage
+# compares today's scrape with each product's recent history (one bulk
+# query for the whole source) and only flags real drops:
+#   drop_vs_last  price fell at least DROP_PCT_LAST % since the last observation
+#   below_median  price is at least DROP_PCT_MEDIAN % under the window median
+#   new_low       price is under the lowest price seen in the window
+# Products with fewer than MIN_HISTORY observations are never flagged.
+
+DROP_WINDOW_DAYS = int(os.getenv("DROP_WINDOW_DAYS", "30"))
+DROP_PCT_LAST = float(os.getenv("DROP_PCT_LAST", "10"))
+DROP_PCT_MEDIAN = float(os.getenv("DROP_PCT_MEDIAN", "20"))
+DROP_NEW_LOW = os.getenv("DROP_NEW_LOW", "1") == "1"
+MIN_HISTORY = int(os.getenv("DROP_MIN_HISTORY", "1"))
+DEAL_MAX_PRICE = float(os.getenv("DEAL_MAX_PRICE", "inf"))  # Optional ceiling on top of the rules
+
+HISTORY_COLUMNS = ["key", "price", "run_date"]
+
+
+class DropRules:
+    """
+    Thresholds for detect_drops. Defaults come from the DROP_* env vars.
+    """
+
+    def __init__(self, pct_last=DROP_PCT_LAST, pct_median=DROP_PCT_MEDIAN, new_low=DROP_NEW_LOW,
+                 min_history=MIN_HISTORY, max_price=DEAL_MAX_PRICE, window_days=DROP_WINDOW_DAYS):
+        self.pct_last = pct_last
+        self.pct_median = pct_median
+        self.new_low = new_low
+        self.min_history = min_history
+        self.max_price = max_price
+        self.window_days = window_days
+
+
+def load_history(conn, source, run_date=None, window_days=DROP_WINDOW_DAYS):
+    """
+    Every observation of `source` in the `window_days` before `run_date`
+    (today's rows excluded), in one query. Titles are reduced to the
+    normalized key so spelling changes don't break a product's history.
+    """
+    run_date = run_date or datetime.date.today()
+    since = run_date - datetime.timedelta(days=window_days)
+    title_col = "product_name" if is_sqlite(conn) else "title"
+    p = placeholder(conn)
+
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""SELECT {title_col}, price, run_date FROM book_prices
+            WHERE source = {p} AND run_date >= {p} AND run_date < {p} AND price IS NOT NULL""",
+        (source, since.isoformat(), run_date.isoformat()),
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+
+    history = pd.DataFrame(rows, columns=["title", "price", "run_date"])
+    history["key"] = history["title"].map(normalize_title)
+    history["price"] = history["price"].astype(float)
+    history["run_date"] = pd.to_datetime(history["run_date"])
+    return history[HISTORY_COLUMNS]
+
+
+def summarize_history(history):
+    """
+    Per product: last price, window min, window median and observation count.
+    """
+    if history.empty:
+        return pd.DataFrame(columns=["last_price", "window_min", "window_median", "observations"])
+    grouped = history.sort_values("run_date").groupby("key")["price"]
+    return pd.DataFrame({
+        "last_price": grouped.last(),
+        "window_min": grouped.min(),
+        "window_median": grouped.median(),
+        "observations": grouped.size(),
+    })
+
+
+def detect_drops(rows, history, rules=None):
+    """
+    Scores today's (title, price, link) rows against `history` in one
+    vectorized pass. Returns every row with its drop metrics plus `is_deal`
+    and `reason` (the first rule that fired, or "" if none).
+    """
+    rules = rules or DropRules()
+    current = pd.DataFrame(rows, columns=["title", "price", "link"])
+    current["price"] = current["price"].astype(float)
+    current["key"] = current["title"].map(normalize_title)
+    df = current.join(summarize_history(history), on="key")
+
+    price = df["price"].to_numpy()
+    last = df["last_price"].to_numpy(dtype=float)
+    low = df["window_min"].to_numpy(dtype=float)
+    median = df["window_median"].to_numpy(dtype=float)
+    enough = df["observations"].fillna(0).to_numpy() >= rules.min_history
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drop_last = np.round((last - price) / last * 100, 1)
+        drop_median = np.round((median - price) / median * 100, 1)
+
+    fired_last = enough & (drop_last >= rules.pct_last)
+    fired_median = enough & (drop_median >= rules.pct_median)
+    fired_low = enough & rules.new_low & (price < low)
+
+    reason = np.select(
+        [fired_last, fired_median, fired_low],
+        ["drop_vs_last", "below_median", "new_low"],
+        default="",
+    )
+    is_deal = (reason != "") & (price <= rules.max_price)
+
+    return df.assign(drop_pct_last=drop_last, drop_pct_median=drop_median,
+                     reason=np.where(is_deal, reason, ""), is_deal=is_deal)
+
+
+def find_deals(conn, rows, source, run_date=None, rules=None):
+    """
+    Bulk-loads the source's history and returns only the rows that are real drops.
+    """
+    rules = rules or DropRules()
+    if not rows:
+        return detect_drops([], pd.DataFrame(columns=HISTORY_COLUMNS), rules)
+    history = load_history(conn, source, run_date, rules.window_days)
+    scored = detect_drops(rows, history, rules)
+    return scored[scored["is_deal"]]
@@ -0,0 +1,247 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from db import is_sqlite, table_columns
+from etl_pipeline import normalize_title
+from migrate_schema import NORMALIZED_TITLE_SQL, is_normalized
+
+# --- PRICE HISTORY (ONE PRODUCT) ---
+# A product's price per source over time, for GET /prices/{product}/history
+# and the dashboard chart. Products are matched by normalized title, and the
+# (product, day) index answers the query without scanning the whole history:
+#   legacy table      book_prices_title_day on (normalized title, run_date)
+#   normalized schema products_normalized_title, then price_observations' (product_id, run_date) key
+#   SQLite            book_prices_title_day on (lower-cased trimmed title, run_date); SQLite has no
+#                     regexp to collapse inner whitespace, so the index narrows the rows down to
+#                     the title's first word and matching_rows() applies normalize_title()
+# Long ranges are reduced on the server so a response never holds more than
+# `max_points` points per source, however many years are stored:
+#   raw    one point per observation (run_date, price)
+#   week / month   OHLC buckets: open, high, low, close, mean, count
+#   lttb   Largest-Triangle-Three-Buckets: keeps the points that shape the line
+
+MAX_HISTORY_POINTS = int(os.getenv("MAX_HISTORY_POINTS", "500"))  # Default points per source
+HISTORY_POINTS_LIMIT = 5000  # Upper bound a caller may ask for
+
+# pandas offsets; weeks start on Monday, every bucket is labelled by its first day
+BUCKETS = {"day": "D", "week": "W-MON", "month": "MS"}
+AUTO_BUCKETS = ("week", "month")  # Tried in order once raw points no longer fit
+
+# SQLite's share of normalize_title(): trim every whitespace character, lower-case (ASCII only)
+SQLITE_TITLE_SQL = "LOWER(TRIM({col}, char(32, 9, 10, 11, 12, 13)))"
+
+
+def history_layout(conn):
+    """
+    Which query fits this DB-API connection: 'normalized', 'legacy' or 'sqlite'
+    (a SQLite stand-in with the Postgres columns, as in load_test_api.py).
+    """
+    if is_sqlite(conn):
+        return "sqlite"
+    return "normalized" if is_normalized(conn) else "legacy"
+
+
+def history_query(layout, product, source=None, since=None, until=None):
+    """
+    Returns (sql, params) for SQLAlchemy text(): (source, run_date, price)
+    rows of one product, ordered by source and day. since/until are
+    inclusive run_date bounds.
+    """
+    key = normalize_title(product)
+    params = {"key": key}
+    if layout == "normalized":
+        sql = """
+            SELECT p.source, o.run_date, o.price
+            FROM products p JOIN price_observations o ON o.product_id = p.product_id
+            WHERE p.normalized_title = :key"""
+        prefix = "p."
+        day = "o.run_date"
+    elif layout == "legacy":
+        sql = f"""
+            SELECT source, run_date, price FROM book_prices
+            WHERE {NORMALIZED_TITLE_SQL.format(col="title")} = :key AND run_date IS NOT NULL"""
+        prefix = ""
+        day = "run_date"
+    else:
+        # Candidates whose title starts with the key's first word (the part of it
+        # SQLite can lower-case); matching_rows() keeps the exact matches
+        params = {}
+        sql = """
+            SELECT source, run_date, price, title FROM book_prices
+            WHERE run_date IS NOT NULL"""
+        first = re.match(r"[\x00-\x7f]*", key.split(" ")[0]).group()
+        if first:
+            title = SQLITE_TITLE_SQL.format(col="title")
+            sql += f" AND {title} >= :lo AND {title} < :hi"
+            params.update(lo=first, hi=first[:-1] + chr(ord(first[-1]) + 1))
+        prefix = ""
+        day = "run_date"
+
+    if source is not None:
+        sql += f" AND {prefix}source = :source"
+        params["source"] = source
+    if since is not None:
+        sql += f" AND {day} >= :since"
+        params["since"] = since
+    if until is not None:
+        sql += f" AND {day} <= :until"
+        params["until"] = until
+    return sql + f" ORDER BY {prefix}source, {day}", params
+
+
+def matching_rows(layout, product, rows):
+    """
+    The (source, run_date, price) rows history_query() returned for
+    `product`. On SQLite that query returns candidates with their title,
+    which are matched here with normalize_title() like everywhere else.
+    """
+    if layout != "sqlite":
+        return rows
+    key = normalize_title(product)
+    return [tuple(row[:3]) for row in rows if normalize_title(row[3]) == key]
+
+
+def ensure_history_index(conn):
+    """
+    The (product, day) index history_query() relies on. The loader creates
+    it with the rest of the schema; safe to run twice.
+    """
+    layout = history_layout(conn)
+    if layout == "sqlite" and "title" not in table_columns(conn, "book_prices"):
+        return  # store_to_db.py's product_name table: history is served from the Postgres layout
+    cursor = conn.cursor()
+    if layout == "sqlite":
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS book_prices_title_day
+            ON book_prices ({SQLITE_TITLE_SQL.format(col="title")}, run_date)
+        """)
+    elif layout == "normalized":
+        # price_observations is already keyed by (product_id, run_date); this finds the product ids
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS products_normalized_title
+            ON products (normalized_title)
+        """)
+    else:
+        norm = NORMALIZED_TITLE_SQL.format(col="title")
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS book_prices_title_day
+            ON book_prices (({norm}), run_date)
+        """)
+    conn.commit()
+    cursor.close()
+
+
+def lttb(x, y, n_out):
+    """
+    Indices of the `n_out` points of (x, y) that Largest-Triangle-Three-Buckets
+    keeps. The first and last points always stay.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:n_out]
+
+    # Points 1..n-2 split into n_out-2 buckets; one point is picked from each
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        # Twice the area of the triangle (previous pick, candidate, next bucket's average)
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def _raw_points(frame):
+    return [{"t": t.date().isoformat(), "price": p} for t, p in zip(frame["t"], frame["price"].tolist())]
+
+
+def _ohlc_points(frame, bucket):
+    grouped = frame.set_index("t")["price"].resample(BUCKETS[bucket], label="left", closed="left")
+    ohlc = grouped.ohlc()
+    ohlc["mean"] = grouped.mean().round(2)
+    ohlc["count"] = grouped.count()
+    ohlc = ohlc[ohlc["count"] > 0]  # Weeks/months without observations are left out, not zero-filled
+    return [
+        {"t": t.date().isoformat(), "open": o, "high": h, "low": l, "close": c, "mean": m, "count": int(n)}
+        for t, o, h, l, c, m, n in zip(ohlc.index, *(ohlc[col].tolist() for col in ohlc.columns))
+    ]
+
+
+def _lttb_points(frame, max_points):
+    days = frame["t"].to_numpy(dtype="datetime64[D]").astype(np.float64)
+    keep = lttb(days, frame["price"].to_numpy(dtype=np.float64), max_points)
+    return _raw_points(frame.iloc[keep])
+
+
+def _bucket_count(frame, bucket):
+    first, last = frame["t"].iloc[0], frame["t"].iloc[-1]
+    return len(pd.date_range(first, last, freq=BUCKETS[bucket])) + 1
+
+
+def choose_resolution(frames, bucket="auto", max_points=MAX_HISTORY_POINTS):
+    """
+    The resolution actually served. 'auto' keeps raw points while they
+    fit, else takes the finest OHLC bucket that fits every source, else
+    LTTB. An explicit bucket that would exceed `max_points` is coarsened
+    the same way, and 'raw' becomes 'lttb', so payloads stay bounded.
+    """
+    if bucket in ("auto", "raw") and all(len(frame) <= max_points for frame in frames):
+        return "raw"
+    if bucket == "raw":
+        return "lttb"
+    if bucket == "lttb":
+        return bucket
+    order = list(BUCKETS)
+    candidates = AUTO_BUCKETS if bucket == "auto" else order[order.index(bucket):]
+    for candidate in candidates:
+        if all(_bucket_count(frame, candidate) <= max_points for frame in frames):
+            return candidate
+    return "lttb" if bucket == "auto" else candidates[-1]
+
+
+def downsample(rows, bucket="auto", max_points=MAX_HISTORY_POINTS):
+    """
+    (source, run_date, price) rows -> (resolution, {source: [points]}).
+    `bucket` is 'auto', 'raw', 'lttb' or one of BUCKETS.
+    """
+    df = pd.DataFrame(rows, columns=["source", "t", "price"])
+    df = df[df["price"].notna()].copy()
+    df["t"] = pd.to_datetime(df["t"])
+    df["price"] = df["price"].astype(float)
+    df["source"] = df["source"].fillna("Unknown")
+    df = df[df["t"].notna()]  # Legacy rows without a run_date have no place on the time axis
+    if df.empty:
+        return "raw" if bucket == "auto" else bucket, {}
+    frames = {source: frame.sort_values("t") for source, frame in df.groupby("source", sort=True)}
+
+    resolution = choose_resolution(list(frames.values()), bucket, max_points)
+    series = {}
+    for source, frame in frames.items():
+        if resolution in BUCKETS:
+            series[source] = _ohlc_points(frame, resolution)
+        elif resolution == "raw":
+            series[source] = _raw_points(frame)
+        else:
+            series[source] = _lttb_points(frame, max_points)
+    return resolution, series
+
+
+def history_payload(product, rows, bucket="auto", max_points=MAX_HISTORY_POINTS):
+    resolution, series = downsample(rows, bucket, max_points)
+    return {
+        "product": normalize_title(product),
+        "resolution": resolution,
+        "observations": len(rows),
+        "points": sum(len(points) for points in series.values()),
+        "series": series,
+    }
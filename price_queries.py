@@ -0,0 +1,118 @@
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # Optional: plain json is used when orjson isn't installed
+    orjson = None
+
+# --- /prices QUERY BUILDER ---
+# Filters are pushed into parameterized SQL and pages are fetched with keyset
+# pagination on (created_at, id), so the database never has to scan past
+# the rows we actually return.
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+PRICE_COLUMNS = ("id", "title", "price", "link", "source", "run_date", "created_at")
+
+
+def encode_cursor(created_at, row_id):
+    """
+    Opaque cursor for "continue after this row".
+    """
+    if not isinstance(created_at, str):  # SQLite hands timestamps back as text
+        created_at = created_at.isoformat()
+    raw = f"{created_at}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_prices_query(min_price=None, max_price=None, source=None, title_prefix=None,
+                       since=None, until=None, cursor=None, limit=None):
+    """
+    Returns (sql, params) for SQLAlchemy text(). Works on Postgres and SQLite.
+    """
+    clauses = []
+    params = {}
+
+    if min_price is not None:
+        clauses.append("price >= :min_price")
+        params["min_price"] = min_price
+    if max_price is not None:
+        clauses.append("price <= :max_price")
+        params["max_price"] = max_price
+    if source is not None:
+        clauses.append("source = :source")
+        params["source"] = source
+    if title_prefix:
+        # Case-insensitive prefix match (LOWER + LIKE works everywhere, ILIKE doesn't)
+        clauses.append("LOWER(title) LIKE :title_prefix ESCAPE '\\'")
+        params["title_prefix"] = _escape_like(title_prefix.lower()) + "%"
+    if since is not None:
+        clauses.append("created_at >= :since")
+        params["since"] = since
+    if until is not None:
+        clauses.append("created_at < :until")
+        params["until"] = until
+    if cursor is not None:
+        after_ts, after_id = decode_cursor(cursor)
+        clauses.append("(created_at > :after_ts OR (created_at = :after_ts AND id > :after_id))")
+        params["after_ts"] = after_ts
+        params["after_id"] = after_id
+
+    sql = f"SELECT {', '.join(PRICE_COLUMNS)} FROM book_prices"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY created_at, id"
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+    return sql, params
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """
+    Serializes to JSON bytes. orjson writes dates/datetimes natively and
+    only calls back into Python for Decimals (the sync psycopg2 path).
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default)
+    return json.dumps(payload, default=_json_default).encode("utf-8")
+
+
+def rows_to_dicts(keys, rows):
+    """
+    Plain dicts straight from cursor tuples; values are left for dumps() to encode.
+    """
+    keys = tuple(keys)
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def ndjson_lines(keys, rows):
+    """
+    One block of NDJSON (a line per row), so a streamed response sends a
+    batch of rows per chunk instead of one tiny chunk per row.
+    """
+    return b"".join(dumps(record) + b"\n" for record in rows_to_dicts(keys, rows))
@@ -0,0 +1,45 @@
+import numpy as np
+
+# --- MARGIN RULES ---
+# Formula: Margin % = ((Price - Cost) / Price) * 100, rounded to 1 decimal.
+#   margin < 0             -> CRITICAL LOSS
+#   margin < target margin -> LOW MARGIN
+#   otherwise              -> GREEN LIGHT
+
+CRITICAL = "🛑 CRITICAL LOSS (Do Not Match)"
+LOW_MARGIN = "⚠️ LOW MARGIN (Proceed with Caution)"
+GREEN_LIGHT = "✅ GREEN LIGHT (Safe to Price Match)"
+
+RECOMMENDATION_COLORS = {
+    GREEN_LIGHT: "green",
+    LOW_MARGIN: "orange",
+    CRITICAL: "red",
+}
+
+
+def margin_pct(prices, my_cost):
+    """
+    Margin % for every price at once (NumPy array in, NumPy array out).
+    """
+    prices = np.asarray(prices, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.round((prices - my_cost) / prices * 100, 1)
+
+
+def recommend(margins, target_margin):
+    """
+    Maps margin % values to recommendation labels in one vectorized pass.
+    NaN margins (unknown price) fall through to GREEN LIGHT, like the old
+    row-by-row rule did.
+    """
+    margins = np.asarray(margins, dtype=float)
+    with np.errstate(invalid="ignore"):
+        return np.select([margins < 0, margins < target_margin], [CRITICAL, LOW_MARGIN], default=GREEN_LIGHT)
+
+
+def apply_recommendations(df, my_cost, target_margin):
+    """
+    Returns a copy of `df` with `margin_pct` and `recommendation` columns.
+    """
+    margins = margin_pct(df["price"], my_cost)
+    return df.assign(margin_pct=margins, recommendation=recommend(margins, target_margin))
@@ -1,18 +1,28 @@
-import psycopg2
-import os
-import config # Import your local config file
+from db import connect_raw
+from migrate_schema import is_normalized
+from summaries import SUMMARY_TABLES
 
 def reset_database():
     print("🗑️ connecting to database to wipe old table...")
     
-    # Connect using the URL in your config.py
-    conn = psycopg2.connect(config.DB_URL)
+    # Connect using DB_URL from the environment or your config.py
+    conn = connect_raw()
     cursor = conn.cursor()
     
     try:
         # 1. DROP the existing table (Delete it completely)
-        cursor.execute("DROP TABLE IF EXISTS book_prices;")
+        if is_normalized(conn):
+            # Normalized schema: book_prices is a view over the product/observation tables
+            cursor.execute("DROP VIEW IF EXISTS book_prices;")
+            cursor.execute("DROP TABLE IF EXISTS price_observations, products, book_prices_legacy CASCADE;")
+        else:
+            cursor.execute("DROP TABLE IF EXISTS book_prices;")
         print("✅ Old table 'book_prices' deleted.")
+
+        # The aggregates and batch log describe the rows we just dropped: without this
+        # /stats would keep serving them and the next load would skip the summary rebuild
+        cursor.execute(f"DROP TABLE IF EXISTS {', '.join(SUMMARY_TABLES)}, ingestion_batches;")
+        print("✅ Summary tables and ingestion batches deleted.")
         
         # 2. COMMIT the change
         conn.commit()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- API RESPONSE CACHE ---
+# The data only changes when the daily job loads a new batch. Responses are
+# cached in memory per (endpoint, query params) and tagged with the latest
+# ingestion batch id; a new batch makes every older entry stale.
+
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+VERSION_CHECK_SECONDS = float(os.getenv("RESPONSE_CACHE_VERSION_TTL", "30"))  # How often we ask the DB for the batch id
+CACHE_CONTROL = os.getenv("RESPONSE_CACHE_CONTROL", "public, max-age=300, must-revalidate")
+
+CURRENT_VERSION_SQL = "SELECT MAX(batch_id) FROM ingestion_batches"
+
+
+class CachedResponse:
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        self.etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache bounded by entry count and total body size.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body):
+        entry = CachedResponse(version, body)
+        if len(body) > self.max_bytes:
+            return entry  # Too big to keep, but still usable for this response
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._entries[key] = entry
+            self._bytes += len(body)
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+class VersionTracker:
+    """
+    Remembers the current ingestion batch id for a few seconds, so a busy API
+    asks the database at most once per VERSION_CHECK_SECONDS.
+    """
+
+    def __init__(self, fetch_version, ttl=VERSION_CHECK_SECONDS):
+        self.fetch_version = fetch_version
+        self.ttl = ttl
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _cached(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.ttl:
+                return True, self._version
+        return False, None
+
+    def _store(self, version):
+        with self._lock:
+            self._version = version
+            self._checked_at = time.monotonic()
+        return version
+
+    def current(self):
+        fresh, version = self._cached()
+        if fresh:
+            return version
+        try:
+            version = self.fetch_version()
+        except Exception:
+            version = None  # Unknown version: callers skip the cache
+        return self._store(version)
+
+    async def current_async(self):
+        """
+        current() for a coroutine `fetch_version` (the async API read path).
+        """
+        fresh, version = self._cached()
+        if fresh:
+            return version
+        try:
+            version = await self.fetch_version()
+        except Exception:
+            version = None
+        return self._store(version)
+
+
+def make_key(endpoint, params):
+    return (endpoint, tuple(sorted((k, str(v)) for k, v in params.items() if v is not None)))
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True if the client's If-None-Match header names this ETag (weak or strong).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
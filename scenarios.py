@@ -0,0 +1,145 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from etl_pipeline import normalize_title
+from pricing import CRITICAL, GREEN_LIGHT, LOW_MARGIN
+
+# --- WHAT-IF PRICING SCENARIOS ---
+# Runs the margin rules from pricing.py for many (cost, target margin)
+# scenarios at once: prices (products,) broadcast against costs and
+# targets (scenarios,) into products x scenarios matrices, so a sweep is a
+# handful of array operations instead of one pass per scenario.
+# Costs are either one flat unit cost per scenario (`my_cost`) or a
+# per-product cost table scaled by each scenario's `cost_factor`.
+# Recommendations are stored as small integer codes (see LABELS); each
+# scenario is summarised as CRITICAL / LOW / GREEN counts plus how many
+# products flipped recommendation compared with the baseline scenario.
+
+SCENARIO_CHUNK_ROWS = int(os.getenv("SCENARIO_CHUNK_ROWS", "1024"))  # Products per block: temporaries stay in cache
+MAX_SCENARIOS = 2000  # Grid size accepted by POST /scenarios
+
+CRITICAL_CODE, LOW_CODE, GREEN_CODE = 0, 1, 2
+LABELS = np.array([CRITICAL, LOW_MARGIN, GREEN_LIGHT])
+
+
+def scenario_grid(target_margins, costs=None, cost_factors=None):
+    """
+    Every combination of cost and target margin as a DataFrame, cost-major.
+    Pass `costs` (flat unit costs) or `cost_factors` (multipliers for a
+    per-product cost table).
+    """
+    if (costs is None) == (cost_factors is None):
+        raise ValueError("Pass either costs or cost_factors")
+    column, values = ("my_cost", costs) if costs is not None else ("cost_factor", cost_factors)
+    values, targets = np.meshgrid(np.asarray(values, dtype=float), np.asarray(target_margins, dtype=float),
+                                  indexing="ij")
+    return pd.DataFrame({column: values.ravel(), "target_margin": targets.ravel()})
+
+
+def cost_column(titles, cost_table):
+    """
+    Per-product costs from a {title: unit cost} table, matched by
+    normalized title. NaN where a product isn't in the table.
+    """
+    table = {normalize_title(title): float(cost) for title, cost in cost_table.items()}
+    return np.array([table.get(normalize_title(title), np.nan) for title in titles], dtype=float)
+
+
+def recommendation_codes(margins, target_margins, out=None):
+    """
+    Vectorized pricing.recommend, as codes: margins (n, s) against targets (s,).
+    NaN margins (unknown price) are GREEN, like recommend().
+    """
+    # 2 - (m < 0) - (m < target) is CRITICAL/LOW/GREEN as long as the target
+    # isn't negative; below 0 every product under target is CRITICAL anyway
+    targets = np.maximum(target_margins, 0)
+    with np.errstate(invalid="ignore"):
+        codes = np.subtract(np.int8(GREEN_CODE), (margins < 0).view(np.int8), out=out)
+        codes -= (margins < targets).view(np.int8)
+    return codes
+
+
+class ScenarioResult:
+    """
+    Output of evaluate(): `codes` is the products x scenarios recommendation
+    matrix (int8, see LABELS), `margins` the matching margin % matrix
+    (float32, only when asked for), `summary` one row per scenario.
+    """
+
+    def __init__(self, scenarios, codes, margins, summary):
+        self.scenarios = scenarios
+        self.codes = codes
+        self.margins = margins
+        self.summary = summary
+
+    def labels(self, scenario):
+        """Recommendation labels of every product under one scenario."""
+        return LABELS[self.codes[:, scenario]]
+
+
+def evaluate(prices, scenarios, product_costs=None, baseline=0, keep_margins=False,
+             chunk_rows=SCENARIO_CHUNK_ROWS):
+    """
+    Margin % and recommendation for every product under every scenario.
+
+    `scenarios` has a `target_margin` column plus `my_cost`, or
+    `cost_factor` when `product_costs` (one cost per product) is given; in
+    that mode `my_cost`, if present, only covers products whose entry is
+    NaN. Products are processed in blocks of `chunk_rows` so the float
+    temporaries stay small however many products come in; only the int8
+    code matrix is kept for the whole table.
+    The summary has critical / low / green counts per scenario and
+    `flipped`: products whose recommendation differs from scenario
+    `baseline`.
+    """
+    prices = np.asarray(prices, dtype=float)
+    targets = scenarios["target_margin"].to_numpy(dtype=float)
+    n, s = len(prices), len(scenarios)
+
+    if product_costs is not None:
+        if "cost_factor" not in scenarios:
+            # A my_cost grid would be silently reduced to the fallback for unlisted products
+            raise ValueError("product_costs needs cost_factor scenarios (scenario_grid(..., cost_factors=...)); "
+                             "my_cost is only the fallback for products missing from the table")
+        product_costs = np.asarray(product_costs, dtype=float)
+        factors = scenarios["cost_factor"].to_numpy(dtype=float)
+        fallback = scenarios["my_cost"].to_numpy(dtype=float) if "my_cost" in scenarios else None
+        if fallback is None and np.isnan(product_costs).any():
+            raise ValueError("product_costs has gaps and the scenarios have no my_cost to fall back on")
+    else:
+        flat_costs = scenarios["my_cost"].to_numpy(dtype=float)
+
+    codes = np.empty((n, s), dtype=np.int8)
+    margins = np.empty((n, s), dtype=np.float32) if keep_margins else None
+    critical, low, flipped = (np.zeros(s, dtype=np.int64) for _ in range(3))
+    for start in range(0, n, chunk_rows):
+        block = slice(start, start + chunk_rows)
+        p = prices[block, None]
+        if product_costs is None:
+            cost = flat_costs[None, :]
+        else:
+            cost = product_costs[block, None] * factors[None, :]
+            if fallback is not None:
+                cost = np.where(np.isnan(cost), fallback[None, :], cost)
+        # pricing.margin_pct's formula and rounding (so thresholds agree with the
+        # dashboard table), computed in place in one buffer per block
+        with np.errstate(divide="ignore", invalid="ignore"):
+            m = np.subtract(p, cost)
+            m /= p
+            m *= 100
+            np.round(m, 1, out=m)
+        block_codes = recommendation_codes(m, targets, out=codes[block])
+        if keep_margins:
+            margins[block] = m
+        # Counted while the block is still in cache
+        critical += np.count_nonzero(block_codes == CRITICAL_CODE, axis=0)
+        low += np.count_nonzero(block_codes == LOW_CODE, axis=0)
+        if s:
+            flipped += np.count_nonzero(block_codes != block_codes[:, [baseline]], axis=0)
+
+    summary = scenarios.reset_index(drop=True).assign(critical=critical, low=low, green=n - critical - low,
+                                                      flipped=flipped)
+    return ScenarioResult(scenarios, codes, margins, summary)
+
@@ -1,65 +1,62 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import datetime
+import time
+from crawler import HEADERS
+from http_cache import HttpCache
+from sources import BOOKS_TO_SCRAPE
 
-# 1. Define the URL we want to scrape
-url = "http://books.toscrape.com/"
+# 1. Define the URL we want to scrape (the site's plugin in sources.py knows its selectors)
+url = BOOKS_TO_SCRAPE.start_urls[0]
 
 # 2. Pretend to be a browser (User-Agent) so we don't look like a bot
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
+headers = HEADERS
 
 print("Step 1: Requesting data from website...")
-response = requests.get(url, headers=headers)
+# The cache sends If-None-Match / If-Modified-Since, so an unchanged page costs a 304
+cache = HttpCache()
+response = cache.fetch(url, headers=headers)
 
-# Check if request was successful (Status Code 200)
-if response.status_code == 200:
+# Check if request was successful (Status Code 200, or 304 = Not Modified)
+if response.status_code in (200, 304):
     print("Success! Connection established.")
-    
-    # 3. Parse the HTML content
-    soup = BeautifulSoup(response.content, "html.parser")
-    
-    # 4. Find all product containers (This is specific to the website structure)
-    # On this site, every book is inside an <article> tag with class "product_pod"
-    books = soup.find_all("article", class_="product_pod")
-    
-    data = []
 
-    # 5. Loop through each book and extract details
-    for book in books:
-        # Extract Title (It's in an <h3> tag, inside an <a> tag)
-        title = book.h3.a["title"]
-        
-        # Extract Price (It's in a <p> tag with class "price_color")
-        price_text = book.find("p", class_="price_color").text
-        # Clean the price (Remove the £ symbol)
-        price = float(price_text.replace("£", ""))
-        
-        # Extract Availability
-        stock = book.find("p", class_="instock availability").text.strip()
-        
-        # Add a timestamp so we know when we scraped this
-        collected_at = datetime.datetime.now()
-        
-        # Append to our list
-        data.append({
-            "product_name": title,
-            "price": price,
-            "availability": stock,
-            "scraped_at": collected_at
-        })
+if response.status_code in (200, 304) and not response.changed:
+    print("Page has not changed since the last run - skipping parse and export.")
+
+elif response.status_code == 200:
+    parse_start = time.perf_counter()
 
-    # 6. Save to a DataFrame (Table format)
+    # 3. Parse the HTML content with the same source plugin the daily job uses
+    # (the parser backend - lxml or BeautifulSoup - comes from HTML_PARSER in env or config.py)
+    books = BOOKS_TO_SCRAPE.parse_products(response.content, url)
+
+    # 4. Add a timestamp so we know when we scraped this
+    collected_at = datetime.datetime.now()
+    data = [
+        {
+            "product_name": book["title"],
+            "price": book["price"],
+            "availability": book["availability"],
+            "scraped_at": collected_at,
+        }
+        for book in books
+    ]
+
+    # 5. Save to a DataFrame (Table format)
     df = pd.DataFrame(data)
+    cache.record_parse(url, time.perf_counter() - parse_start)
     
     print(f"\nStep 2: Scraped {len(df)} books successfully.")
     print(df.head()) # Show first 5 rows
     
-    # 7. Export to CSV (Temporary storage until we set up SQL)
+    # 6. Export to CSV (Temporary storage until we set up SQL)
     df.to_csv("competitor_data.csv", index=False)
     print("\nStep 3: Data saved to 'competitor_data.csv'")
 
+    # Remember this version of the page only once the CSV is written
+    cache.commit()
+
 else:
-    print(f"Failed to retrieve data. Status code: {response.status_code}")
\ No newline at end of file
+    print(f"Failed to retrieve data. Status code: {response.status_code}")
+
+cache.stats.report()
@@ -0,0 +1,176 @@
+import datetime
+import os
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from db import is_sqlite, placeholder, table_columns
+
+# --- PARQUET SNAPSHOT STORE ---
+# A local, columnar copy of book_prices for analytics and backfills:
+#   snapshots/book_prices/run_date=2026-10-18/BooksToScrape.parquet
+# One file per (day, source), rewritten whole when that day is re-exported.
+# Titles, links and sources are dictionary-encoded; readers only open the
+# day folders and columns they ask for, through memory-mapped files.
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+USE_SNAPSHOT = os.getenv("USE_SNAPSHOT", "0") == "1"  # Analytics scripts read the snapshot instead of the DB
+EXPORT_BATCH_ROWS = 50_000
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("title", pa.dictionary(pa.int32(), pa.string())),
+    ("price", pa.float64()),
+    ("link", pa.dictionary(pa.int32(), pa.string())),
+    ("availability", pa.dictionary(pa.int32(), pa.string())),
+    ("source", pa.dictionary(pa.int32(), pa.string())),
+    ("created_at", pa.timestamp("us")),
+])
+PARTITIONING = ds.partitioning(pa.schema([("run_date", pa.date32())]), flavor="hive")
+
+
+def _table_dir(snapshot_dir):
+    return os.path.join(snapshot_dir, "book_prices")
+
+
+def _select_sql(conn):
+    """
+    Same column names on both backends (the local SQLite file says product_name / scraped_at).
+    """
+    columns = table_columns(conn, "book_prices")
+    if is_sqlite(conn):
+        title, link, created = "product_name", "NULL", "scraped_at"
+    else:
+        title, link, created = "title", "link", "created_at"
+    availability = "availability" if "availability" in columns else "NULL"
+    p = placeholder(conn)
+    return f"""
+        SELECT id, {title}, price, {link}, {availability}, source, {created}
+        FROM book_prices
+        WHERE run_date = {p} AND source = {p}
+        ORDER BY id
+    """
+
+
+def _to_batch(rows):
+    ids, titles, prices, links, availability, sources, created = (list(col) for col in zip(*rows))
+    created = [datetime.datetime.fromisoformat(c) if isinstance(c, str) else c for c in created]
+    arrays = [
+        pa.array(ids, pa.int64()),
+        pa.array(titles, pa.string()).dictionary_encode(),
+        pa.array([None if p is None else float(p) for p in prices], pa.float64()),
+        pa.array(links, pa.string()).dictionary_encode(),
+        pa.array(availability, pa.string()).dictionary_encode(),
+        pa.array(sources, pa.string()).dictionary_encode(),
+        pa.array(created, pa.timestamp("us")),
+    ]
+    return pa.record_batch(arrays, schema=SCHEMA)
+
+
+def export_day(conn, run_date, sources=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Writes one day of observations (every source, or just `sources`) to
+    Parquet. Rows are streamed from the DB in batches, so memory stays flat.
+    Returns the number of rows written.
+    """
+    if not isinstance(run_date, str):
+        run_date = run_date.isoformat()
+    cursor = conn.cursor()
+    if sources is None:
+        p = placeholder(conn)
+        cursor.execute(f"SELECT DISTINCT source FROM book_prices WHERE run_date = {p} AND source IS NOT NULL",
+                       (run_date,))
+        sources = [row[0] for row in cursor.fetchall()]
+
+    day_dir = os.path.join(_table_dir(snapshot_dir), f"run_date={run_date}")
+    os.makedirs(day_dir, exist_ok=True)
+    sql = _select_sql(conn)
+    written = 0
+    for source in sources:
+        path = os.path.join(day_dir, f"{source}.parquet")
+        tmp_path = path + ".tmp"
+        cursor.execute(sql, (run_date, source))
+        with pq.ParquetWriter(tmp_path, SCHEMA, compression="zstd") as writer:
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+                if not rows:
+                    break
+                writer.write_batch(_to_batch(rows))
+                written += len(rows)
+        os.replace(tmp_path, path)  # Readers never see a half-written file
+    cursor.close()
+    return written
+
+
+def export_all(conn, since=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Backfill: exports every run_date in the table (or from `since` on).
+    """
+    cursor = conn.cursor()
+    if since is None:
+        cursor.execute("SELECT DISTINCT run_date FROM book_prices WHERE run_date IS NOT NULL ORDER BY run_date")
+    else:
+        p = placeholder(conn)
+        cursor.execute(f"SELECT DISTINCT run_date FROM book_prices WHERE run_date >= {p} ORDER BY run_date",
+                       (str(since),))
+    days = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+
+    total = 0
+    for day in days:
+        total += export_day(conn, day, snapshot_dir=snapshot_dir)
+    print(f"📦 Exported {total:,} rows across {len(days)} day(s) to {_table_dir(snapshot_dir)}")
+    return total
+
+
+def open_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """
+    The snapshot as a pyarrow Dataset (memory-mapped local files).
+    """
+    return ds.dataset(
+        _table_dir(snapshot_dir),
+        format="parquet",
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def read_snapshot(columns=None, since=None, until=None, sources=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Reads the snapshot into pandas, touching only what is needed:
+    `since`/`until` (inclusive dates) prune whole day folders, `sources`
+    skips files' row groups, and only `columns` are decoded.
+    """
+    dataset = open_snapshot(snapshot_dir)
+    condition = None
+    if since is not None:
+        condition = ds.field("run_date") >= pa.scalar(_as_date(since), pa.date32())
+    if until is not None:
+        upper = ds.field("run_date") <= pa.scalar(_as_date(until), pa.date32())
+        condition = upper if condition is None else condition & upper
+    if sources:
+        chosen = ds.field("source").isin(list(sources))
+        condition = chosen if condition is None else condition & chosen
+
+    table = dataset.to_table(columns=list(columns) if columns else None, filter=condition)
+    return table.to_pandas()
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value))
+
+
+if __name__ == "__main__":
+    from db import connect_raw
+
+    conn = connect_raw()
+    try:
+        export_all(conn)
+    finally:
+        conn.close()
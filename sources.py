@@ -0,0 +1,469 @@
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+from crawler import PAGER_PATTERN, REQUEST_TIMEOUT, build_session
+from extractors import get_extractor, parse_price
+from instrumentation import inc, observe
+
+# --- SOURCE PLUGINS + SCRAPE SCHEDULER ---
+# Every competitor is a Source: either an HTML site (start URLs, how to
+# paginate, where the fields are) or a CSV feed run through the ETL.
+# The Scheduler crawls all of them at once: one shared worker pool (the
+# global concurrency cap), a token bucket per domain (politeness), and the
+# sources that were refreshed longest ago go first. Every source comes out
+# as the same (title, price, link) rows, so they all share the loader.
+
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "16"))  # Requests in flight across all sources
+DOMAIN_RATE = float(os.getenv("SCRAPE_DOMAIN_RATE", "5"))         # Requests/second per domain
+DOMAIN_BURST = int(os.getenv("SCRAPE_DOMAIN_BURST", "5"))
+PER_DOMAIN_LIMIT = 4                                              # Max requests in flight per domain
+SOURCE_STATE_FILE = os.getenv("SOURCE_STATE_FILE", ".source_state.json")
+SOURCES_FILE = os.getenv("SOURCES_FILE")                          # Optional JSON list of extra HTML sources
+
+# Crawl mode: follow every catalogue/page-N.html instead of just the front page
+CRAWL_ALL_PAGES = os.getenv("CRAWL_ALL_PAGES", "0") == "1"
+CRAWL_DETAILS = os.getenv("CRAWL_DETAILS", "0") == "1"
+
+
+def _clean_availability(value):
+    # Missing, empty and whitespace-only availability all become None
+    if not value:
+        return None
+    return str(value).strip() or None
+
+
+class Source:
+    """
+    Base class for a competitor. `refresh_hours` > 0 lets a source sit out
+    runs until its data is that old; `watch` turns on price-drop alerts.
+    """
+    kind = None
+
+    def __init__(self, name, refresh_hours=0, watch=False):
+        self.name = name
+        self.refresh_hours = refresh_hours
+        self.watch = watch
+
+
+class HtmlSource(Source):
+    """
+    A site crawled page by page.
+
+    Pagination is either `page_url` (a template like "catalogue/page-{n}.html",
+    resolved against the start URL, with the page count read by `page_count`
+    from the first page) or `next_link` (an XPath to the "next" href,
+    followed one page at a time). `selectors` are XPath expressions:
+    "item" selects each product, and "title", "price", "href" and
+    (optionally) "availability" are evaluated relative to it. Without
+    selectors the standard .product_pod markup is read by the configured
+    extractor backend (see extractors.py).
+    """
+    kind = "html"
+
+    def __init__(self, name, start_urls, selectors=None, page_url=None, page_count=PAGER_PATTERN.pattern,
+                 next_link=None, max_pages=None, detail_selectors=None, follow_details=False,
+                 rate=DOMAIN_RATE, burst=DOMAIN_BURST, refresh_hours=0, watch=False):
+        super().__init__(name, refresh_hours=refresh_hours, watch=watch)
+        self.start_urls = list(start_urls)
+        self.selectors = selectors
+        self.page_url = page_url
+        self.page_count_pattern = re.compile(page_count) if page_count else None
+        self.next_link = next_link
+        self.max_pages = max_pages
+        self.detail_selectors = detail_selectors
+        self.follow_details = follow_details and bool(detail_selectors)
+        self.rate = rate
+        self.burst = burst
+        self._xpaths = {}
+        self._extractor = None
+
+    def _xpath(self, expr):
+        # Compiled once per expression; lxml XPath objects are reusable across threads
+        compiled = self._xpaths.get(expr)
+        if compiled is None:
+            from lxml import etree
+            compiled = self._xpaths[expr] = etree.XPath(expr)
+        return compiled
+
+    def _root(self, html):
+        from lxml import html as lxml_html
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        return lxml_html.document_fromstring(html)
+
+    def parse_products(self, html, page_url):
+        """
+        One dict per product on a listing page: title, price, link, availability.
+        """
+        if self.selectors is None:
+            if self._extractor is None:
+                self._extractor = get_extractor()
+            products = self._extractor.extract(html)
+        else:
+            fields = {f: self._xpath(expr) for f, expr in self.selectors.items() if f != "item"}
+            products = []
+            for item in self._xpath(self.selectors["item"])(self._root(html)):
+                values = {field: xpath(item) for field, xpath in fields.items()}
+                values["price_text"] = values.pop("price")
+                products.append(values)
+        return [
+            {
+                "title": str(p["title"]).strip(),
+                "price": parse_price(str(p["price_text"])),
+                "link": urljoin(page_url, str(p["href"])),
+                "availability": _clean_availability(p.get("availability")),
+            }
+            for p in products
+        ]
+
+    def parse_listing(self, html, page_url):
+        """
+        Returns (title, price, link) for every product on a listing page.
+        """
+        return [(p["title"], p["price"], p["link"]) for p in self.parse_products(html, page_url)]
+
+    def parse_detail(self, html, link):
+        """
+        Reads the authoritative title and price from a product page.
+        """
+        root = self._root(html)
+        title = self._xpath(self.detail_selectors["title"])(root)
+        price = self._xpath(self.detail_selectors["price"])(root)
+        return (str(title).strip(), parse_price(str(price)), link)
+
+    def next_pages(self, html, page_url, page_no):
+        """
+        (page number, URL) of the pages still to fetch after `page_url`.
+        """
+        if self.next_link:
+            if self.max_pages is not None and page_no >= self.max_pages:
+                return []
+            href = self._xpath(self.next_link)(self._root(html))
+            if isinstance(href, list):
+                href = href[0] if href else ""
+            return [(page_no + 1, urljoin(page_url, str(href)))] if href else []
+
+        if not self.page_url or page_no != 1:
+            return []
+        match = self.page_count_pattern.search(html) if self.page_count_pattern else None
+        total = int(match.group(1)) if match else 1
+        if self.max_pages is not None:
+            total = min(total, self.max_pages)
+        return [(n, urljoin(page_url, self.page_url.format(n=n))) for n in range(2, total + 1)]
+
+
+class FeedSource(Source):
+    """
+    A competitor that hands us a CSV export instead of a website.
+    """
+    kind = "feed"
+
+    def __init__(self, name, path, chunksize=0, refresh_hours=0, watch=False):
+        super().__init__(name, refresh_hours=refresh_hours, watch=watch)
+        self.path = path
+        self.chunksize = chunksize
+
+    def read(self):
+        from etl_pipeline import run_etl_process, run_etl_streaming
+
+        if self.chunksize:
+            df = run_etl_streaming(self.path, chunksize=self.chunksize)
+        else:
+            df = run_etl_process(self.path)
+        # Same (title, price, link) tuples as the HTML sources
+        return list(df[['clean_title', 'price', 'url']].itertuples(index=False, name=None))
+
+
+# --- REGISTERED SOURCES ---
+BOOKS_TO_SCRAPE = HtmlSource(
+    "BooksToScrape",
+    start_urls=["http://books.toscrape.com/"],
+    page_url="catalogue/page-{n}.html",
+    max_pages=None if CRAWL_ALL_PAGES else 1,
+    detail_selectors={
+        "title": "string(//div[contains(@class, 'product_main')]/h1)",
+        "price": "string(//div[contains(@class, 'product_main')]/p[contains(@class, 'price_color')])",
+    },
+    follow_details=CRAWL_DETAILS,
+    watch=True,
+)
+
+BOOK_WORLD = FeedSource("BookWorld", "competitor_prices_messy.csv",
+                        chunksize=int(os.getenv("ETL_CHUNKSIZE", "0")))
+
+
+def load_sources_file(path):
+    """
+    Extra HTML sources from a JSON list of HtmlSource keyword arguments, e.g.
+    [{"name": "ShopX", "start_urls": ["https://shopx.example/books"],
+      "next_link": "//a[@rel='next']/@href",
+      "selectors": {"item": "//li[@class='product']", "title": "string(.//h2)", ...}}]
+    """
+    with open(path, encoding="utf-8") as f:
+        return [HtmlSource(**spec) for spec in json.load(f)]
+
+
+def registered_sources():
+    sources = [BOOKS_TO_SCRAPE, BOOK_WORLD]
+    if SOURCES_FILE:
+        sources.extend(load_sources_file(SOURCES_FILE))
+    names = [s.name for s in sources]
+    duplicates = {n for n in names if names.count(n) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate source name(s): {', '.join(sorted(duplicates))}")
+    return sources
+
+
+# --- RATE LIMITING ---
+class TokenBucket:
+    """
+    `rate` tokens per second, at most `capacity` saved up. take() never
+    blocks: it returns 0 when a token was taken, else the seconds to wait.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class SourceResult:
+    def __init__(self, name):
+        self.name = name
+        self.pages = 0
+        self.unchanged_pages = 0
+        self.error = None
+        self.seconds = 0.0
+        self._rows = {}  # (start URL, page, position) -> row, so the output keeps catalogue order
+
+    @property
+    def rows(self):
+        return [row for _, row in sorted(self._rows.items()) if row is not None]
+
+
+# --- SCHEDULER ---
+class Scheduler:
+    """
+    Crawls many sources concurrently.
+
+    Every page fetch is a task in one priority queue. Workers (at most
+    `max_concurrency` of them) take the first task whose domain has a token
+    to spend and fewer than PER_DOMAIN_LIMIT requests in flight, so a
+    rate-limited domain never holds up the others. Tasks of staler sources
+    sort first.
+    """
+
+    def __init__(self, sources, max_concurrency=SCRAPE_CONCURRENCY, session=None, cache=None,
+                 state_file=SOURCE_STATE_FILE, timeout=REQUEST_TIMEOUT):
+        self.sources = list(sources)
+        self.max_concurrency = max_concurrency
+        self.session = session or build_session(pool_size=max_concurrency)
+        self.cache = cache  # Optional http_cache.HttpCache
+        self.state_file = state_file
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (priority, seq, task)
+        self._seq = itertools.count()
+        self._buckets = {}
+        self._in_flight = {}
+        self._active = 0
+
+    # --- STALENESS STATE ---
+    def load_state(self):
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def mark_refreshed(self, names):
+        """
+        Records a successful refresh (call it once the rows are stored).
+        """
+        state = self.load_state()
+        now = datetime.now().isoformat(timespec="seconds")
+        state.update({name: now for name in names})
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+    def _age_hours(self, state, source):
+        last = state.get(source.name)
+        if not last:
+            return float("inf")
+        return (datetime.now() - datetime.fromisoformat(last)).total_seconds() / 3600
+
+    def plan(self, force=False):
+        """
+        The sources due this run, stalest first.
+        """
+        state = self.load_state()
+        ages = {s.name: self._age_hours(state, s) for s in self.sources}
+        due = [s for s in self.sources if force or not s.refresh_hours or ages[s.name] >= s.refresh_hours]
+        return sorted(due, key=lambda s: -ages[s.name])
+
+    # --- TASK QUEUE ---
+    def _push(self, priority, task):
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._seq), task))
+            self._cond.notify()
+
+    def _domain(self, source, url):
+        if url is None:
+            return None  # Feeds make no requests
+        domain = urlparse(url).netloc
+        if domain not in self._buckets:
+            # The first source seen on a domain sets its rate
+            self._buckets[domain] = TokenBucket(source.rate, source.burst)
+            self._in_flight[domain] = 0
+        return domain
+
+    def _next_task(self):
+        """
+        Pops the best runnable task (the caller holds the lock). Returns
+        (entry, domain, wait); entry is None when nothing can run for `wait` seconds.
+        """
+        wait = None
+        skipped = []
+        found = None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            domain = self._domain(entry[2][1], entry[2][2])
+            if domain is None:
+                found = (entry, None)
+                break
+            if self._in_flight[domain] < PER_DOMAIN_LIMIT:
+                delay = self._buckets[domain].take()
+                if delay == 0:
+                    found = (entry, domain)
+                    break
+                wait = delay if wait is None else min(wait, delay)
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        if found:
+            return found[0], found[1], None
+        return None, None, wait
+
+    def _worker(self, results, started):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._queue and self._active == 0:
+                        self._cond.notify_all()
+                        return
+                    entry, domain, wait = self._next_task()
+                    if entry is not None:
+                        break
+                    self._cond.wait(timeout=wait)
+                self._active += 1
+                if domain is not None:
+                    self._in_flight[domain] += 1
+            priority, _, task = entry
+            result = results[task[1].name]
+            try:
+                self._run(priority, task, result)
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    if domain is not None:
+                        self._in_flight[domain] -= 1
+                    result.seconds = time.perf_counter() - started
+                    self._cond.notify_all()
+
+    # --- TASKS ---
+    def _fetch(self, source, url):
+        start = time.perf_counter()
+        if self.cache is not None:
+            page = self.cache.fetch(url, session=self.session, timeout=self.timeout, encoding="utf-8")
+            if page.status_code not in (200, 304):
+                raise RuntimeError(f"{page.status_code} Error for url: {url}")
+            html, changed = page.text, page.changed
+        else:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            html, changed = response.text, True
+        observe("scrape_request_seconds", time.perf_counter() - start, source=source.name)
+        inc("scrape_requests_total", source=source.name)
+        return html, changed
+
+    def _run(self, priority, task, result):
+        kind, source, url, key = task
+        if result.error is not None:
+            return  # The source already failed; don't keep hitting it
+        try:
+            if kind == "feed":
+                result._rows.update({(0, 0, i): row for i, row in enumerate(source.read())})
+
+            elif kind == "page":
+                origin, page_no = key
+                html, changed = self._fetch(source, url)
+                for next_no, next_url in source.next_pages(html, url, page_no):
+                    self._push(priority, ("page", source, next_url, (origin, next_no)))
+                with self._cond:
+                    result.pages += 1
+                    result.unchanged_pages += not changed
+                if not changed:
+                    return  # Cached and unchanged since the last stored run
+                start = time.perf_counter()
+                rows = source.parse_listing(html, url)
+                if self.cache is not None:
+                    self.cache.record_parse(url, time.perf_counter() - start)
+                for i, row in enumerate(rows):
+                    result._rows[(origin, page_no, i)] = row
+                    if source.follow_details:
+                        self._push(priority, ("detail", source, row[2], (origin, page_no, i)))
+
+            elif kind == "detail":
+                html, changed = self._fetch(source, url)
+                # An unchanged product page has nothing new to store
+                result._rows[key] = source.parse_detail(html, url) if changed else None
+        except Exception as e:
+            result.error = e
+            inc("scrape_errors_total", source=source.name)
+
+    def run(self, sources=None, force=False):
+        """
+        Crawls `sources` (default: every source due this run) and returns
+        {name: SourceResult}. A failing source is reported in its result's
+        `error` and does not stop the others.
+        """
+        sources = self.plan(force) if sources is None else list(sources)
+        results = {s.name: SourceResult(s.name) for s in sources}
+        for rank, source in enumerate(sources):
+            if source.kind == "feed":
+                self._push(rank, ("feed", source, None, None))
+            else:
+                for origin, url in enumerate(source.start_urls):
+                    self._push(rank, ("page", source, url, (origin, 1)))
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=self._worker, args=(results, started), name=f"scrape-{i}", daemon=True)
+                   for i in range(self.max_concurrency)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return results
+
+    def close(self):
+        self.session.close()
@@ -1,5 +1,6 @@
 import sqlite3
 import pandas as pd
+from loader import ensure_schema, load_rows
 
 # 1. Load the CSV we just created
 print("Reading CSV data...")
@@ -8,29 +9,21 @@ df = pd.read_csv("competitor_data.csv")
 # 2. Connect to the database (This creates the file if it doesn't exist)
 # In a real company, this would be a connection string to AWS/Azure
 conn = sqlite3.connect("market_analyzer.db")
-cursor = conn.cursor()
 
 # 3. Define the SQL Schema
-# We use 'IF NOT EXISTS' so we can run this script multiple times without crashing
-create_table_query = """
-CREATE TABLE IF NOT EXISTS book_prices (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_name TEXT,
-    price REAL,
-    availability TEXT,
-    scraped_at TIMESTAMP
-);
-"""
-
-cursor.execute(create_table_query)
+# ensure_schema uses 'IF NOT EXISTS' so we can run this script multiple times without crashing.
+# It also adds the (source, product_name, run_date) key that makes re-runs idempotent.
+ensure_schema(conn)
 print("SQL Table 'book_prices' checked/created.")
 
 # 4. Load Data into SQL
-# 'if_exists="append"' means if we run the scraper tomorrow, it ADDS rows, doesn't delete old ones.
-# This allows us to track price history over time!
-df.to_sql("book_prices", conn, if_exists="append", index=False)
+# Rows are APPENDED day by day, so we can track price history over time!
+# Running the script twice on the same day updates that day's rows instead of duplicating them.
+run_date = pd.to_datetime(df["scraped_at"]).dt.date.min()
+rows = df[["product_name", "price", "availability", "scraped_at"]].itertuples(index=False, name=None)
+loaded = load_rows(conn, rows, source="BooksToScrape", run_date=run_date)
 
-print(f"Successfully loaded {len(df)} rows into the Database.")
+print(f"Successfully loaded {loaded} rows into the Database.")
 
 # 5. Verification: Let's run a SQL Query to prove it works
 print("\n--- Verifying Data with SQL ---")
@@ -0,0 +1,193 @@
+from db import is_sqlite, placeholder, table_columns
+
+# --- PRE-AGGREGATED PRICE SUMMARIES ---
+# /stats and the analyst report used to scan every row of book_prices.
+# These tables keep per-(source, day) aggregates instead; the loader refreshes
+# only the slice it just wrote, so reads cost O(days), not O(rows).
+
+TOP_N = 10  # Most expensive rows remembered per source and day
+
+SUMMARY_TABLES = ("price_daily_stats", "price_daily_availability", "price_daily_top")
+
+# Read queries (no parameters, so they run on sqlite3, psycopg2 and SQLAlchemy alike)
+OVERALL_STATS_SQL = """
+    SELECT SUM(row_count) AS row_count,
+           SUM(price_sum) / NULLIF(SUM(row_count), 0) AS average_price,
+           MIN(price_min) AS lowest_price,
+           MAX(price_max) AS highest_price
+    FROM price_daily_stats
+"""
+
+AVAILABILITY_SQL = """
+    SELECT availability, SUM(row_count) AS count
+    FROM price_daily_availability
+    GROUP BY availability
+"""
+
+# The overall top N is always contained in the union of the per-day top Ns
+TOP_EXPENSIVE_SQL = """
+    SELECT title AS product_name, price
+    FROM price_daily_top
+    ORDER BY price DESC
+    LIMIT {n}
+"""
+
+
+def _layout(conn):
+    """
+    Column names differ between the cloud table and the local SQLite file.
+    """
+    columns = table_columns(conn, "book_prices")
+    if is_sqlite(conn):
+        title_col, time_col, day_fn = "product_name", "scraped_at", "date({})"
+    else:
+        title_col, time_col, day_fn = "title", "created_at", "CAST({} AS DATE)"
+    day_expr = f"COALESCE(run_date, {day_fn.format(time_col)})"
+    return title_col, day_expr, "availability" in columns
+
+
+def create_summary_tables(conn):
+    """
+    Creates the summary tables. Returns True if they did not exist before.
+    """
+    is_new = not table_columns(conn, "price_daily_stats")
+    day_type = "TEXT" if is_sqlite(conn) else "DATE"
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS price_daily_stats (
+            source TEXT NOT NULL,
+            day {day_type} NOT NULL,
+            row_count INTEGER NOT NULL,
+            price_sum NUMERIC,
+            price_min NUMERIC,
+            price_max NUMERIC,
+            PRIMARY KEY (source, day)
+        );
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS price_daily_availability (
+            source TEXT NOT NULL,
+            day {day_type} NOT NULL,
+            availability TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            PRIMARY KEY (source, day, availability)
+        );
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS price_daily_top (
+            source TEXT NOT NULL,
+            day {day_type} NOT NULL,
+            rank INTEGER NOT NULL,
+            title TEXT,
+            price NUMERIC,
+            PRIMARY KEY (source, day, rank)
+        );
+    """)
+    conn.commit()
+    cursor.close()
+    return is_new
+
+
+def refresh_day(conn, source, run_date):
+    """
+    Recomputes the summaries for one (source, run_date) slice after a load.
+    Only that day's rows are read (through the natural-key index), and the
+    old slice is replaced, so re-running a load never double counts.
+    """
+    p = placeholder(conn)
+    # Postgres won't coerce a text parameter into a DATE column inside INSERT ... SELECT
+    d = p if is_sqlite(conn) else f"CAST({p} AS DATE)"
+    title_col, _, has_availability = _layout(conn)
+    key = (source, run_date)
+    cursor = conn.cursor()
+
+    for table in SUMMARY_TABLES:
+        cursor.execute(f"DELETE FROM {table} WHERE source = {p} AND day = {p}", key)
+
+    cursor.execute(f"""
+        INSERT INTO price_daily_stats (source, day, row_count, price_sum, price_min, price_max)
+        SELECT {p}, {d}, COUNT(*), SUM(price), MIN(price), MAX(price)
+        FROM book_prices
+        WHERE source = {p} AND run_date = {p}
+        HAVING COUNT(*) > 0
+    """, key + key)
+
+    if has_availability:
+        cursor.execute(f"""
+            INSERT INTO price_daily_availability (source, day, availability, row_count)
+            SELECT {p}, {d}, COALESCE(availability, 'Unknown'), COUNT(*)
+            FROM book_prices
+            WHERE source = {p} AND run_date = {p}
+            GROUP BY COALESCE(availability, 'Unknown')
+        """, key + key)
+
+    cursor.execute(f"""
+        SELECT {title_col}, price FROM book_prices
+        WHERE source = {p} AND run_date = {p} AND price IS NOT NULL
+        ORDER BY price DESC
+        LIMIT {TOP_N}
+    """, key)
+    top = cursor.fetchall()
+    cursor.executemany(
+        f"INSERT INTO price_daily_top (source, day, rank, title, price) VALUES ({p}, {p}, {p}, {p}, {p})",
+        [(source, run_date, rank, title, price) for rank, (title, price) in enumerate(top, start=1)],
+    )
+
+    conn.commit()
+    cursor.close()
+
+
+def rebuild_summaries(conn):
+    """
+    Rebuilds every summary from the full history (one-off backfill).
+    Rows from before the loader have no source/run_date; they are grouped
+    under 'Unknown' and the day of their timestamp.
+    """
+    title_col, day_expr, has_availability = _layout(conn)
+    source_expr = "COALESCE(source, 'Unknown')"
+    cursor = conn.cursor()
+
+    for table in SUMMARY_TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+
+    cursor.execute(f"""
+        INSERT INTO price_daily_stats (source, day, row_count, price_sum, price_min, price_max)
+        SELECT {source_expr}, {day_expr}, COUNT(*), SUM(price), MIN(price), MAX(price)
+        FROM book_prices
+        WHERE {day_expr} IS NOT NULL
+        GROUP BY {source_expr}, {day_expr}
+    """)
+
+    if has_availability:
+        cursor.execute(f"""
+            INSERT INTO price_daily_availability (source, day, availability, row_count)
+            SELECT {source_expr}, {day_expr}, COALESCE(availability, 'Unknown'), COUNT(*)
+            FROM book_prices
+            WHERE {day_expr} IS NOT NULL
+            GROUP BY {source_expr}, {day_expr}, COALESCE(availability, 'Unknown')
+        """)
+
+    cursor.execute(f"""
+        INSERT INTO price_daily_top (source, day, rank, title, price)
+        SELECT src, day, rnk, title, price FROM (
+            SELECT {source_expr} AS src, {day_expr} AS day, {title_col} AS title, price,
+                   ROW_NUMBER() OVER (PARTITION BY {source_expr}, {day_expr} ORDER BY price DESC) AS rnk
+            FROM book_prices
+            WHERE price IS NOT NULL AND {day_expr} IS NOT NULL
+        ) ranked
+        WHERE rnk <= {TOP_N}
+    """)
+
+    conn.commit()
+    cursor.close()
+
+
+def overall_stats(conn):
+    """
+    Average / lowest / highest price over the whole history, from the summaries.
+    """
+    cursor = conn.cursor()
+    cursor.execute(OVERALL_STATS_SQL)
+    row_count, average, lowest, highest = cursor.fetchone()
+    cursor.close()
+    return {"row_count": row_count or 0, "average_price": average, "lowest_price": lowest, "highest_price": highest}
@@ -0,0 +1,174 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import time
+
+from db import connect_raw, table_columns
+from loader import ensure_schema, record_batch
+from summaries import refresh_day
+
+# --- LOCAL SQLITE MIRROR ---
+# Pulls book_prices from Postgres into the local SQLite file the analyst
+# scripts use (store_to_db.py, analysis_queries.py, compare_prices.py).
+# Only rows newer than the stored high-water mark (created_at, id) are
+# fetched, so a daily re-sync costs one day of rows. The loader stamps
+# created_at on every insert *and* update, so re-loaded days come along too.
+
+MIRROR_DB = os.getenv("MIRROR_DB", "market_analyzer.db")
+SYNC_BATCH_ROWS = int(os.getenv("SYNC_BATCH_ROWS", "20000"))
+# Rows are re-read from a little before the mark: a load that committed
+# after the last sync may carry a created_at from when its transaction began
+SYNC_OVERLAP_MINUTES = int(os.getenv("SYNC_OVERLAP_MINUTES", "10"))
+
+MIRROR_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS book_prices_source_day ON book_prices (source, run_date)",
+    "CREATE INDEX IF NOT EXISTS book_prices_run_date ON book_prices (run_date)",
+    "CREATE INDEX IF NOT EXISTS book_prices_scraped_at ON book_prices (scraped_at)",
+)
+
+
+def open_mirror(path=MIRROR_DB):
+    """
+    Opens (creating if needed) the mirror in WAL mode: analysts can keep
+    querying while a sync writes.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; a crash can only lose the last commit
+    ensure_schema(conn)
+    if "link" not in table_columns(conn, "book_prices"):
+        conn.execute("ALTER TABLE book_prices ADD COLUMN link TEXT")
+    for sql in MIRROR_INDEXES:
+        conn.execute(sql)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mirror_state (
+            name TEXT PRIMARY KEY,
+            last_created_at TEXT,
+            last_id INTEGER,
+            synced_at TIMESTAMP
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+def high_water_mark(conn, name="book_prices"):
+    row = conn.execute("SELECT last_created_at, last_id FROM mirror_state WHERE name = ?", (name,)).fetchone()
+    if not row or row[0] is None:
+        return None, None
+    return datetime.datetime.fromisoformat(row[0]), row[1]
+
+
+def _save_mark(cursor, created_at, row_id, name="book_prices"):
+    cursor.execute("""
+        INSERT INTO mirror_state (name, last_created_at, last_id, synced_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE SET last_created_at = excluded.last_created_at,
+                                         last_id = excluded.last_id, synced_at = excluded.synced_at
+    """, (name, created_at.isoformat(), row_id))
+
+
+def _remote_query(remote):
+    """
+    Same columns on the legacy table and the normalized view. Rows loaded
+    before run_date existed are keyed by the day they were created, and
+    rows without a source get 'Unknown' (as in migrate_schema.py): a NULL
+    never matches the mirror's (source, product_name, run_date) key, so
+    the overlap re-read would insert them again on every sync.
+    """
+    availability = "availability" if "availability" in table_columns(remote, "book_prices") else "NULL"
+    return f"""
+        SELECT id, title, price, link, {availability}, COALESCE(source, 'Unknown'),
+               COALESCE(run_date, created_at::date), created_at
+        FROM book_prices
+        WHERE (created_at, id) > (%s, %s)
+        ORDER BY created_at, id
+    """
+
+
+def sync(remote, mirror, batch_rows=SYNC_BATCH_ROWS, overlap_minutes=SYNC_OVERLAP_MINUTES):
+    """
+    Copies new and updated rows from `remote` (psycopg2) into `mirror`
+    (sqlite3). Each batch is committed together with the new high-water
+    mark, so an interrupted sync picks up where it stopped. Returns the
+    number of rows written.
+    """
+    last_created, last_id = high_water_mark(mirror)
+    if last_created is None:
+        since, after_id = datetime.datetime.min, -1
+    elif overlap_minutes:
+        since, after_id = last_created - datetime.timedelta(minutes=overlap_minutes), -1
+    else:
+        since, after_id = last_created, last_id
+
+    # Named cursor = server-side: rows stream over in batches instead of all at once
+    remote_cursor = remote.cursor(name="mirror_sync")
+    remote_cursor.itersize = batch_rows
+    remote_cursor.execute(_remote_query(remote), (since, after_id))
+
+    cursor = mirror.cursor()
+    written = 0
+    touched = {}
+    try:
+        while True:
+            rows = remote_cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            cursor.executemany("""
+                INSERT INTO book_prices (product_name, price, link, availability, source, run_date, scraped_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source, product_name, run_date) DO UPDATE SET
+                    price = excluded.price, link = excluded.link,
+                    availability = excluded.availability, scraped_at = excluded.scraped_at
+            """, [
+                (title, None if price is None else float(price), link, availability, source,
+                 run_date.isoformat(), created_at.isoformat(sep=" "))
+                for _, title, price, link, availability, source, run_date, created_at in rows
+            ])
+            for row in rows:
+                key = (row[5], row[6].isoformat())
+                touched[key] = touched.get(key, 0) + 1
+            last_id, last_created = rows[-1][0], rows[-1][7]
+            _save_mark(cursor, last_created, last_id)
+            mirror.commit()
+            written += len(rows)
+    except Exception:
+        mirror.rollback()
+        raise
+    finally:
+        remote_cursor.close()
+        remote.rollback()  # End the read transaction the named cursor opened
+        cursor.close()
+
+    # Keep the local summary tables (analysis_queries.py) in step with the new rows
+    for (source, run_date), count in touched.items():
+        refresh_day(mirror, source, run_date)
+        record_batch(mirror, source, run_date, count)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally mirror the cloud price history into local SQLite.")
+    parser.add_argument("--db", default=MIRROR_DB, help="SQLite mirror file")
+    parser.add_argument("--batch-rows", type=int, default=SYNC_BATCH_ROWS)
+    parser.add_argument("--full", action="store_true", help="Forget the high-water mark and re-read everything")
+    args = parser.parse_args()
+
+    mirror = open_mirror(args.db)
+    if args.full:
+        mirror.execute("DELETE FROM mirror_state")
+        mirror.commit()
+    last_created, _ = high_water_mark(mirror)
+    print(f"🔄 Syncing {args.db} from the cloud database "
+          f"({'first full copy' if last_created is None else f'rows since {last_created:%Y-%m-%d %H:%M:%S}'})...")
+
+    remote = connect_raw()
+    start = time.perf_counter()
+    try:
+        written = sync(remote, mirror, batch_rows=args.batch_rows)
+    finally:
+        remote.close()
+    seconds = time.perf_counter() - start
+    total = mirror.execute("SELECT COUNT(*) FROM book_prices").fetchone()[0]
+    mirror.close()
+    print(f"✅ Mirrored {written:,} rows in {seconds:.1f}s ({total:,} rows in {args.db}).")
@@ -0,0 +1,165 @@
+import bisect
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from etl_pipeline import normalize_title
+from db import table_columns
+
+# --- IN-MEMORY TITLE INDEX ---
+# Latest price per (source, product), keyed by the normalized title
+# (trimmed, whitespace collapsed, lower case - the same key as
+# products.normalized_title). Exact lookups are dict hits; prefix lookups
+# binary-search a sorted key list. POST /prices/lookup answers from here
+# and the API rebuilds it whenever a new ingestion batch lands.
+
+MAX_PREFIX_MATCHES = 50  # Products returned per prefix query
+
+LATEST_COLUMNS = ("id", "title", "price", "link", "source", "run_date", "created_at")
+
+
+def latest_prices_sql(has_product_id):
+    """
+    One row per product: the most recent run. On the normalized schema a
+    product is its product_id; elsewhere rows are split by (source, title)
+    and TitleIndex merges titles that only differ in case or spacing.
+    ROW_NUMBER instead of DISTINCT ON so the same query runs on SQLite
+    stand-ins too.
+    """
+    product_id = ", product_id" if has_product_id else ""
+    partition = "product_id" if has_product_id else "source, title"
+    return f"""
+        SELECT {', '.join(LATEST_COLUMNS)}{product_id} FROM (
+            SELECT {', '.join(LATEST_COLUMNS)}{product_id},
+                   ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY run_date IS NULL, run_date DESC, created_at DESC, id DESC) AS rn
+            FROM book_prices
+            WHERE title IS NOT NULL
+        ) latest
+        WHERE rn = 1
+    """
+
+
+def _recency(record):
+    # Same order as latest_prices_sql: dated runs first, then the newest run, write and id
+    return (record["run_date"] is not None, str(record["run_date"] or ""), str(record["created_at"] or ""),
+            record["id"] or 0)
+
+
+class TitleIndex:
+    def __init__(self, records, version=None):
+        """
+        `records` are dicts with LATEST_COLUMNS (plus product_id on the
+        normalized schema). Only the newest record per (normalized title,
+        source) is kept, so "The Requiem Red" and "the requiem red " from
+        different runs are one product. Lookups by id use product_id when
+        present, otherwise the row id.
+        """
+        self.version = version
+        self.built_at = time.time()
+        latest = {}
+        for record in records:
+            key = (normalize_title(record["title"]), record["source"])
+            if key not in latest or _recency(record) > _recency(latest[key]):
+                latest[key] = record
+
+        self.by_key = {}
+        self.by_id = {}
+        for (key, _), record in latest.items():
+            if record["price"] is not None:
+                record["price"] = float(record["price"])  # Decimal on psycopg2; converted once, not per response
+            self.by_key.setdefault(key, []).append(record)
+            self.by_id[record.get("product_id", record["id"])] = record
+        self.keys = sorted(self.by_key)
+        self._price_table = None
+
+    def __len__(self):
+        return len(self.by_id)
+
+    @classmethod
+    def load(cls, engine, version=None):
+        """
+        Builds the index from the database (one scan of book_prices).
+        """
+        with engine.connect() as conn:
+            has_product_id = "product_id" in table_columns(conn.connection.dbapi_connection, "book_prices")
+            result = conn.execute(text(latest_prices_sql(has_product_id)))
+            keys = list(result.keys())
+            records = [dict(zip(keys, row)) for row in result]
+        return cls(records, version)
+
+    def price_table(self):
+        """
+        (records, prices): every product once, with its latest price as a
+        float array (NaN when unknown). Built on first use, then reused
+        until the index is replaced. POST /scenarios runs on this.
+        """
+        if self._price_table is None:
+            records = list(self.by_id.values())
+            prices = np.array([np.nan if r["price"] is None else r["price"] for r in records], dtype=float)
+            self._price_table = (records, prices)
+        return self._price_table
+
+    def _filter(self, records, sources):
+        if sources is None:
+            return records
+        return [r for r in records if r["source"] in sources]
+
+    def exact(self, title, sources=None):
+        return self._filter(self.by_key.get(normalize_title(title), []), sources)
+
+    def prefix(self, title, sources=None, limit=MAX_PREFIX_MATCHES):
+        prefix = normalize_title(title)
+        matches = []
+        i = bisect.bisect_left(self.keys, prefix)
+        while i < len(self.keys) and self.keys[i].startswith(prefix) and len(matches) < limit:
+            matches.extend(self._filter(self.by_key[self.keys[i]], sources))
+            i += 1
+        return matches[:limit]
+
+    def by_ids(self, ids, sources=None):
+        return [
+            {"query": i, "matches": self._filter([self.by_id[i]] if i in self.by_id else [], sources)}
+            for i in ids
+        ]
+
+    def lookup(self, titles=(), ids=(), match="exact", sources=None, limit=MAX_PREFIX_MATCHES):
+        """
+        One {"query", "matches"} entry per title and id, in request order.
+        """
+        sources = set(sources) if sources else None
+        if match == "prefix":
+            results = [{"query": title, "matches": self.prefix(title, sources, limit)} for title in titles]
+        else:
+            results = [{"query": title, "matches": self.exact(title, sources)} for title in titles]
+        return results + self.by_ids(ids, sources)
+
+
+class TitleIndexHolder:
+    """
+    Keeps the current index and rebuilds it when the ingestion version
+    changes. Readers keep using the old index while a rebuild runs.
+    """
+
+    def __init__(self, load):
+        self.load = load  # version -> TitleIndex
+        self.index = None
+        self._lock = threading.Lock()
+
+    def needs_rebuild(self, version):
+        return self.index is None or (version is not None and self.index.version != version)
+
+    def get(self, version):
+        index = self.index
+        if index is not None and (version is None or index.version == version):
+            return index
+        if not self._lock.acquire(blocking=index is None):
+            return index  # Someone else is rebuilding; the previous batch's prices are still valid
+        try:
+            # Another request may have rebuilt it while we waited
+            if self.needs_rebuild(version):
+                self.index = self.load(version)
+            return self.index
+        finally:
+            self._lock.release()